@@ -1,17 +1,42 @@
 # server/app.py
 from __future__ import annotations
 
-import os, re, time, json
+import os, time, json, base64, hashlib, asyncio, logging, importlib.util
+from contextlib import asynccontextmanager
 from pathlib import Path
-from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Tuple, Optional, Literal
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, List, Dict, Sequence, Tuple, Optional, Literal
 
-import requests
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from datetime import timezone
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from services.metrics import (DIST_DIMENSIONS, SNAPSHOT_WEEKS, write_snapshot,
+                              weekly_rollup, monthly_rollup, priority_rollup)
+from services.store import make_store, utc_text, TaskQuery, VersionConflict
+from services.locks import StripedLock
+from services.ics import iter_ics_events, tzinfo_for
+from services.feeds import FeedCache, FeedError
+from services.recurrence import Calendar
+from services.http import HTTP
+from services.cache import TTLCache, MISSING
+from services.sync import SyncEngine
+from services.changes import make_change_log
+from services.shared import SharedDB, SharedCache, FeedShare
+from services.llm import LLMGateway, GeminiLLM, FakeLLM, LLMError, build_context, prompt_key, today
+from services.instrument import (REGISTRY, PROFILER, MetricsMiddleware, CACHE_EVENTS,
+                                 STAGE_SECONDS, UPSTREAM_BYTES, UPSTREAM_SECONDS)
+from services.scheduler import Scheduler, Snapshots
+from services.schedule import plan as schedule_plan
+from services.views import TaskViews
+from services.session import CertCache, GoogleVerifier, SessionSigner, SessionMiddleware, AuthError
+from services.responses import FastJSONResponse, CompressionMiddleware, json_bytes, dumps, pick_encoding, compress
+
+if TYPE_CHECKING:
+    from services.columns import TaskColumns   # numpy: imported on first use
 
 
 # ───────────────────────────── Env ─────────────────────────────
@@ -20,35 +45,84 @@ if env_here.exists():
     load_dotenv(env_here)      # server/.env
 load_dotenv()                  # project root .env
 
+log = logging.getLogger("app")
+
 GOOGLE_CLIENT_ID = os.getenv("VITE_GOOGLE_CLIENT_ID", "").strip()
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs").strip()
+# signs the session tokens /auth/google hands out; required with REQUIRE_AUTH
+SESSION_SECRET   = os.getenv("SESSION_SECRET", "").strip()
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+REQUIRE_AUTH     = os.getenv("REQUIRE_AUTH", "0").strip() in ("1", "true", "yes")
 GEMINI_API_KEY   = os.getenv("GEMINI_API_KEY", "").strip()
+LLM_BACKEND      = os.getenv("LLM_BACKEND", "").strip().lower()   # gemini (default when configured) | fake
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "2000"))
 W2W_ICS_URL      = os.getenv("W2W_ICS_URL", "").strip()
+W2W_API_KEY      = os.getenv("W2W_API_KEY", "").strip()    # W2W API (server/w2w.py), an alternative to the feed
+# where /w2w/shifts reads from by default: ics | api (default: ics when W2W_ICS_URL is set)
+W2W_SHIFTS_SOURCE = os.getenv("W2W_SHIFTS_SOURCE", "").strip().lower() or ("ics" if W2W_ICS_URL else "api")
 GCAL_ICS_URL     = os.getenv("GCAL_ICS_URL", "").strip()
+# how far back cached feeds keep events (the forward horizon is the max `days`)
+ICS_LOOKBACK_DAYS = int(os.getenv("ICS_LOOKBACK_DAYS", "30"))
+ICS_HORIZON_DAYS  = 60
+# parsed feeds are re-windowed around "now" this often, even when unchanged upstream
+FEED_REPARSE_SECONDS = 86400
+# background jobs (see the "Background jobs" section)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1").strip() not in ("0", "false", "no")
+SCHEDULE_SYNC     = os.getenv("SCHEDULE_SYNC", "0").strip() in ("1", "true", "yes")
+FEED_PREFETCH_SECONDS    = float(os.getenv("FEED_PREFETCH_SECONDS", "600"))
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "30"))
+# weekly buckets for the serverless handler (src/api/), rewritten by the metrics job
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "").strip() or str(
+    Path(__file__).with_name("metrics_snapshot.json"))
+# worker processes as uvicorn and gunicorn read them from the environment
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1").strip() or "1")
+
+# without SESSION_SECRET each process signs with a random key of its own: sessions end
+# on restart and only work on the worker that issued them. How many workers there are
+# cannot be told reliably from inside one, so REQUIRE_AUTH always needs the secret.
+if not SESSION_SECRET:
+    if REQUIRE_AUTH:
+        raise RuntimeError("SESSION_SECRET must be set when REQUIRE_AUTH is on")
+    if WEB_CONCURRENCY > 1:
+        log.warning("SESSION_SECRET is not set: each worker signs sessions with its own key, "
+                    "so a session only works on the worker that issued it")
 
 # ───────────────────────────── Optional deps ─────────────────────────────
-try:
-    from google.oauth2 import id_token
-    from google.auth.transport import requests as google_requests
-    GOOGLE_READY = True
-except Exception:
-    GOOGLE_READY = False
-
-try:
-    import google.generativeai as genai
-    if GEMINI_API_KEY:
-        genai.configure(api_key=GEMINI_API_KEY)
-        GEMINI_READY = True
-    else:
-        GEMINI_READY = False
-except Exception:
-    GENMI_READY = False
-    genai = None  # type: ignore
+# Only located here, not imported: each one is imported on first use so a
+# cold start never pays for an SDK the request does not touch
+# (bench/import_budget.py keeps it that way).
+def _installed(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+GOOGLE_READY = _installed("google.auth")                                 # /auth/google
+GEMINI_READY = bool(GEMINI_API_KEY) and _installed("google.generativeai")   # /chat, /retro
+COLUMNS_READY = _installed("numpy")                                      # /metrics/rollup, /metrics/groupby
 
 def pick_model() -> str:
     return "models/gemini-2.5-flash"
 
+def _google_decode(token: str, **kwargs) -> Dict[str, Any]:
+    from google.auth import jwt   # first login pays the import (in the verifier's worker thread)
+    return jwt.decode(token, **kwargs)
+
 # ───────────────────────────── App & CORS ─────────────────────────────
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCHEDULER_ENABLED:
+        await SCHEDULER.start()
+    yield
+    await SCHEDULER.stop()
+    await HTTP.aclose()
+
+# default_response_class: dict/list bodies go through orjson when it is installed
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+SESSIONS = SessionSigner(SESSION_SECRET.encode() or os.urandom(32), ttl=SESSION_TTL_SECONDS)
+app.add_middleware(SessionMiddleware, sessions=SESSIONS, required=REQUIRE_AUTH,
+                   public=("/auth/", "/health", "/metrics/prometheus", "/docs", "/openapi.json"))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -59,7 +133,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+# added last, so outermost: per-route latency for /metrics/prometheus, CORS preflights included
+app.add_middleware(MetricsMiddleware)
 
 # ───────────────────────────── Task models ─────────────────────────────
 Status = Literal["todo", "in-progress", "done"]
@@ -79,6 +156,7 @@ class Task(BaseModel):
     updatedAt: str
     externalId: Optional[str] = None
     source: Optional[str] = None
+    version: int = 0   # stamped by the store on every write (ETag of the task)
 
 class TaskPatch(BaseModel):
     title: Optional[str] = None
@@ -90,7 +168,30 @@ class TaskPatch(BaseModel):
     timeSpentMs: Optional[int] = None
     timerStartedAt: Optional[str] = None
 
-DB: dict[str, Task] = {}
+STORE = make_store(Task)   # TASK_STORE=sqlite (default) | memory
+LOCKS = StripedLock(64)    # per-task write ordering; STORE's version check covers other processes
+WRITE_RETRIES = 3          # re-read and retry a write that lost a version race
+CHANGES = make_change_log(STORE)   # versioned deltas for /tasks/changes and /tasks/stream
+# weekly aggregates, percentile sketches and the NumPy mirror: caught up from CHANGES on read
+VIEWS = TaskViews(STORE, CHANGES, columns=COLUMNS_READY)
+# SQLite mode is multi-worker safe: caches and feed bodies are shared through the same file
+SHARED = SharedDB(STORE.path) if STORE.shared else None
+
+def _require_columns() -> None:
+    if not COLUMNS_READY:
+        raise HTTPException(500, "numpy not installed on server")
+
+def _save(tasks: List[Task], deletes: Sequence[str] = (), expect: Optional[Dict[str, int]] = None) -> List[Task]:
+    """Write a batch (raises VersionConflict if `expect` is stale); returns the stamped tasks."""
+    with STAGE_SECONDS.time("store_write"):
+        tasks = STORE.apply(tasks, deletes, expect)
+    CHANGES.record(tasks, deletes)
+    return tasks
+
+def _apply_patch(existing: Task, fields: Dict[str, Any], now: Optional[str] = None) -> Task:
+    """`existing` with a TaskPatch's set fields applied and updatedAt stamped."""
+    # TaskPatch fields carry Task's types, so the copy needs no re-validation
+    return existing.model_copy(update={**fields, "updatedAt": now or datetime.utcnow().isoformat()})
 
 # ───────────────────────────── Health ─────────────────────────────
 @app.get("/")
@@ -98,275 +199,1039 @@ def home():
     return {"message": "Hello from FastAPI 🚀"}
 
 # ───────────────────────────── ICS helpers ─────────────────────────────
-ISO_RE = re.compile(r"^(\d{8})T(\d{6})Z?$")
-
-def _ics_time_to_iso(v: str) -> str:
-    m = ISO_RE.match(v.strip())
-    if not m:
-        return v
-    date, clock = m.groups()
-    dt = datetime.strptime(date + clock, "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
-    return dt.isoformat()
-
-def parse_ics_events(ics_text: str) -> List[Dict]:
-    events: List[Dict] = []
-    lines = [ln.rstrip("\r") for ln in ics_text.splitlines()]
-    i, n = 0, len(lines)
-    while i < n:
-        if lines[i].startswith("BEGIN:VEVENT"):
-            block: Dict[str, str] = {}
-            i += 1
-            while i < n and not lines[i].startswith("END:VEVENT"):
-                ln = lines[i]
-                while i + 1 < n and lines[i + 1].startswith(" "):
-                    ln += lines[i + 1][1:]; i += 1
-                if ":" in ln:
-                    k, v = ln.split(":", 1)
-                    k = k.split(";")[0].upper()
-                    block[k] = v
-                i += 1
-            if {"DTSTART", "DTEND", "SUMMARY"} <= block.keys():
-                events.append({
-                    "id": block.get("UID") or str(hash(block["SUMMARY"] + block["DTSTART"])),
-                    "title": block["SUMMARY"],
-                    "start": _ics_time_to_iso(block["DTSTART"]),
-                    "end": _ics_time_to_iso(block["DTEND"]),
-                    "location": block.get("LOCATION", ""),
-                    "raw": {"description": block.get("DESCRIPTION", "")},
-                })
-        i += 1
-    return events
-
-def _check_ics(url: str) -> tuple[bool, str | None]:
+PROBE_BYTES = 16 * 1024   # enough for the VCALENDAR header and the first VEVENT
+
+async def _check_ics(url: str) -> tuple[bool, str | None]:
+    """Validate a feed from its first few KB instead of downloading it all."""
     if not url:
         return False, "ICS URL not configured."
+    t0 = time.perf_counter()
     try:
-        r = requests.get(url, timeout=12)
-        r.raise_for_status()
-        t = r.text or ""
-        if "BEGIN:VCALENDAR" in t and "BEGIN:VEVENT" in t:
+        head = b""
+        async with HTTP.stream("GET", url, headers={"Range": f"bytes=0-{PROBE_BYTES - 1}"},
+                               timeout=12) as r:
+            r.raise_for_status()  # 200 (Range ignored) and 206 are both fine
+            truncated = False
+            async for chunk in r.aiter_bytes():
+                head += chunk
+                if b"BEGIN:VEVENT" in head or len(head) >= PROBE_BYTES:
+                    truncated = True
+                    break
+        UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "probe", "ok")
+        UPSTREAM_BYTES.inc("probe", amount=len(head))
+        if b"BEGIN:VCALENDAR" not in head[:1024]:
+            return False, "ICS feed does not look valid."
+        # a long VTIMEZONE preamble can push the first VEVENT past the probe;
+        # a cut-off read with a calendar header is valid whatever the status
+        if b"BEGIN:VEVENT" in head or truncated:
             return True, None
         return False, "ICS feed does not look valid."
     except Exception as e:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "probe", "error")
         return False, f"Fetch failed: {e}"
 
 # ───────────────────────────── Integration status (single endpoint) ─────────────────────────────
-_INTEGRATION_CACHE = {"at": 0.0, "data": None}
-_CACHE_TTL_SEC = 300
-
-@app.get("/integrations/status")
-def integrations_status(email: str = Query(..., description="Signed-in user email")):
-    now = time.time()
-    if _INTEGRATION_CACHE["data"] and (now - _INTEGRATION_CACHE["at"] < _CACHE_TTL_SEC):
-        return _INTEGRATION_CACHE["data"]
+# (email, feed url) -> (ok, reason); failures expire sooner than successes
+_INTEGRATION_CACHE = (SharedCache(SHARED, "integrations", ttl=300, negative_ttl=60, jitter=0.2)
+                      if SHARED else TTLCache(maxsize=2048, ttl=300, negative_ttl=60, jitter=0.2))
 
-    has_w2w, w2w_reason   = _check_ics(W2W_ICS_URL)
-    has_gcal, gcal_reason = _check_ics(GCAL_ICS_URL)
+async def _feed_status(email: str, url: str) -> tuple[bool, str | None]:
+    key = (email.lower(), url)
+    hit = await _INTEGRATION_CACHE.aget(key)
+    CACHE_EVENTS.inc("integrations", "miss" if hit is MISSING else "hit")
+    if hit is not MISSING:
+        return hit
+    res = await _check_ics(url)
+    await _INTEGRATION_CACHE.aset(key, res, ok=res[0])
+    return res
 
-    payload = {
+@app.get("/integrations/status")
+async def integrations_status(email: str = Query(..., description="Signed-in user email")):
+    (has_w2w, w2w_reason), (has_gcal, gcal_reason) = await asyncio.gather(
+        _feed_status(email, W2W_ICS_URL), _feed_status(email, GCAL_ICS_URL),
+    )
+    return {
         "email": email,
         "hasW2W": has_w2w,   "w2wReason": w2w_reason,
         "hasGCal": has_gcal, "gcalReason": gcal_reason,
     }
-    _INTEGRATION_CACHE["data"] = payload
-    _INTEGRATION_CACHE["at"] = now
-    return payload
 
 # ───────────────────────────── W2W + GCal endpoints ─────────────────────────────
-W2W_CACHE: dict = {"at": None, "items": []}
-GCAL_CACHE: dict = {"at": None, "items": []}
+# shared by every ICS feed (stale-while-revalidate); one worker refreshes each feed
+FEEDS = FeedCache(ttl=900, timeout=20, share=FeedShare(SHARED) if SHARED else None,
+                  reparse_after=FEED_REPARSE_SECONDS)
+
+def _parse_feed(lines) -> Calendar:
+    """
+    Parse once into a start-sorted index of one-off events plus compact
+    recurring series; requests bisect the index and expand series lazily.
+    The window runs FEED_REPARSE_SECONDS past the horizon so it still
+    covers it until FEEDS re-parses the feed.
+    """
+    now = datetime.fromtimestamp(time.time(), timezone.utc)   # the clock FEEDS ages parses by
+    lo = now - timedelta(days=ICS_LOOKBACK_DAYS)
+    hi = now + timedelta(days=ICS_HORIZON_DAYS, seconds=FEED_REPARSE_SECONDS)
+    return Calendar(iter_ics_events(lines, window_start=lo, window_end=hi),
+                    lo.timestamp(), hi.timestamp())
+
+def _utc_ts(dt: datetime) -> float:
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+def _iso(t: float) -> str:
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+def _feed_horizon(cal: Calendar, now: float) -> Tuple[float, float]:
+    """What a parsed feed serves: the lookback and horizon around `now`, within what was parsed."""
+    return (max(cal.horizon[0], now - ICS_LOOKBACK_DAYS * 86400),
+            min(cal.horizon[1], now + ICS_HORIZON_DAYS * 86400))
+
+def _bound(horizon: Tuple[float, float], lo: float, hi: float,
+           explicit_lo: bool, explicit_hi: bool) -> Tuple[float, float]:
+    """
+    Fit a query window to the span a parsed feed covers. The cache holds
+    nothing outside it, so explicit bounds past it are a 400; defaulted
+    bounds are clamped (and the caller reports the range it used).
+    """
+    h_lo, h_hi = horizon
+    if (explicit_lo and not h_lo <= lo < h_hi) or (explicit_hi and not h_lo < hi <= h_hi):
+        raise HTTPException(400, f"window must fall within the cached feed range "
+                                 f"{_iso(h_lo)} .. {_iso(h_hi)}")
+    lo, hi = max(lo, h_lo), min(hi, h_hi)
+    if hi <= lo:
+        raise HTTPException(400, "from must be before to")
+    return lo, hi
+
+async def _feed_shifts(url: str, label: str, days: int, upcoming: bool,
+                 frm: Optional[datetime], to: Optional[datetime], at: Optional[datetime]) -> FastJSONResponse:
+    try:
+        feed = await FEEDS.get(url, _parse_feed)
+    except FeedError as e:
+        raise HTTPException(502, f"{label} fetch failed: {e}")
+    now = time.time()
+    idx: Calendar = feed.data
+    horizon = _feed_horizon(idx, now)
+    # recurring series expand on demand: keep that off the event loop
+    if at is not None:
+        t = _utc_ts(at)
+        _bound(horizon, t, horizon[1], True, False)
+        lo = hi = t
+        items = await run_in_threadpool(idx.at, t)
+    else:
+        lo = _utc_ts(frm) if frm else (now if upcoming else horizon[0])
+        hi = _utc_ts(to) if to else now + days * 86400
+        lo, hi = _bound(horizon, lo, hi, frm is not None, to is not None)
+        items = await run_in_threadpool(idx.window, lo, hi)
+    # returned as a response so the items skip the jsonable_encoder walk
+    return FastJSONResponse({
+        "items": items,
+        "from": _iso(lo),   # the range actually served, after clamping to the cached window
+        "to": _iso(hi),
+        "cachedAt": datetime.fromtimestamp(feed.fetched_at, timezone.utc).isoformat(),
+        "stale": feed.stale,
+    })
+
+def _w2w_api():
+    """server/w2w.py's range fetcher; its chunk cache is shared across workers in SQLite mode."""
+    if not W2W_API_KEY:
+        raise HTTPException(500, "W2W_API_KEY is not set in .env")
+    import w2w   # only needed when the API is configured
+    if SHARED is not None and not isinstance(w2w.FETCHER.cache, SharedCache):
+        w2w.FETCHER.cache = SharedCache(SHARED, "w2w_shifts", jitter=0.1)
+    return w2w.FETCHER
+
+def _shift_span(s: dict) -> Tuple[float, float]:
+    return _utc_ts(datetime.fromisoformat(s["start"])), _utc_ts(datetime.fromisoformat(s["end"]))
+
+async def _api_shifts(days: int, upcoming: bool, frm: Optional[datetime], to: Optional[datetime],
+                      at: Optional[datetime]) -> FastJSONResponse:
+    """/w2w/shifts from the W2W API: same windows as the feed, fetched by day/week chunk."""
+    fetcher = _w2w_api()
+    now = datetime.now(timezone.utc)
+    if at is not None:
+        lo = hi = _utc_ts(at)
+    else:
+        lo = _utc_ts(frm) if frm else (now.timestamp() if upcoming
+                                       else (now - timedelta(days=ICS_LOOKBACK_DAYS)).timestamp())
+        hi = _utc_ts(to) if to else (now + timedelta(days=days)).timestamp()
+    # a day early for shifts that started before the window and run into it
+    start = datetime.fromtimestamp(lo, timezone.utc).date() - timedelta(days=1)
+    end = datetime.fromtimestamp(hi, timezone.utc).date() + timedelta(days=1)
+    try:
+        shifts, info = await fetcher.get(start, end)
+    except Exception as e:
+        raise HTTPException(502, f"W2W API fetch failed: {e}")
+    items = []
+    for s in shifts:
+        s_lo, s_hi = _shift_span(s)
+        if (s_lo <= lo < s_hi) if at is not None else (s_hi > lo and s_lo < hi):
+            items.append(s)
+    return FastJSONResponse({
+        "items": items,
+        "cachedAt": datetime.fromtimestamp(info["cachedAt"], timezone.utc).isoformat(),
+        "stale": False,
+        "chunks": info["chunks"],
+        "fetchedChunks": info["fetched"],
+    })
+
+SYNC = SyncEngine(STORE, CHANGES)   # fingerprints of synced events, so resyncs only write what changed
+
+async def _sync_feed(url: str, source: str, label: str, skip_past: bool = False) -> dict:
+    if not url:
+        return {"created": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    try:
+        feed = await FEEDS.get(url, _parse_feed)   # cached, adopted from another worker, or fetched
+    except FeedError as e:
+        raise HTTPException(502, f"{source} fetch failed: {e}")
+    return await run_in_threadpool(_apply_sync, feed.data, source, label, skip_past)
+
+def _apply_sync(cal: Calendar, source: str, label: str, skip_past: bool) -> dict:
+    """Diff the feed against its tasks and apply the result as one batch."""
+    now_iso = datetime.utcnow().isoformat()
+    horizon = _feed_horizon(cal, time.time())   # the span this feed is known to cover right now
+    rows, seen = [], []
+    for ev in cal.window(*horizon):
+        eid = f"{source}-{ev['id']}"
+        if skip_past and ev["end"] < now_iso:
+            seen.append(eid)
+            continue
+        rows.append(dict(
+            id=eid, title=f"{label}: {ev['title']}{(' @ ' + ev['location']) if ev.get('location') else ''}",
+            description=(ev.get("raw", {}).get("description") or "").strip(),
+            priority="medium", status="todo",
+            createdAt=ev["start"], updatedAt=ev["start"], dueDate=ev["end"],
+            externalId=eid, source=source,
+        ))
+    for _ in range(WRITE_RETRIES):
+        plan = SYNC.plan(source, rows, seen=seen, horizon=horizon, now=now_iso)
+        with LOCKS.hold(plan.expect):
+            try:
+                _save(plan.puts, plan.deletes, expect=plan.expect)
+            except VersionConflict:
+                continue  # a task was edited meanwhile: re-plan on top of it
+        SYNC.commit(plan)
+        return plan.summary()
+    raise HTTPException(409, "tasks kept changing during sync; try again")
 
 @app.get("/w2w/shifts")
-def w2w_shifts(days: int = Query(14, ge=1, le=60), upcoming: bool = False):
+async def w2w_shifts(
+    days: int = Query(14, ge=1, le=60),
+    upcoming: bool = False,
+    frm: Optional[datetime] = Query(None, alias="from", description="window start (overrides upcoming)"),
+    to: Optional[datetime] = Query(None, description="window end (overrides days)"),
+    at: Optional[datetime] = Query(None, description="only events in progress at this instant"),
+    source: Optional[Literal["ics", "api"]] = Query(None, description="default: W2W_SHIFTS_SOURCE"),
+):
+    if (source or W2W_SHIFTS_SOURCE) == "api":
+        return await _api_shifts(days, upcoming, frm, to, at)
     if not W2W_ICS_URL:
         raise HTTPException(500, "W2W_ICS_URL is not set in .env")
-    now = datetime.now(timezone.utc)
-    if not W2W_CACHE["at"] or (now - W2W_CACHE["at"]).total_seconds() > 900:
-        try:
-            txt = requests.get(W2W_ICS_URL, timeout=20).text
-            W2W_CACHE["items"] = parse_ics_events(txt)
-            W2W_CACHE["at"] = now
-        except Exception as e:
-            raise HTTPException(502, f"W2W fetch failed: {e}")
-    items = list(W2W_CACHE["items"])
-    if upcoming:
-        items = [s for s in items if datetime.fromisoformat(s["end"]) > now]
-    end_limit = now + timedelta(days=days)
-    items = [s for s in items if datetime.fromisoformat(s["start"]) <= end_limit]
-    return {"items": items, "cachedAt": now.isoformat()}
+    return await _feed_shifts(W2W_ICS_URL, "W2W", days, upcoming, frm, to, at)
 
 @app.post("/w2w/sync-to-tasks")
-def w2w_sync_to_tasks():
-    items = W2W_CACHE["items"] or []
-    created = updated = 0
-    for ev in items:
-        eid = f"w2w-{ev['id']}"
-        title = f"Shift: {ev['title']}{(' @ ' + ev['location']) if ev.get('location') else ''}"
-        existing = DB.get(eid)
-        base = dict(
-            id=eid, title=title, description=(ev.get("raw", {}).get("description") or "").strip(),
-            priority="medium", status="todo",
-            createdAt=ev["start"], updatedAt=ev["start"], dueDate=ev["end"],
-            externalId=eid, source="w2w"
-        )
-        if existing:
-            DB[eid] = Task(**{**existing.model_dump(), **base, "updatedAt": datetime.utcnow().isoformat()})
-            updated += 1
-        else:
-            DB[eid] = Task(**base); created += 1
-    return {"created": created, "updated": updated}
+async def w2w_sync_to_tasks():
+    return await _sync_feed(W2W_ICS_URL, "w2w", "Shift")
 
 @app.get("/gcal/shifts")
-def gcal_shifts(days: int = Query(14, ge=1, le=60), upcoming: bool = False):
+async def gcal_shifts(
+    days: int = Query(14, ge=1, le=60),
+    upcoming: bool = False,
+    frm: Optional[datetime] = Query(None, alias="from", description="window start (overrides upcoming)"),
+    to: Optional[datetime] = Query(None, description="window end (overrides days)"),
+    at: Optional[datetime] = Query(None, description="only events in progress at this instant"),
+):
     if not GCAL_ICS_URL:
         raise HTTPException(500, "GCAL_ICS_URL is not set in .env")
-    now = datetime.now(timezone.utc)
-    if not GCAL_CACHE["at"] or (now - GCAL_CACHE["at"]).total_seconds() > 900:
-        try:
-            txt = requests.get(GCAL_ICS_URL, timeout=20).text
-            GCAL_CACHE["items"] = parse_ics_events(txt)
-            GCAL_CACHE["at"] = now
-        except Exception as e:
-            raise HTTPException(502, f"GCAL fetch failed: {e}")
-    items = list(GCAL_CACHE["items"])
-    if upcoming:
-        items = [s for s in items if datetime.fromisoformat(s["end"]) > now]
-    end_limit = now + timedelta(days=days)
-    items = [s for s in items if datetime.fromisoformat(s["start"]) <= end_limit]
-    return {"items": items, "cachedAt": now.isoformat()}
+    return await _feed_shifts(GCAL_ICS_URL, "GCAL", days, upcoming, frm, to, at)
 
 @app.post("/gcal/sync-to-tasks")
-def gcal_sync_to_tasks():
-    items = GCAL_CACHE["items"] or []
-    now_iso = datetime.utcnow().isoformat()
-    created = updated = 0
-    for ev in items:
-        if ev["end"] < now_iso:
-            continue
-        eid = f"gcal-{ev['id']}"
-        title = f"Calendar: {ev['title']}{(' @ ' + ev['location']) if ev.get('location') else ''}"
-        existing = DB.get(eid)
-        base = dict(
-            id=eid, title=title, description=(ev.get("raw", {}).get("description") or "").strip(),
-            priority="medium", status="todo",
-            createdAt=ev["start"], updatedAt=ev["start"], dueDate=ev["end"],
-            externalId=eid, source="gcal"
-        )
-        if existing:
-            DB[eid] = Task(**{**existing.model_dump(), **base, "updatedAt": datetime.utcnow().isoformat()})
-            updated += 1
-        else:
-            DB[eid] = Task(**base); created += 1
-    return {"created": created, "updated": updated}
+async def gcal_sync_to_tasks():
+    # past calendar events are not turned into tasks
+    return await _sync_feed(GCAL_ICS_URL, "gcal", "Calendar", skip_past=True)
+
+
+# ───────────────────────────── Schedule (free time / conflicts) ─────────────────────────────
+# plans keyed by (feed versions, task-set version, window, options); versions make stale keys unreachable
+_SCHEDULE_CACHE = TTLCache(maxsize=64, ttl=600)
+
+async def _schedule(days: int, frm: Optional[datetime], to: Optional[datetime], tz: str, day_start: int,
+                    day_end: int, min_minutes: int, all_day: bool) -> dict:
+    if day_end <= day_start:
+        raise HTTPException(400, "dayEnd must be after dayStart")
+    if tz != "UTC" and tzinfo_for(tz) is timezone.utc:
+        raise HTTPException(400, f"unknown time zone {tz!r}")
+    urls = [(src, url) for src, url in (("w2w", W2W_ICS_URL), ("gcal", GCAL_ICS_URL)) if url]
+    try:
+        feeds = dict(zip([src for src, _ in urls],
+                         await asyncio.gather(*(FEEDS.get(url, _parse_feed) for _, url in urls))))
+    except FeedError as e:
+        raise HTTPException(502, f"feed fetch failed: {e}")
+    now = time.time()
+    lo = _utc_ts(frm) if frm else now - now % 60   # minute-aligned so repeated calls share a key
+    hi = _utc_ts(to) if to else lo + days * 86400
+    if feeds:   # only the span every feed covers is busy-time we actually know
+        spans = [_feed_horizon(f.data, now) for f in feeds.values()]
+        horizon = (max(s[0] for s in spans), min(s[1] for s in spans))
+        lo, hi = _bound(horizon, lo, hi, frm is not None, to is not None)
+    if not 0 < hi - lo <= ICS_HORIZON_DAYS * 86400:
+        raise HTTPException(400, f"window must be positive and at most {ICS_HORIZON_DAYS} days")
+    tasks_version = await run_in_threadpool(lambda: CHANGES.version)   # a query in SQLite mode
+    key = (tuple((src, f.version) for src, f in feeds.items()), tasks_version,
+           lo, hi, tz, day_start, day_end, min_minutes, all_day)
+    hit = _SCHEDULE_CACHE.get(key)
+    CACHE_EVENTS.inc("schedule", "miss" if hit is MISSING else "hit")
+    if hit is not MISSING:
+        return hit
+
+    def compute() -> dict:
+        sources = {src: f.data.window(lo, hi) for src, f in feeds.items()}
+        # stored JSON rows, not Task models: the plan only reads a few fields
+        tasks = map(json.loads, STORE.query_json(TaskQuery(status=("todo", "in-progress"))))
+        with STAGE_SECONDS.time("schedule_plan"):
+            result = schedule_plan(sources, tasks, lo, hi, tzinfo_for(tz), day_start, day_end,
+                                   min_minutes, all_day)
+        result["sources"] = {src: {"version": f.version, "stale": f.stale} for src, f in feeds.items()}
+        return result
+
+    result = await run_in_threadpool(compute)
+    _SCHEDULE_CACHE.set(key, result)
+    return result
+
+def _schedule_params(
+    days: int = Query(14, ge=1, le=ICS_HORIZON_DAYS),
+    frm: Optional[datetime] = Query(None, alias="from", description="window start (default: now)"),
+    to: Optional[datetime] = Query(None, description="window end (overrides days)"),
+    tz: str = Query("UTC", description="IANA zone for dayStart/dayEnd"),
+    dayStart: int = Query(0, ge=0, le=23, description="local hour free time starts each day"),
+    dayEnd: int = Query(24, ge=1, le=24, description="local hour free time ends each day"),
+    minMinutes: int = Query(15, ge=1, le=480, description="shortest free window / task block"),
+    allDay: bool = Query(False, description="count all-day events as busy"),
+) -> tuple:
+    return days, frm, to, tz, dayStart, dayEnd, minMinutes, allDay
+
+@app.get("/schedule/free-slots")
+async def schedule_free_slots(params: tuple = Depends(_schedule_params)):
+    """
+    Free windows between W2W shifts and GCal events (within dayStart-dayEnd),
+    open tasks' remaining estimates laid into them earliest-due-first
+    (`blocks`), the free time left after that, and tasks that cannot fit
+    before their dueDate (`unfit`).
+    """
+    r = await _schedule(*params)
+    return FastJSONResponse({k: r[k] for k in ("from", "to", "free", "blocks", "freeAfterTasks", "unfit",
+                                              "unplaced", "tasksConsidered", "sources")})
+
+@app.get("/schedule/conflicts")
+async def schedule_conflicts(params: tuple = Depends(_schedule_params)):
+    """Overlapping shifts / events in the window, and tasks whose estimate cannot fit before dueDate."""
+    r = await _schedule(*params)
+    return FastJSONResponse({k: r[k] for k in ("from", "to", "overlaps", "overlapCount", "unfit",
+                                              "busyItems", "sources")})
 
 # ───────────────────────────── Tasks API ─────────────────────────────
+def _encode_cursor(task_id: str) -> str:
+    return base64.urlsafe_b64encode(task_id.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except Exception:
+        raise HTTPException(400, "bad cursor")
+
+# serialized /tasks bodies (plus compressed variants) per (epoch, version, query):
+# polling clients that miss the 304 path still skip the query and the encoding
+_TASKS_BODIES = TTLCache(maxsize=16, ttl=300)
+
+def _tasks_body(q: TaskQuery, keep: Optional[List[str]], limit: Optional[int]) -> Tuple[bytes, Optional[str]]:
+    rows = STORE.query_json(q)
+    cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        cursor = _encode_cursor(json.loads(rows[-1])["id"])
+    if keep is not None:
+        rows = [dumps({k: d.get(k) for k in keep}).decode() for d in map(json.loads, rows)]
+    return ("[" + ",".join(rows) + "]").encode(), cursor
+
 @app.get("/tasks", response_model=List[Task])
-def list_tasks():
-    return list(DB.values())
+def list_tasks(
+    request: Request,
+    status: Optional[str] = Query(None, description="comma-separated statuses"),
+    source: Optional[str] = None,
+    dueFrom: Optional[datetime] = Query(None, description="dueDate >= this ISO time (naive = UTC)"),
+    dueTo: Optional[datetime] = Query(None, description="dueDate < this ISO time (naive = UTC)"),
+    updatedSince: Optional[datetime] = Query(None, description="updatedAt > this ISO time (naive = UTC)"),
+    fields: Optional[str] = Query(None, description="comma-separated fields, e.g. id,title,status"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="page size (default: everything)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+):
+    """
+    Tasks ordered by id. Still a plain JSON array; when `limit` cuts the
+    result short the next page's cursor is in the X-Next-Cursor header.
+    The ETag covers the store version and the query, so an unchanged set
+    answers 304 before anything is read or serialized.
+    """
+    query_key = hashlib.blake2b(str(sorted(request.query_params.multi_items())).encode(),
+                                digest_size=8).hexdigest()
+    etag = f'W/"{STORE.epoch}-{STORE.version}-{query_key}"'
+    # every answer is negotiated on Accept-Encoding, the uncompressed ones and 304s too
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    keep = None
+    if fields:
+        keep = [f for f in dict.fromkeys(["id", *fields.split(",")]) if f]
+        unknown = [f for f in keep if f not in Task.model_fields]
+        if unknown:
+            raise HTTPException(400, f"unknown fields: {', '.join(unknown)}")
+    q = TaskQuery(
+        status=tuple(s for s in (status or "").split(",") if s),
+        source=source, due_from=utc_text(dueFrom), due_to=utc_text(dueTo),
+        updated_since=utc_text(updatedSince),
+        after=_decode_cursor(cursor) if cursor else None,
+        limit=limit + 1 if limit else None,
+    )
+    cached = _TASKS_BODIES.get(etag)
+    CACHE_EVENTS.inc("tasks_body", "miss" if cached is MISSING else "hit")
+    if cached is MISSING:
+        cached = {"": _tasks_body(q, keep, limit)}
+        _TASKS_BODIES.set(etag, cached)
+    body, next_cursor = cached[""]
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    encoding = pick_encoding(request.headers.get("accept-encoding", "")) if len(body) >= 1024 else None
+    if encoding:
+        # compressed once per version; the middleware leaves encoded bodies alone
+        if encoding not in cached:
+            cached[encoding] = compress(body, encoding)
+        body = cached[encoding]
+        headers["Content-Encoding"] = encoding
+    return json_bytes(body, headers=headers)
 
 @app.post("/tasks", response_model=Task)
 def create_task(task: Task):
-    DB[task.id] = task
-    return task
+    with LOCKS.hold([task.id]):
+        task = _save([task])[0]
+    # validated on the way in: serialize directly instead of through response_model
+    return json_bytes(task.model_dump_json(), headers={"ETag": _task_etag(task)})
+
+# ───────────────────────────── Bulk writes ─────────────────────────────
+# registered before /tasks/{task_id} so "bulk" is never taken for an id
+BULK_MAX = 10_000          # items per JSON bulk request; bigger imports use NDJSON
+IMPORT_BATCH = 1_000       # tasks per transaction while streaming an import
+IMPORT_MAX_ERRORS = 100    # per-item errors echoed back from an import
+
+def _item_error(index: int, item_id, e: ValidationError | str) -> dict:
+    if isinstance(e, ValidationError):
+        e = e.errors(include_url=False, include_context=False)
+    return {"index": index, "id": item_id, "error": e}
+
+def _put_items(items: List[Tuple[int, Task]], errors: list,
+               atomic: bool) -> Optional[Tuple[int, list]]:
+    """
+    Write validated (index, task) pairs under their locks and return
+    (applied, errors), or None if the tasks kept changing. A new id must
+    still be absent when it is written; an existing task is only replaced
+    by an item carrying its current version, so edits made since the
+    client read it are reported instead of silently overwritten. An id
+    may appear once per batch: later items with the same id are errors.
+    """
+    seen = set()
+    unique: List[Tuple[int, Task]] = []
+    errors = list(errors)
+    for i, t in items:
+        if t.id in seen:
+            errors.append(_item_error(i, t.id, "duplicate id in batch"))
+        else:
+            seen.add(t.id)
+            unique.append((i, t))
+    items = unique
+    ids = [t.id for _, t in items]
+    for _ in range(WRITE_RETRIES):
+        with LOCKS.hold(ids):
+            current = STORE.versions(ids)
+            puts: List[Task] = []
+            expect: Dict[str, int] = {}
+            errs = list(errors)
+            for i, t in items:
+                have = current.get(t.id, 0)
+                if have and t.version != have:
+                    errs.append(_item_error(i, t.id, f"version conflict (current version {have})"))
+                    continue
+                puts.append(t)
+                expect[t.id] = have
+            errs.sort(key=lambda e: e["index"])
+            if atomic and errs:
+                return 0, errs
+            try:
+                _save(puts, expect=expect)
+            except VersionConflict:
+                continue  # written by another process between read and write
+        return len(puts), errs
+    return None
+
+@app.post("/tasks/bulk")
+def create_tasks_bulk(items: List[Any] = Body(...), atomic: bool = False):
+    """
+    Create/replace many tasks in one transaction. Invalid items, and
+    replacements whose `version` is not the task's current one, are reported
+    by index and skipped (or, with `atomic=true`, nothing is written).
+    """
+    if len(items) > BULK_MAX:
+        raise HTTPException(413, f"at most {BULK_MAX} items per request; use /tasks/import")
+    ok: List[Tuple[int, Task]] = []
+    errors = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(_item_error(i, None, "expected a JSON object"))
+            continue
+        try:
+            ok.append((i, Task.model_validate(item)))
+        except ValidationError as e:
+            errors.append(_item_error(i, item.get("id"), e))
+    if atomic and errors:
+        return {"applied": 0, "errors": errors}
+    res = _put_items(ok, errors, atomic)
+    if res is None:
+        raise HTTPException(409, "tasks kept changing; try again")
+    return {"applied": res[0], "errors": res[1]}
+
+@app.patch("/tasks/bulk")
+def update_tasks_bulk(items: List[Any] = Body(...), atomic: bool = False):
+    """Apply `{id, ...fields}` patches in one transaction; unknown ids are per-item errors."""
+    if len(items) > BULK_MAX:
+        raise HTTPException(413, f"at most {BULK_MAX} items per request")
+    patches: List[Tuple[int, Any, Optional[dict]]] = []
+    errors = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(_item_error(i, None, "expected a JSON object"))
+            continue
+        tid = item.get("id")
+        if not isinstance(tid, str):
+            errors.append(_item_error(i, tid, "id is required"))
+            continue
+        try:
+            patch = TaskPatch.model_validate({k: v for k, v in item.items() if k != "id"})
+        except ValidationError as e:
+            errors.append(_item_error(i, tid, e))
+            continue
+        patches.append((i, tid, patch.model_dump(exclude_unset=True)))
+    ids = [tid for _, tid, _ in patches]
+    for _ in range(WRITE_RETRIES):
+        with LOCKS.hold(ids):
+            now = datetime.utcnow().isoformat()
+            existing = STORE.get_many(ids)
+            out: Dict[str, Task] = {}
+            missing = []
+            for i, tid, fields in patches:
+                t = out.get(tid) or existing.get(tid)
+                if t is None:
+                    missing.append(_item_error(i, tid, "not found"))
+                    continue
+                out[tid] = _apply_patch(t, fields, now)
+            errs = sorted(errors + missing, key=lambda e: e["index"])
+            if atomic and errs:
+                return {"applied": 0, "errors": errs}
+            try:
+                _save(list(out.values()), expect={tid: existing[tid].version for tid in out})
+            except VersionConflict:
+                continue  # changed by another process between read and write
+        return {"applied": len(out), "errors": errs}
+    raise HTTPException(409, "tasks kept changing; try again")
+
+def _import_lines(lines: List[Tuple[int, bytes]]) -> Tuple[int, list]:
+    ok: List[Tuple[int, Task]] = []
+    errors = []
+    for lineno, line in lines:
+        try:
+            ok.append((lineno, Task.model_validate_json(line)))
+        except ValidationError as e:
+            errors.append(_item_error(lineno, None, e))
+    res = _put_items(ok, errors, atomic=False)
+    if res is None:   # earlier batches are already in; report this one per line
+        errors += [_item_error(n, t.id, "task kept changing; try again") for n, t in ok]
+        return 0, sorted(errors, key=lambda e: e["index"])
+    return res
+
+@app.post("/tasks/import")
+async def import_tasks(request: Request):
+    """
+    Streaming NDJSON import: one task per line, read and written in batches
+    of IMPORT_BATCH (one transaction each), so memory stays flat however
+    large the upload is. Errors are reported by line number.
+    """
+    applied = failed = 0
+    errors: list = []
+    batch: List[Tuple[int, bytes]] = []
+    lineno = 0
+    rest = b""
+
+    async def flush():
+        nonlocal applied, failed, batch
+        n, errs = await run_in_threadpool(_import_lines, batch)
+        applied += n
+        failed += len(errs)
+        errors.extend(errs[:IMPORT_MAX_ERRORS - len(errors)])
+        batch = []
+
+    async for chunk in request.stream():
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            lineno += 1
+            if line.strip():
+                batch.append((lineno, line))
+        if len(batch) >= IMPORT_BATCH:
+            await flush()
+    if rest.strip():
+        batch.append((lineno + 1, rest))
+    if batch:
+        await flush()
+    return {"applied": applied, "failed": failed, "errors": errors}
+
+# ───────────────────────────── Task edits & change feed ─────────────────────────────
+def _task_etag(t: Task) -> str:
+    return f'"{t.version}"'
+
+def _if_match(header: Optional[str], t: Task) -> bool:
+    if header is None or header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return _task_etag(t) in tags
 
 @app.patch("/tasks/{task_id}", response_model=Task)
-def update_task(task_id: str, patch: TaskPatch):
-    t = DB.get(task_id)
+def update_task(task_id: str, patch: TaskPatch, request: Request):
+    """
+    Partial update. Send `If-Match: <ETag>` to make it conditional: if the
+    task changed since that version the answer is 409 with the current one.
+    Without it, concurrent patches to different fields all survive.
+    """
+    if_match = request.headers.get("if-match")
+    fields = patch.model_dump(exclude_unset=True)
+    for _ in range(WRITE_RETRIES):
+        with LOCKS.hold([task_id]):
+            t = STORE.get(task_id)
+            if not t:
+                raise HTTPException(404, "not found")
+            if not _if_match(if_match, t):
+                raise HTTPException(409, {"message": "version conflict", "current": t.model_dump()})
+            try:
+                new = _save([_apply_patch(t, fields)], expect={task_id: t.version})[0]
+            except VersionConflict:
+                continue  # another process wrote it between read and write: re-read
+        return json_bytes(new.model_dump_json(), headers={"ETag": _task_etag(new)})
+    raise HTTPException(409, "task kept changing; try again")
+
+def _changes_body(since: int, epoch: Optional[str]) -> dict:
+    changes, reset, version = CHANGES.since(since, epoch)
+    return {"epoch": CHANGES.epoch, "version": version, "reset": reset, "changes": changes}
+
+@app.get("/tasks/changes")
+async def task_changes(
+    since: int = Query(0, ge=0, description="last version the client has seen"),
+    epoch: Optional[str] = Query(None, description="epoch returned with that version"),
+    wait: float = Query(0, ge=0, le=60, description="long-poll: seconds to wait for a change"),
+):
+    """
+    Deltas since `since` (latest change per task, oldest first). `reset`
+    means the log no longer reaches back that far: refetch /tasks and
+    continue from the returned version.
+    """
+    if wait:
+        await CHANGES.wait(since, wait)
+    # StoreChangeLog reads SQLite: keep it off the event loop
+    return FastJSONResponse(await run_in_threadpool(_changes_body, since, epoch))
+
+@app.get("/tasks/stream")
+async def task_stream(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="defaults to Last-Event-ID, then now"),
+    epoch: Optional[str] = None,
+):
+    """Server-sent events: one `changes` event per new version, plus keep-alives."""
+    last = request.headers.get("last-event-id", "")
+    if since is None:
+        since = int(last) if last.isdigit() else await run_in_threadpool(lambda: CHANGES.version)
+
+    async def events():
+        v, ep = since, epoch
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            body = await run_in_threadpool(_changes_body, v, ep)
+            if body["changes"] or body["reset"]:
+                v, ep = body["version"], body["epoch"]
+                yield f"id: {v}\nevent: changes\ndata: {dumps(body).decode()}\n\n"
+            if not await CHANGES.wait(v, 15):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# after /tasks/changes and /tasks/stream so those paths are not read as ids
+@app.get("/tasks/{task_id}", response_model=Task)
+def get_task(task_id: str):
+    t = STORE.get(task_id)
     if not t:
         raise HTTPException(404, "not found")
-    data = t.model_dump()
-    data.update({k: v for k, v in patch.model_dump(exclude_unset=True).items()})
-    data["updatedAt"] = datetime.utcnow().isoformat()
-    DB[task_id] = Task(**data)
-    return DB[task_id]
+    return json_bytes(t.model_dump_json(), headers={"ETag": _task_etag(t)})
 
 
 # ───────────────────────────── Google Auth (optional) ─────────────────────────────
 class GoogleAuthReq(BaseModel):
     id_token: str
 
+# certs cached per their Cache-Control, verified tokens until their exp
+VERIFIER = GoogleVerifier(CertCache(GOOGLE_CERTS_URL), _google_decode if GOOGLE_READY else None,
+                          audience=GOOGLE_CLIENT_ID or None)
+
 @app.post("/auth/google")
-def auth_google(req: GoogleAuthReq):
+async def auth_google(req: GoogleAuthReq):
+    """
+    Verify a Google ID token and open a session: later calls send
+    `Authorization: Bearer <session>` and are checked locally (HMAC).
+    """
     if not GOOGLE_READY:
         raise HTTPException(500, "google-auth not installed on server")
     try:
-        info = id_token.verify_oauth2_token(
-            req.id_token,
-            google_requests.Request(),
-            audience=GOOGLE_CLIENT_ID or None,
-        )
-        user = {
-            "email": info.get("email", ""),
-            "name": info.get("name", ""),
-            "picture": info.get("picture", ""),
-            "sub": info.get("sub", ""),
-        }
-        return {"user": user}
-    except Exception:
+        with STAGE_SECONDS.time("google_verify"):
+            info = await VERIFIER.verify(req.id_token)
+    except AuthError:
         raise HTTPException(400, "Invalid Google token")
+    user = {
+        "email": info.get("email", ""),
+        "name": info.get("name", ""),
+        "picture": info.get("picture", ""),
+        "sub": info.get("sub", ""),
+    }
+    session, expires = SESSIONS.issue(user)
+    return {"user": user, "session": session,
+            "expiresAt": datetime.fromtimestamp(expires, timezone.utc).isoformat()}
+
+@app.get("/auth/session")
+def auth_session(request: Request):
+    """Who the bearer session belongs to (401 without a valid one)."""
+    user = request.state.user
+    if user is None:
+        raise HTTPException(401, "no valid session", headers={"WWW-Authenticate": "Bearer"})
+    return {"user": {k: user.get(k, "") for k in ("email", "name", "picture", "sub")},
+            "expiresAt": datetime.fromtimestamp(user["exp"], timezone.utc).isoformat()}
+
+# ───────────────────────────── Coach (chat / retro) ─────────────────────────────
+COACH_SYSTEM = ("You are a concise, practical productivity coach inside a task board app. "
+                "Answer in a few short sentences or bullets, grounded in the user's tasks.")
+RETRO_SYSTEM = ("You write short weekly retrospectives: what went well, what slipped, "
+                "and two or three concrete adjustments for next week.")
+
+def _make_llm():
+    if LLM_BACKEND == "fake":
+        return FakeLLM(delay=float(os.getenv("LLM_FAKE_DELAY", "0.02")))
+    if GEMINI_READY:
+        return GeminiLLM(GEMINI_API_KEY, pick_model())
+    return None
+
+_LLM = _make_llm()
+# answers keyed by prompt + task-set version; an hour is plenty for advice
+_LLM_CACHE = (SharedCache(SHARED, "llm", ttl=3600, jitter=0.1)
+              if SHARED else TTLCache(maxsize=512, ttl=3600))
+COACH = LLMGateway(_LLM, _LLM_CACHE) if _LLM else None
+
+class ChatReq(BaseModel):
+    prompt: str
+    tasks: Optional[List[Dict[str, Any]]] = None   # client's view; defaults to the stored tasks
+    stream: bool = False
+
+class RetroReq(BaseModel):
+    weeks: int = 4
+    stream: bool = False
+
+def _coach() -> LLMGateway:
+    if COACH is None:
+        raise HTTPException(500, "gemini not configured on server (set GEMINI_API_KEY or LLM_BACKEND=fake)")
+    return COACH
+
+def _store_context(budget: int) -> str:
+    return build_context((t.model_dump() for t in STORE.list()), budget)[0]
+
+async def _coach_response(request: Request, key: str, hit: Optional[str], prompt: str,
+                          system: str, stream: bool) -> Response:
+    """JSON {text, cached}; or SSE `data: {text}` chunks then a `done` event when asked to stream."""
+    if not (stream or "text/event-stream" in request.headers.get("accept", "")):
+        if hit is not None:
+            return FastJSONResponse({"text": hit, "cached": True})
+        try:
+            text = "".join([c async for c in COACH.stream(key, prompt, system)])
+        except LLMError as e:
+            raise HTTPException(502, f"model call failed: {e}")
+        return FastJSONResponse({"text": text, "cached": False})
+
+    async def events():
+        if hit is not None:
+            yield f"data: {dumps({'text': hit}).decode()}\n\n"
+        else:
+            try:
+                async for chunk in COACH.stream(key, prompt, system):
+                    yield f"data: {dumps({'text': chunk}).decode()}\n\n"
+            except LLMError as e:
+                yield f"event: error\ndata: {dumps({'detail': str(e)}).decode()}\n\n"
+                return
+        yield f"event: done\ndata: {dumps({'cached': hit is not None}).decode()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/chat")
+async def chat(req: ChatReq, request: Request):
+    """
+    Ask the coach about your tasks. The task context is trimmed to
+    LLM_CONTEXT_TOKENS (most relevant first). Repeated questions over an
+    unchanged task set come from cache; identical questions in flight
+    share one model call. `stream: true` (or Accept: text/event-stream)
+    streams the answer as server-sent events.
+    """
+    coach = _coach()
+    if req.tasks is not None:
+        context = build_context(req.tasks, LLM_CONTEXT_TOKENS)[0]
+        key = prompt_key("chat", coach.client.name, req.prompt, context)
+    else:
+        context = None
+        version = await run_in_threadpool(lambda: STORE.version)   # a query in SQLite mode
+        key = prompt_key("chat", coach.client.name, req.prompt, STORE.epoch, version)
+    hit = await coach.cached(key)
+    prompt = ""
+    if hit is None:
+        if context is None:
+            context = await run_in_threadpool(_store_context, LLM_CONTEXT_TOKENS)
+        prompt = f"Today is {today()}.\n\nMy tasks:\n{context}\n\nQuestion: {req.prompt}"
+    return await _coach_response(request, key, hit, prompt, COACH_SYSTEM, req.stream)
+
+@app.post("/retro")
+async def retro(request: Request, req: RetroReq = Body(default_factory=RetroReq)):
+    """Weekly retrospective from the metrics of the last `weeks` weeks and the stored tasks."""
+    coach = _coach()
+    weeks = max(1, min(req.weeks, 26))
+    version = await run_in_threadpool(lambda: STORE.version)
+    key = prompt_key("retro", coach.client.name, weeks, STORE.epoch, version)
+    hit = await coach.cached(key)
+    prompt = ""
+    if hit is None:
+        series = await run_in_threadpool(_weekly_series, weeks)
+        context = await run_in_threadpool(_store_context, LLM_CONTEXT_TOKENS)
+        prompt = (f"Today is {today()}.\n\nWeekly metrics (oldest first):\n{json.dumps(series)}"
+                  f"\n\nTasks:\n{context}\n\nWrite the retrospective.")
+    return await _coach_response(request, key, hit, prompt, RETRO_SYSTEM, req.stream)
    
 
 
 @app.get("/metrics/weekly")
-def metrics_weekly():
+def metrics_weekly(weeks: int = Query(1, ge=1, le=104)):
     """
-    Compute simple weekly metrics from the in-memory DB:
-    - how many tasks were completed this week
+    Weekly metrics over the last `weeks` ISO weeks (oldest first):
+    - how many tasks were completed each week
     - average cycle time (ms) for those completed tasks
     - on-time % (completed before or on dueDate)
-    Returns arrays so the frontend can chart by week.
+    Served from running aggregates, so the cost is O(weeks), not O(tasks),
+    or straight from the scheduler's snapshot for the common `weeks`.
     """
-    now = datetime.now(timezone.utc)
+    snap = SNAPSHOTS.get(("weekly", weeks), CHANGES.version)
+    if snap is not MISSING:
+        return snap
+    return _weekly_series(weeks)
 
-    # Week window: Monday 00:00:00 -> next Monday 00:00:00 (UTC)
-    week_start = (now - timedelta(days=now.weekday())).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
-    week_end = week_start + timedelta(days=7)
-
-    def as_aware(dt_str: str | None) -> datetime | None:
-        if not dt_str:
-            return None
-        # tolerate naive ISO by assuming UTC
-        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
-        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
-
-    # Completed within this week
-    done = []
-    for t in DB.values():
-        if t.status != "done":
-            continue
-        upd = as_aware(t.updatedAt)
-        if not upd or upd < week_start or upd >= week_end:
-            continue
-        done.append(t)
-
-    # Avg cycle time for completed (updated - created)
-    cycles_ms: list[int] = []
-    for t in done:
-        created = as_aware(t.createdAt)
-        updated = as_aware(t.updatedAt)
-        if created and updated:
-            ms = int((updated - created).total_seconds() * 1000)
-            if ms >= 0:
-                cycles_ms.append(ms)
-
-    avg_cycle_ms = int(sum(cycles_ms) / len(cycles_ms)) if cycles_ms else 0
-
-    # On-time: completed <= dueDate (only for tasks that have dueDate)
-    with_due = [t for t in done if t.dueDate]
-    on_time = 0
-    for t in with_due:
-        updated = as_aware(t.updatedAt)
-        due = as_aware(t.dueDate)
-        if updated and due and updated <= due:
-            on_time += 1
-    on_time_pct = round((on_time / len(with_due)) * 100) if with_due else 0
-
-    wk = week_start.date().isoformat()
-    return {
-        "weeklyDone":  [{"weekStart": wk, "count": len(done)}],
-        "weeklyCycle": [{"weekStart": wk, "avgCycleMs": avg_cycle_ms}],
-        "weeklyOnTime": [{"weekStart": wk, "onTimePct": on_time_pct}],
-    }
-    
\ No newline at end of file
+def _weekly_series(weeks: int) -> dict:
+    with VIEWS.read() as v:
+        return v.weekly.series(weeks)
+
+def _rollup(by: str, periods: int) -> dict:
+    _require_columns()
+    with VIEWS.read() as v:
+        return {"items": _rollup_items(v.columns, by, periods)}
+
+def _rollup_items(cols: "TaskColumns", by: str, periods: int) -> List[dict]:
+    if by == "week":
+        return weekly_rollup(cols, periods)
+    if by == "month":
+        return monthly_rollup(cols, periods)
+    return priority_rollup(cols)
+
+
+@app.get("/metrics/rollup")
+def metrics_rollup(
+    by: Literal["week", "month", "priority"] = "week",
+    periods: int = Query(12, ge=1, le=120),
+):
+    """Weekly / monthly / per-priority rollups from the columnar mirror."""
+    snap = SNAPSHOTS.get(("rollup", by, periods), CHANGES.version)
+    if snap is not MISSING:
+        return snap
+    return _rollup(by, periods)
+
+@app.get("/metrics/distributions")
+def metrics_distributions(
+    weeks: int = Query(12, ge=1, le=520),
+    frm: Optional[date] = Query(None, alias="from", description="overrides `weeks`"),
+    to: Optional[date] = None,
+    priority: Optional[Priority] = None,
+    source: Optional[str] = Query(None, description="w2w, gcal, manual, ..."),
+    groupBy: str = Query("", description="comma list of week,priority,source"),
+    q: str = Query("0.5,0.9,0.99", description="comma list of quantiles in [0, 1]"),
+):
+    """
+    Percentiles of completed tasks' cycle time (ms), lateness past dueDate
+    (ms, negative = early) and timeSpentMs / estimate, over completion
+    weeks in [from, to]. Each group merges the per-week x priority x source
+    sketches it covers; values are within ~1% of rank of the exact answer.
+    """
+    dims = [d for d in groupBy.split(",") if d]
+    if any(d not in DIST_DIMENSIONS for d in dims):
+        raise HTTPException(400, f"groupBy must be from {DIST_DIMENSIONS}")
+    try:
+        qs = [float(x) for x in q.split(",") if x]
+    except ValueError:
+        raise HTTPException(400, "q must be a comma list of numbers")
+    if not qs or any(not 0 <= x <= 1 for x in qs):
+        raise HTTPException(400, "q must be a comma list of numbers in [0, 1]")
+    if frm is None:
+        frm = (to or datetime.now(timezone.utc).date()) - timedelta(weeks=weeks - 1)
+    with VIEWS.read() as v:
+        items = v.distributions.query(frm, to, priority, source, dims, qs)
+    return {"from": frm.isoformat(), "to": to.isoformat() if to else None, "groupBy": dims, "items": items}
+
+@app.get("/metrics/groupby")
+def metrics_groupby(
+    by: str = Query("status", description="comma list of status,priority,source,week,month"),
+    values: str = Query("", description="comma list of timeSpentMs,estimateMinutes,cycleMs"),
+    status: Optional[Status] = None,
+    source: Optional[str] = None,
+):
+    """Ad hoc group-by over all tasks; week/month bucket the completion time."""
+    keys = [k for k in by.split(",") if k]
+    vals = [v for v in values.split(",") if v]
+    _require_columns()
+    from services.columns import KEYS as COLUMN_KEYS, VALUES as COLUMN_VALUES
+    if any(k not in COLUMN_KEYS for k in keys) or any(v not in COLUMN_VALUES for v in vals):
+        raise HTTPException(400, f"by must be from {COLUMN_KEYS}, values from {COLUMN_VALUES}")
+    with VIEWS.read() as views:
+        cols = views.columns
+        mask = None
+        if status is not None:
+            mask = cols.status_mask(status)
+        if source is not None:
+            m = cols.source_mask(source)
+            mask = m if mask is None else mask & m
+        return {"items": cols.group_by(keys, values=vals, mask=mask)}
+
+
+# ───────────────────────────── Observability ─────────────────────────────
+def _db_bytes():
+    if not getattr(STORE, "path", None):
+        return None
+    return [((part,), os.path.getsize(f"{STORE.path}{suffix}"))
+            for part, suffix in (("main", ""), ("wal", "-wal")) if os.path.exists(f"{STORE.path}{suffix}")]
+
+REGISTRY.gauge("store_tasks", "Tasks in the store.", STORE.count)
+REGISTRY.gauge("store_db_bytes", "SQLite file sizes.", _db_bytes, ("file",))
+REGISTRY.gauge("store_change_version", "Latest change-log version.", lambda: CHANGES.version)
+REGISTRY.gauge("feed_cache_entries", "ICS feeds held in this process.", lambda: len(FEEDS))
+REGISTRY.gauge("cache_entries", "Entries in in-process caches.",
+               lambda: [((name,), len(c)) for name, c in (("tasks_body", _TASKS_BODIES),
+                        ("integrations", _INTEGRATION_CACHE), ("llm", _LLM_CACHE)) if isinstance(c, TTLCache)],
+               ("cache",))
+
+@app.get("/metrics/prometheus")
+def metrics_prometheus():
+    """Prometheus text exposition. Per process: with several workers each scrape sees one of them."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+PROFILER_ENABLED = os.getenv("ENABLE_PROFILER", "").strip() in ("1", "true", "yes")
+
+def _profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(403, "profiler disabled on server (set ENABLE_PROFILER=1)")
+    return PROFILER
+
+@app.post("/debug/profiler")
+def profiler_toggle(on: bool = True, hz: int = Query(100, ge=1, le=1000), reset: bool = False):
+    """Start (`on=true`) or stop the sampling profiler; `reset` drops collected samples."""
+    p = _profiler()
+    if reset:
+        p.reset()
+    if on:
+        p.start(hz)
+    else:
+        p.stop()
+    return {"running": p.running, "hz": p.hz, "samples": p.samples}
+
+@app.get("/debug/profiler")
+def profiler_dump(limit: Optional[int] = Query(None, ge=1)):
+    """Collapsed stacks (`frame;frame;... count`), ready for flamegraph.pl or speedscope."""
+    return Response(_profiler().collapsed(limit), media_type="text/plain")
+
+
+# ───────────────────────────── Background jobs ─────────────────────────────
+# Started by the lifespan (SCHEDULER_ENABLED=0 turns it off). Every worker
+# runs its own scheduler; feed refreshes are still coalesced across workers
+# by FeedShare, and the optional sync is idempotent (version-checked).
+SCHEDULER = Scheduler()
+SNAPSHOTS = Snapshots(max_age=2 * METRICS_SNAPSHOT_SECONDS)
+WEEKLY_SNAPSHOT_WEEKS = (1, 4, 8, 12)       # what the dashboard asks for
+ROLLUP_SNAPSHOTS = (("week", 12), ("month", 12), ("priority", 12))
+W2W_API_DAYS = 14                           # days ahead the W2W API job keeps warm
+_SNAPSHOT_FILE: Dict[str, Any] = {"version": None}   # version last written to METRICS_SNAPSHOT_PATH
+
+async def _prefetch_feed(url: str, source: str, label: str, skip_past: bool) -> dict:
+    feed = await FEEDS.refresh(url, _parse_feed, fresh_for=FEED_PREFETCH_SECONDS / 2)
+    result: Dict[str, Any] = {"version": feed.version, "events": len(feed.data)}
+    if SCHEDULE_SYNC:
+        result["sync"] = await run_in_threadpool(_apply_sync, feed.data, source, label, skip_past)
+    return result
+
+async def _prefetch_w2w_api() -> dict:
+    # refetches only the chunks whose TTL ran out (the near-term days, mostly)
+    today = datetime.now(timezone.utc).date()
+    shifts, info = await _w2w_api().get(today, today + timedelta(days=W2W_API_DAYS))
+    return {"shifts": len(shifts), "chunks": info["chunks"], "fetched": info["fetched"]}
+
+def _precompute_metrics() -> dict:
+    VIEWS.maintain()   # sheds values retracted from the sketches once they pile up
+    version = CHANGES.version   # read first: a snapshot may be newer than its tag, never older
+    with VIEWS.read() as v:
+        for weeks in WEEKLY_SNAPSHOT_WEEKS:
+            SNAPSHOTS.put(("weekly", weeks), version, v.weekly.series(weeks))
+        if v.columns is not None:
+            for by, periods in ROLLUP_SNAPSHOTS:
+                SNAPSHOTS.put(("rollup", by, periods), version,
+                              {"items": _rollup_items(v.columns, by, periods)})
+        write_file = METRICS_SNAPSHOT_PATH and _SNAPSHOT_FILE["version"] != version
+        buckets = v.weekly.buckets(SNAPSHOT_WEEKS) if write_file else None
+    result = {"version": version, "snapshots": len(SNAPSHOTS)}
+    if buckets is not None:
+        write_snapshot(METRICS_SNAPSHOT_PATH, buckets, version)
+        _SNAPSHOT_FILE["version"] = result["snapshotFile"] = version
+    return result
+
+async def _metrics_job() -> dict:
+    return await run_in_threadpool(_precompute_metrics)
+
+if W2W_ICS_URL:
+    SCHEDULER.add("prefetch:w2w", lambda: _prefetch_feed(W2W_ICS_URL, "w2w", "Shift", False),
+                  FEED_PREFETCH_SECONDS, jitter=0.2, timeout=120, initial_delay=5)
+if GCAL_ICS_URL:
+    SCHEDULER.add("prefetch:gcal", lambda: _prefetch_feed(GCAL_ICS_URL, "gcal", "Calendar", True),
+                  FEED_PREFETCH_SECONDS, jitter=0.2, timeout=120, initial_delay=5)
+if W2W_API_KEY:
+    SCHEDULER.add("prefetch:w2w-api", _prefetch_w2w_api, FEED_PREFETCH_SECONDS, jitter=0.2, timeout=60,
+                  initial_delay=5)
+# first run one interval after boot: its VIEWS.read() seeds the views from a full
+# scan, which should not compete with startup (a metrics request may seed them sooner)
+SCHEDULER.add("metrics:snapshots", _metrics_job, METRICS_SNAPSHOT_SECONDS, jitter=0.1, timeout=60,
+              initial_delay=METRICS_SNAPSHOT_SECONDS)
+
+REGISTRY.gauge("scheduler_job_consecutive_failures", "Failures since the job last succeeded.",
+               lambda: [((n,), j.consecutive_failures) for n, j in SCHEDULER.jobs.items()], ("job",))
+REGISTRY.gauge("scheduler_job_last_success_timestamp", "Unix time of the job's last success.",
+               lambda: [((n,), j.last_success) for n, j in SCHEDULER.jobs.items() if j.last_success], ("job",))
+
+@app.get("/health/jobs")
+def jobs_health():
+    """Per-job health of the background scheduler (this worker's)."""
+    return SCHEDULER.health()
@@ -0,0 +1,112 @@
+# server/bench/bench_tasks_json.py
+"""
+Micro-benchmark: GET /tasks serialization paths.
+
+    cd server && python -m bench.bench_tasks_json --sizes 10000,100000
+
+Runs in process (TestClient; a temporary SQLite store unless --store
+memory) and compares, per store size:
+
+- pydantic : the old path, `response_model=List[Task]` over Task objects
+             (validate + jsonable_encoder + json.dumps on every request)
+- cold     : /tasks with an empty body cache (query + join of stored JSON)
+- cached   : /tasks again at the same store version (cached bytes)
+- gzip     : cached body, client sends Accept-Encoding: gzip
+- 304      : client sends the ETag back
+
+Reports ms per request and response size.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+server = None   # the app module, imported once TASK_STORE is set
+
+
+def _task(i: int) -> dict:
+    day = 1 + i % 28
+    return {
+        "id": f"bench-{i:06d}", "title": f"Task {i}", "description": "lorem ipsum " * random.randint(0, 6),
+        "priority": random.choice(["low", "medium", "high"]),
+        "status": random.choice(["todo", "in-progress", "done"]),
+        "createdAt": f"2025-03-{day:02d}T09:00:00", "updatedAt": f"2025-03-{day:02d}T17:00:00",
+        "dueDate": f"2025-03-{day:02d}T18:00:00", "timeSpentMs": random.randint(0, 8) * 3_600_000,
+    }
+
+
+def _old_app() -> FastAPI:
+    old = FastAPI()
+
+    @old.get("/tasks", response_model=List[server.Task])
+    def list_tasks():
+        return server.STORE.list()
+
+    return old
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def run(n: int, repeat: int) -> None:
+    new = TestClient(server.app)
+    old = TestClient(_old_app())
+    plain = {"accept-encoding": "identity"}
+    etag = new.get("/tasks", headers=plain).headers["etag"]
+
+    def cold():
+        server._TASKS_BODIES.clear()
+        return new.get("/tasks", headers=plain)
+
+    cases = [
+        ("pydantic", lambda: old.get("/tasks", headers=plain)),
+        ("cold", cold),
+        ("cached", lambda: new.get("/tasks", headers=plain)),
+        ("gzip", lambda: new.get("/tasks", headers={"accept-encoding": "gzip"})),
+        ("304", lambda: new.get("/tasks", headers={"if-none-match": etag})),
+    ]
+    for name, fn in cases:
+        r = fn()
+        size = int(r.headers.get("content-length") or 0)
+        print(f"{n:>8} {name:>9} {_time(fn, repeat):>10.2f} {size / 1024:>10.0f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="10000,100000", help="comma-separated task counts")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--store", choices=["sqlite", "memory"], default="sqlite")
+    args = ap.parse_args()
+
+    global server
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["TASK_STORE"] = args.store
+    os.environ["TASKS_DB_PATH"] = os.path.join(tmp.name, "tasks.db")
+    server = importlib.import_module("app")
+    random.seed(7)
+    print(f"{'tasks':>8} {'path':>9} {'ms/req':>10} {'KiB':>10}")
+    done = 0
+    for n in (int(x) for x in args.sizes.split(",")):
+        # grow the same store so each size reuses the previous rows
+        server.STORE.put_many([server.Task.model_validate(_task(i)) for i in range(done, n)])
+        done = n
+        run(n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
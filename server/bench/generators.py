@@ -0,0 +1,163 @@
+# server/bench/generators.py
+"""
+Seeded synthetic data for benchmarks. Same seed, same bytes (ICS feeds
+are anchored on `start`, by default today so time windows hit them).
+
+- make_tasks(n, seed): task dicts (valid Task payloads) with a realistic
+  mix: most tasks done, creation skewed towards recent weeks, due dates
+  on about 70% (some overdue), time tracked on done / in-progress work, a
+  share imported from the W2W and GCal feeds.
+- make_ics(events, seed): an ICS document the way real exporters write
+  it: a VTIMEZONE preamble, lines folded at 75 octets (UTF-8 aware),
+  escaped long descriptions, TZID and all-day times, and some weekly
+  series with EXDATEs, moved and cancelled occurrences.
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+STATUSES = (("done", 0.55), ("todo", 0.30), ("in-progress", 0.15))
+PRIORITIES = (("low", 0.35), ("medium", 0.40), ("high", 0.20), ("urgent", 0.05))
+SOURCES = ((None, 0.80), ("w2w", 0.15), ("gcal", 0.05))
+
+_WORDS = ("review deploy write plan call fix email draft update sync prepare clean test "
+          "budget design report meeting invoice notes refactor onboarding café naïve").split()
+
+
+def _pick(rng: random.Random, table) -> str:
+    r = rng.random()
+    for value, p in table:
+        r -= p
+        if r < 0:
+            return value
+    return table[-1][0]
+
+
+def _iso(dt: datetime) -> str:
+    return dt.replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+def make_tasks(n: int, seed: int = 0, now: datetime | None = None) -> Iterator[dict]:
+    """`n` task dicts; a generator, so 1M tasks never sit in memory twice."""
+    rng = random.Random(seed)
+    now = now or datetime(2025, 6, 30, 12, tzinfo=timezone.utc)
+    for i in range(n):
+        status = _pick(rng, STATUSES)
+        source = _pick(rng, SOURCES)
+        created = now - timedelta(days=min(365.0, rng.expovariate(1 / 45)), minutes=rng.randrange(1440))
+        t = {
+            "id": f"{source or 'task'}-{seed}-{i:07d}",
+            "title": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 7))).capitalize(),
+            "priority": _pick(rng, PRIORITIES),
+            "status": status,
+            "createdAt": _iso(created),
+            "updatedAt": _iso(created),
+        }
+        if rng.random() < 0.3:
+            t["description"] = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 60)))
+        if rng.random() < 0.7:
+            t["dueDate"] = _iso(created + timedelta(days=rng.lognormvariate(1.2, 0.9)))
+        if rng.random() < 0.6:
+            t["estimateMinutes"] = rng.choice((15, 25, 30, 45, 60, 90, 120, 240))
+        if status == "done":
+            t["updatedAt"] = _iso(min(now, created + timedelta(hours=rng.lognormvariate(3, 1.2))))
+            t["timeSpentMs"] = int(rng.lognormvariate(14.5, 1.0))
+        elif status == "in-progress":
+            t["timeSpentMs"] = int(rng.lognormvariate(13.5, 1.0))
+            if rng.random() < 0.2:
+                t["timerStartedAt"] = _iso(now - timedelta(minutes=rng.randrange(120)))
+        if source:
+            t["source"] = source
+            t["externalId"] = t["id"]
+        yield t
+
+
+# ───────────── ICS ─────────────
+_VTIMEZONE = """BEGIN:VTIMEZONE
+TZID:America/New_York
+BEGIN:DAYLIGHT
+TZOFFSETFROM:-0500
+TZOFFSETTO:-0400
+TZNAME:EDT
+DTSTART:19700308T020000
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU
+END:DAYLIGHT
+BEGIN:STANDARD
+TZOFFSETFROM:-0400
+TZOFFSETTO:-0500
+TZNAME:EST
+DTSTART:19701101T020000
+RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=1SU
+END:STANDARD
+END:VTIMEZONE""".splitlines()
+
+
+def fold(line: str) -> List[str]:
+    """RFC 5545 folding: at most 75 octets per line, never splitting a UTF-8 sequence."""
+    out, cur, size = [], [], 0
+    for ch in line:
+        n = len(ch.encode())
+        if size + n > 75:
+            out.append("".join(cur))
+            cur, size = [" "], 1
+        cur.append(ch)
+        size += n
+    out.append("".join(cur))
+    return out
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def make_ics(events: int, seed: int = 0, start: datetime | None = None, description_len: int = 600,
+             recurring: float = 0.05) -> str:
+    """About `events` VEVENTs starting at `start` (default: today, so windows hit them)."""
+    rng = random.Random(seed)
+    start = (start or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    start -= timedelta(days=7)
+    out = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//bench//generators//EN", "CALSCALE:GREGORIAN"]
+    out += _VTIMEZONE
+    per_day = max(1, events // 90)
+    for i in range(events):
+        day = start + timedelta(days=i // per_day)
+        begin = day + timedelta(hours=rng.choice((6, 7, 8, 9, 12, 14, 16, 22)))
+        hours = rng.choice((4, 6, 8, 8, 8, 10, 12))
+        words = [rng.choice(_WORDS) for _ in range(max(1, description_len // 7))]
+        desc = _escape(" ".join(words[:len(words) // 2]) + ",\n" + " ".join(words[len(words) // 2:]))
+        uid = f"bench-{seed}-{i}@generators"
+        ev = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{start:%Y%m%dT%H%M%SZ}",
+              f"SUMMARY:{_escape(rng.choice(('Front desk', 'Kitchen', 'Bar, late', 'Café floor')))} shift"]
+        kind = rng.random()
+        if kind < 0.6:
+            ev += [f"DTSTART:{begin:%Y%m%dT%H%M%SZ}", f"DTEND:{begin + timedelta(hours=hours):%Y%m%dT%H%M%SZ}"]
+        elif kind < 0.95:
+            ev += [f"DTSTART;TZID=America/New_York:{begin:%Y%m%dT%H%M%S}",
+                   f"DTEND;TZID=America/New_York:{begin + timedelta(hours=hours):%Y%m%dT%H%M%S}"]
+        else:
+            ev += [f"DTSTART;VALUE=DATE:{day:%Y%m%d}", f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}"]
+        ev.append(f"LOCATION:{_escape(rng.choice(('Main St', 'Airport, Gate 4', 'Downtown')))}")
+        ev.append(f"DESCRIPTION:{desc}")
+        overrides = []
+        if kind < 0.6 and rng.random() < recurring:
+            weeks = rng.randint(4, 26)
+            ev.append(f"RRULE:FREQ=WEEKLY;COUNT={weeks}")
+            skip = begin + timedelta(weeks=rng.randrange(1, weeks))
+            ev.append(f"EXDATE:{skip:%Y%m%dT%H%M%SZ}")
+            moved = begin + timedelta(weeks=rng.randrange(1, weeks))
+            overrides.append(["BEGIN:VEVENT", f"UID:{uid}", f"RECURRENCE-ID:{moved:%Y%m%dT%H%M%SZ}",
+                              f"DTSTART:{moved + timedelta(hours=2):%Y%m%dT%H%M%SZ}",
+                              f"DTEND:{moved + timedelta(hours=2 + hours):%Y%m%dT%H%M%SZ}",
+                              "SUMMARY:Moved shift",
+                              "STATUS:CANCELLED" if rng.random() < 0.3 else "STATUS:CONFIRMED",
+                              "END:VEVENT"])
+        ev.append("END:VEVENT")
+        for line in ev:
+            out += fold(line)
+        for o in overrides:
+            for line in o:
+                out += fold(line)
+    out.append("END:VCALENDAR")
+    return "\r\n".join(out) + "\r\n"
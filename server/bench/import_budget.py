@@ -0,0 +1,86 @@
+# server/bench/import_budget.py
+"""
+Import-time budget for cold starts.
+
+    cd server && python -m bench.import_budget
+    python -m bench.import_budget --app-ms 800 --handler-ms 50 --top 15
+
+Imports the FastAPI app and the serverless weekly handler (src/api/) each
+in a fresh interpreter under `-X importtime`, and fails (exit 1) if either
+takes longer than its budget or if a module that should load on first use
+(Gemini SDK, google-auth, NumPy, ...) was imported eagerly. Prints the
+slowest modules by self time so a regression is easy to pin down.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+HANDLER = SERVER_DIR.parent / "src" / "api" / " weekly.py"
+
+# must not be imported by `import app` (see "Optional deps" in app.py)
+LAZY = ("google.generativeai", "google.auth", "numpy", "services.columns", "grpc", "w2w")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(code: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """(total ms, [(module, self us, cumulative us)]) for running `code` in a new interpreter."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SERVER_DIR, env=env,
+                       capture_output=True, text=True, timeout=120)
+    if r.returncode:
+        raise SystemExit(f"import failed:\n{r.stderr[-2000:]}")
+    mods, total = [], 0
+    for m in _LINE.finditer(r.stderr):
+        self_us, cum_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        mods.append((name, self_us, cum_us))
+        if len(indent) == 1:   # top-level imports add up to the whole import
+            total += cum_us
+    return total / 1000, mods
+
+
+def report(label: str, ms: float, budget: float, mods: List[Tuple[str, int, int]], top: int) -> bool:
+    ok = ms <= budget
+    print(f"{label:<10} {ms:8.1f} ms  (budget {budget:.0f} ms){'' if ok else '  OVER BUDGET'}")
+    for name, self_us, cum_us in sorted(mods, key=lambda m: -m[1])[:top]:
+        print(f"    {self_us / 1000:8.1f} ms self {cum_us / 1000:8.1f} ms cumulative  {name}")
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--app-ms", type=float, default=1000, help="budget for `import app`")
+    ap.add_argument("--handler-ms", type=float, default=50, help="budget for the serverless handler")
+    ap.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "TASKS_DB_PATH": os.path.join(tmp, "budget.db"), "PYTHONDONTWRITEBYTECODE": "1"}
+        env.pop("PYTHONPATH", None)
+        base_ms, base_mods = measure("pass", env)   # interpreter startup (site, encodings)
+        startup = {m[0] for m in base_mods}
+        app_ms, app_mods = measure("import app", env)
+        handler_ms, handler_mods = measure(
+            f"import importlib.util as u; s = u.spec_from_file_location('weekly', {str(HANDLER)!r}); "
+            "s.loader.exec_module(u.module_from_spec(s))", env)
+
+    app_mods = [m for m in app_mods if m[0] not in startup]
+    handler_mods = [m for m in handler_mods if m[0] not in startup]
+    ok = report("app", app_ms - base_ms, args.app_ms, app_mods, args.top)
+    ok = report("handler", handler_ms - base_ms, args.handler_ms, handler_mods, args.top) and ok
+    eager = sorted(n for n, _, _ in app_mods if any(n == p or n.startswith(p + ".") for p in LAZY))
+    if eager:
+        print(f"imported eagerly (should load on first use): {', '.join(eager)}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# server/bench/load_workers.py
+"""
+Load test: throughput vs. uvicorn worker count on one box.
+
+    cd server && python -m bench.load_workers --workers 1,2,4 --duration 10
+
+For each worker count it starts `uvicorn app:app --workers N` on a fresh
+SQLite file, seeds tasks through /tasks/bulk, then drives a read-heavy mix
+(paged /tasks, /metrics/weekly, PATCH /tasks/{id}) from several client
+processes and reports requests/s and latency percentiles.
+
+Before stopping each server it checks that every worker agrees: a write is
+made, then many fresh connections (spread over the workers) must all see
+the new version on /tasks/changes and the patched status in /tasks.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _task(i: int) -> dict:
+    day = 1 + i % 28
+    return {
+        "id": f"bench-{i}", "title": f"Task {i}", "priority": random.choice(["low", "medium", "high"]),
+        "status": random.choice(["todo", "in-progress", "done"]),
+        "createdAt": f"2025-03-{day:02d}T09:00:00", "updatedAt": f"2025-03-{day:02d}T17:00:00",
+        "dueDate": f"2025-03-{day:02d}T18:00:00", "timeSpentMs": random.randint(0, 8) * 3_600_000,
+    }
+
+
+def start_server(workers: int, db: str, port: int) -> subprocess.Popen:
+    # one secret for every worker, so a session issued by one is accepted by the others
+    env = {**os.environ, "TASK_STORE": "sqlite", "TASKS_DB_PATH": db,
+           "SESSION_SECRET": os.environ.get("SESSION_SECRET") or "load-workers-bench"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", str(SERVER_DIR),
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=SERVER_DIR,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+async def _drive(base: str, duration: float, concurrency: int, n_tasks: int) -> Dict[str, list]:
+    lat: Dict[str, list] = {"list": [], "metrics": [], "patch": []}
+    errors = 0
+    stop = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as c:
+        async def one():
+            nonlocal errors
+            while time.perf_counter() < stop:
+                r = random.random()
+                t0 = time.perf_counter()
+                if r < 0.6:
+                    kind, resp = "list", await c.get("/tasks", params={"limit": 200, "status": "todo"})
+                elif r < 0.9:
+                    kind, resp = "metrics", await c.get("/metrics/weekly", params={"weeks": 8})
+                else:
+                    tid = f"bench-{random.randrange(n_tasks)}"
+                    kind, resp = "patch", await c.patch(f"/tasks/{tid}", json={"timeSpentMs": random.randint(0, 10**7)})
+                if resp.status_code >= 400:
+                    errors += 1
+                lat[kind].append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+    lat["errors"] = [errors]
+    return lat
+
+
+def _client(args) -> Dict[str, list]:
+    return asyncio.run(_drive(*args))
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))] * 1000 if xs else 0.0
+
+
+def check_consistency(base: str, probes: int = 40) -> bool:
+    tid = "bench-0"
+    with httpx.Client(base_url=base) as c:
+        c.patch(f"/tasks/{tid}", json={"status": "done"})
+        want = c.get("/tasks/changes", params={"since": 0}).json()["version"]
+    seen = set()
+    for _ in range(probes):
+        # new connection each time so the kernel spreads them over workers
+        with httpx.Client(base_url=base) as c:
+            v = c.get("/tasks/changes", params={"since": want}).json()["version"]
+            status = next(t["status"] for t in c.get("/tasks", params={"fields": "status"}).json() if t["id"] == tid)
+            seen.add((v >= want, status))
+    return seen == {(True, "done")}
+
+
+def run(workers: int, duration: float, concurrency: int, clients: int, n_tasks: int) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = start_server(workers, os.path.join(tmp, "tasks.db"), port)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            items = [_task(i) for i in range(n_tasks)]
+            for i in range(0, n_tasks, 5000):
+                httpx.post(f"{base}/tasks/bulk", json=items[i:i + 5000], timeout=60).raise_for_status()
+            _client((base, 1.0, 4, n_tasks))  # warm every worker's caches
+            t0 = time.perf_counter()
+            with mp.Pool(clients) as pool:
+                parts = pool.map(_client, [(base, duration, concurrency, n_tasks)] * clients)
+            elapsed = time.perf_counter() - t0
+            consistent = check_consistency(base)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+    every = [x for p in parts for k in ("list", "metrics", "patch") for x in p[k]]
+    return {
+        "workers": workers,
+        "requests": len(every),
+        "rps": round(len(every) / elapsed, 1),
+        "p50_ms": round(_pct(every, 0.50), 2),
+        "p99_ms": round(_pct(every, 0.99), 2),
+        "errors": sum(p["errors"][0] for p in parts),
+        "consistent": consistent,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--concurrency", type=int, default=32, help="in-flight requests per client process")
+    ap.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--tasks", type=int, default=5000)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}  consistent")
+    for n in (int(x) for x in args.workers.split(",")):
+        r = run(n, args.duration, args.concurrency, args.clients, args.tasks)
+        results.append(r)
+        print(f"{r['workers']:>7} {r['rps']:>9} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>6}  {r['consistent']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
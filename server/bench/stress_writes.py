@@ -0,0 +1,152 @@
+# server/bench/stress_writes.py
+"""
+Concurrency stress test for task writes.
+
+    cd server && python -m bench.stress_writes --writers 64 --seconds 10 --workers 2
+
+Runs against a real `uvicorn --workers N` on a fresh SQLite file:
+
+1. counters: many writers increment `estimateMinutes` on a few hot tasks
+   with GET + PATCH If-Match, retrying on 409. No increment may be lost:
+   each task's final value must equal the increments acknowledged for it.
+2. timers vs. sync: each writer owns one synced shift task and keeps
+   PATCHing `timeSpentMs` (no If-Match) while /w2w/sync-to-tasks runs in a
+   loop against a changing fake feed. The sync must never clobber a
+   timer: each task ends with its owner's last value.
+3. throughput: blind PATCHes on distinct tasks, for comparison with the
+   contended runs above.
+
+Exits non-zero if a check fails.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict
+
+import httpx
+
+from bench.load_workers import _free_port, start_server
+from devtools.fake_ics import serve_in_thread
+
+
+def _task(tid: str) -> dict:
+    return {"id": tid, "title": tid, "priority": "low", "status": "todo",
+            "createdAt": "2025-01-01T00:00:00", "updatedAt": "2025-01-01T00:00:00", "estimateMinutes": 0}
+
+
+async def counters(c: httpx.AsyncClient, writers: int, hot: int, seconds: float) -> bool:
+    ids = [f"hot-{i}" for i in range(hot)]
+    await c.post("/tasks/bulk", json=[_task(t) for t in ids])
+    acked: Counter = Counter()
+    conflicts = 0
+    stop = time.perf_counter() + seconds
+
+    async def writer():
+        nonlocal conflicts
+        while time.perf_counter() < stop:
+            tid = random.choice(ids)
+            r = await c.get(f"/tasks/{tid}")
+            cur = r.json()["estimateMinutes"]
+            r = await c.patch(f"/tasks/{tid}", json={"estimateMinutes": cur + 1},
+                              headers={"If-Match": r.headers["etag"]})
+            if r.status_code == 409:
+                conflicts += 1
+            elif r.status_code == 200:
+                acked[tid] += 1
+
+    await asyncio.gather(*(writer() for _ in range(writers)))
+    final = {t: (await c.get(f"/tasks/{t}")).json()["estimateMinutes"] for t in ids}
+    ok = all(final[t] == acked[t] for t in ids)
+    print(f"counters   : {sum(acked.values())} increments, {conflicts} conflicts (retried), "
+          f"lost={sum(acked.values()) - sum(final.values())}  {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def timers_vs_sync(c: httpx.AsyncClient, writers: int, seconds: float, fake) -> bool:
+    r = await c.post("/w2w/sync-to-tasks")
+    r.raise_for_status()
+    ids = sorted(t["id"] for t in (await c.get("/tasks", params={"source": "w2w", "fields": "id"})).json())
+    ids = ids[:writers]
+    last: Dict[str, int] = {}
+    syncs = 0
+    stop = time.perf_counter() + seconds
+
+    async def timer(tid: str):
+        n = 0
+        while time.perf_counter() < stop:
+            n += 1
+            r = await c.patch(f"/tasks/{tid}", json={"timeSpentMs": n})
+            if r.status_code == 200:
+                last[tid] = n
+
+    async def syncer():
+        nonlocal syncs
+        while time.perf_counter() < stop:
+            fake.bump()   # new descriptions -> every synced task is an update
+            (await c.post("/w2w/sync-to-tasks")).raise_for_status()
+            syncs += 1
+
+    await asyncio.gather(syncer(), *(timer(t) for t in ids))
+    tasks = {t["id"]: t for t in (await c.get("/tasks", params={"source": "w2w"})).json()}
+    lost = [t for t in ids if tasks[t]["timeSpentMs"] != last.get(t)]
+    print(f"timer/sync : {len(ids)} timers, {syncs} syncs, clobbered={len(lost)}  {'OK' if not lost else 'FAIL'}")
+    return not lost
+
+
+async def throughput(c: httpx.AsyncClient, writers: int, seconds: float) -> None:
+    ids = [f"flat-{i}" for i in range(writers)]
+    await c.post("/tasks/bulk", json=[_task(t) for t in ids])
+    done = 0
+    stop = time.perf_counter() + seconds
+
+    async def writer(tid: str):
+        nonlocal done
+        while time.perf_counter() < stop:
+            await c.patch(f"/tasks/{tid}", json={"timeSpentMs": random.randint(0, 10**6)})
+            done += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(writer(t) for t in ids))
+    print(f"throughput : {done / (time.perf_counter() - t0):.0f} uncontended PATCH/s")
+
+
+async def main_async(args, base: str, fake) -> bool:
+    limits = httpx.Limits(max_connections=args.writers + 8)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as c:
+        ok = await counters(c, args.writers, args.hot, args.seconds)
+        ok &= await timers_vs_sync(c, min(args.writers, 30), args.seconds, fake)
+        await throughput(c, args.writers, args.seconds)
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--writers", type=int, default=64)
+    ap.add_argument("--hot", type=int, default=4, help="tasks shared by the counter writers")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    args = ap.parse_args()
+
+    fake_srv, feed_url = serve_in_thread(events=40)
+    os.environ["W2W_ICS_URL"] = feed_url
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = start_server(args.workers, os.path.join(tmp, "tasks.db"), port)
+        try:
+            ok = asyncio.run(main_async(args, f"http://127.0.0.1:{port}", fake_srv.state))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+            fake_srv.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+# server/bench/suite.py
+"""
+Benchmark suite for the hot paths, on seeded synthetic data.
+
+    cd server && python -m bench.suite --out results.json
+    python -m bench.suite --baseline results.json --threshold 0.15   # exit 1 on regression
+    python -m bench.suite --tasks 1000,10000,100000,1000000 --only 'tasks|weekly'
+
+Cases run in process (parser, calendar index, weekly metrics, store
+queries, sync planning) and through the ASGI app (GET /tasks,
+/metrics/weekly, /schedule/free-slots, POST /w2w/sync-to-tasks against a
+local fake feed), each
+at several data sizes. Task cases grow one temporary SQLite store from the
+smallest size up.
+
+Each case is warmed up once, then repeated until `--min-time` has passed
+(at least `--repeat` times); the median is what gets compared. Results are
+written as JSON; with `--baseline`, any case whose median grew by more
+than `--threshold` (and by more than `--floor-ms`) is a regression.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bench.generators import make_ics, make_tasks
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# a case's setup gets the size and returns the callable to time (plain or async)
+Setup = Callable[[int], Callable[[], Any]]
+
+
+@dataclass
+class Case:
+    name: str
+    axis: str          # "tasks" or "events": which size list it runs over
+    setup: Setup
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, axis: str) -> Callable[[Setup], Setup]:
+    def register(fn: Setup) -> Setup:
+        CASES.append(Case(name, axis, fn))
+        return fn
+    return register
+
+
+# ───────────── environment ─────────────
+class Env:
+    """The app module (imported once, on a temporary SQLite file) plus a local feed."""
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.tmp = tempfile.TemporaryDirectory()
+        from devtools.fake_ics import serve_in_thread
+        self.feed_server, self.feed_url = serve_in_thread(events=1)
+        os.environ.update(TASK_STORE="sqlite", TASKS_DB_PATH=os.path.join(self.tmp.name, "bench.db"),
+                          W2W_ICS_URL=self.feed_url, LLM_BACKEND="fake")
+        import app
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.tasks_loaded = 0
+        self._client = None
+        self._ics: Dict[int, str] = {}
+
+    def grow_tasks(self, n: int) -> None:
+        """Make the store hold the first `n` generated tasks."""
+        if n <= self.tasks_loaded:
+            return
+        Task, gen = self.app.Task, make_tasks(n, self.seed)
+        for _ in range(self.tasks_loaded):
+            next(gen)
+        batch = []
+        for t in gen:
+            batch.append(Task.model_validate(t))
+            if len(batch) == 10_000:
+                self.app.STORE.put_many(batch)
+                batch = []
+        if batch:
+            self.app.STORE.put_many(batch)
+        self.tasks_loaded = n
+
+    def ics(self, events: int) -> str:
+        if events not in self._ics:
+            self._ics[events] = make_ics(events, self.seed)
+        return self._ics[events]
+
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app.app),
+                                             base_url="http://bench", timeout=600)
+        return self._client
+
+    def get(self, path: str, **params) -> Callable[[], Any]:
+        async def call():
+            r = await self.client().get(path, params=params)
+            r.raise_for_status()
+        return call
+
+    def close(self) -> None:
+        if self._client is not None:
+            self.loop.run_until_complete(self._client.aclose())
+        self.loop.run_until_complete(self.app.HTTP.aclose())
+        self.loop.close()
+        self.feed_server.shutdown()
+        self.tmp.cleanup()
+
+
+ENV: Optional[Env] = None
+
+
+# ───────────── in-process cases ─────────────
+@case("ics.parse_ics_events", "events")
+def _ics_parse(n):
+    from services.ics import parse_ics_events
+    text = ENV.ics(n)
+    return lambda: parse_ics_events(text)
+
+
+@case("ics.calendar_index", "events")
+def _ics_index(n):
+    lines = ENV.ics(n).splitlines()
+    return lambda: ENV.app._parse_feed(lines)
+
+
+@case("calendar.window_14d", "events")
+def _cal_window(n):
+    cal = ENV.app._parse_feed(ENV.ics(n).splitlines())
+    lo = datetime.now(timezone.utc).timestamp()
+    return lambda: cal.window(lo, lo + 14 * 86400)
+
+
+@case("sync.plan_unchanged", "events")
+def _sync_plan(n):
+    from services.store import MemoryTaskStore
+    from services.sync import SyncEngine
+    cal = ENV.app._parse_feed(ENV.ics(n).splitlines())
+    rows = [dict(id=f"w2w-{ev['id']}", title=ev["title"], description=ev.get("raw", {}).get("description"),
+                 priority="medium", status="todo", createdAt=ev["start"], updatedAt=ev["start"],
+                 dueDate=ev["end"], externalId=f"w2w-{ev['id']}", source="w2w") for ev in cal]
+    store = MemoryTaskStore(ENV.app.Task)
+    engine = SyncEngine(store)
+    plan = engine.plan("w2w", rows, horizon=cal.horizon)
+    store.apply(plan.puts, plan.deletes)
+    engine.commit(plan)
+    return lambda: engine.plan("w2w", rows, horizon=cal.horizon)
+
+
+@case("metrics.weekly_build", "tasks")
+def _weekly_build(n):
+    from services.metrics import WeeklyMetrics, done_record
+    ENV.grow_tasks(n)
+    done = list(ENV.app.STORE.iter_by_status("done"))
+
+    def build():
+        w = WeeklyMetrics()
+        for t in done:
+            w.add(done_record(t))
+        return w.series(52)
+    return build
+
+
+@case("store.query_json_all", "tasks")
+def _query_all(n):
+    from services.store import TaskQuery
+    ENV.grow_tasks(n)
+    return lambda: ENV.app.STORE.query_json(TaskQuery())
+
+
+@case("store.query_json_todo_page", "tasks")
+def _query_page(n):
+    from services.store import TaskQuery
+    ENV.grow_tasks(n)
+    q = TaskQuery(status=("todo",), limit=201)
+    return lambda: ENV.app.STORE.query_json(q)
+
+
+# ───────────── through the ASGI app ─────────────
+@case("asgi.GET /tasks", "tasks")
+def _asgi_tasks(n):
+    ENV.grow_tasks(n)
+    get = ENV.get("/tasks")
+
+    async def cold():
+        ENV.app._TASKS_BODIES.clear()   # measure the query + serialization, not the body cache
+        await get()
+    return cold
+
+
+@case("asgi.GET /tasks?status=todo&limit=200", "tasks")
+def _asgi_tasks_page(n):
+    ENV.grow_tasks(n)
+    get = ENV.get("/tasks", status="todo", limit=200)
+
+    async def cold():
+        ENV.app._TASKS_BODIES.clear()
+        await get()
+    return cold
+
+
+@case("asgi.GET /metrics/weekly?weeks=12", "tasks")
+def _asgi_weekly(n):
+    ENV.grow_tasks(n)
+    return ENV.get("/metrics/weekly", weeks=12)
+
+
+@case("asgi.POST /w2w/sync-to-tasks", "events")
+def _asgi_sync(n):
+    ENV.feed_server.state.serve(ENV.ics(n).encode())
+    ENV.app.FEEDS.invalidate(ENV.feed_url)
+
+    async def sync():
+        r = await ENV.client().post("/w2w/sync-to-tasks")
+        r.raise_for_status()
+    return sync
+
+
+@case("asgi.GET /schedule/free-slots?days=60", "events")
+def _asgi_schedule(n):
+    ENV.feed_server.state.serve(ENV.ics(n).encode())
+    ENV.app.FEEDS.invalidate(ENV.feed_url)
+    ENV.grow_tasks(10_000)
+    get = ENV.get("/schedule/free-slots", days=60, dayStart=8, dayEnd=22)
+
+    async def cold():
+        ENV.app._SCHEDULE_CACHE.clear()   # measure the sweep, not the plan cache
+        await get()
+    return cold
+
+
+# ───────────── runner ─────────────
+def _measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    run = (lambda: ENV.loop.run_until_complete(fn())) if inspect.iscoroutinefunction(fn) else fn
+    run()   # warm-up: caches, lazy seeding, first fetch
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - t0)
+        if len(samples) >= 10_000:
+            break
+    samples.sort()
+    ms = [s * 1000 for s in samples]
+    return {
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 4),
+        "min_ms": round(ms[0], 4),
+        "runs": len(ms),
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(sizes: Dict[str, List[int]], only: Optional[str], repeat: int, min_time: float,
+        seed: int) -> Dict[str, Any]:
+    global ENV
+    ENV = Env(seed)
+    results: Dict[str, Any] = {}
+    pattern = re.compile(only) if only else None
+    try:
+        # task cases first, smallest store first, so the store only ever grows
+        for axis in ("tasks", "events"):
+            for n in sorted(sizes[axis]):
+                for c in CASES:
+                    name = f"{c.name}[{axis}={n}]"
+                    if c.axis != axis or (pattern and not pattern.search(name)):
+                        continue
+                    results[name] = r = _measure(c.setup(n), repeat, min_time)
+                    print(f"{name:<58} {r['median_ms']:>11.3f} ms  p95 {r['p95_ms']:>11.3f}  x{r['runs']}",
+                          flush=True)
+    finally:
+        ENV.close()
+    return {
+        "meta": {
+            "when": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_rev(), "python": sys.version.split()[0], "platform": platform.platform(),
+            "cpus": os.cpu_count(), "seed": seed, "sizes": sizes,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            floor_ms: float) -> List[str]:
+    """Print the comparison; returns the names of regressed cases."""
+    regressed = []
+    print(f"\n{'case':<58} {'base ms':>11} {'now ms':>11} {'change':>8}")
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        b, c = base["median_ms"], now["median_ms"]
+        change = (c - b) / b if b else 0.0
+        bad = change > threshold and c - b > floor_ms
+        if bad:
+            regressed.append(name)
+        print(f"{name:<58} {b:>11.3f} {c:>11.3f} {change:>+7.1%}{'  REGRESSION' if bad else ''}")
+    return regressed
+
+
+def _sizes(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--tasks", default="1000,10000,100000", help="task-store sizes (up to 1000000)")
+    ap.add_argument("--events", default="1000,10000", help="ICS feed sizes")
+    ap.add_argument("--only", help="regex over case names, e.g. 'ics|sync'")
+    ap.add_argument("--repeat", type=int, default=5, help="minimum timed runs per case")
+    ap.add_argument("--min-time", type=float, default=0.5, help="minimum seconds per case")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--baseline", help="results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed median slowdown (0.15 = +15%%)")
+    ap.add_argument("--floor-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    ap.add_argument("--list", action="store_true", help="list case names and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for c in CASES:
+            print(f"{c.name}  ({c.axis})")
+        return
+    current = run({"tasks": _sizes(args.tasks), "events": _sizes(args.events)},
+                  args.only, args.repeat, args.min_time, args.seed)
+    if args.out:
+        Path(args.out).write_text(json.dumps(current, indent=2))
+    if args.baseline:
+        regressed = compare(current, json.loads(Path(args.baseline).read_text()),
+                            args.threshold, args.floor_ms)
+        if regressed:
+            print(f"\n{len(regressed)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
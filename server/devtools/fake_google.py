@@ -0,0 +1,135 @@
+# server/devtools/fake_google.py
+"""
+Local stand-in for Google's signing-cert endpoint, for exercising
+/auth/google offline with locally generated keys.
+
+    python -m devtools.fake_google --port 8767 --max-age 300
+
+then set GOOGLE_CERTS_URL=http://127.0.0.1:8767/oauth2/v1/certs and sign
+in with a token the stub mints:
+
+    curl -X POST localhost:8767/mint -d '{"aud": "<client id>", "email": "me@example.com"}'
+
+GET /oauth2/v1/certs returns {key id: PEM certificate} with
+`Cache-Control: public, max-age=<max-age>` and counts hits so callers can
+check the cert cache. POST /rotate adds a new signing key (the old one is
+still served, as Google does during rotation).
+
+From Python: `server, url = serve_in_thread()`, then
+`server.state.mint({"aud": ..., "email": ...})` for a signed ID token.
+Needs google-auth and cryptography.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+
+def _keypair() -> Tuple[str, str]:
+    """(private key PEM, self-signed certificate PEM)."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google")])
+    now = dt.datetime.now(dt.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now - dt.timedelta(days=1)).not_valid_after(now + dt.timedelta(days=30))
+            .sign(key, hashes.SHA256()))
+    private = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+    return private, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class FakeGoogle:
+    def __init__(self, max_age: int = 300):
+        self.max_age = max_age
+        self.hits = 0
+        self.keys: List[Tuple[str, str, str]] = []   # (kid, private PEM, cert PEM), newest last
+        self._lock = threading.Lock()
+        self.rotate()
+
+    def rotate(self) -> str:
+        private, cert = _keypair()
+        with self._lock:
+            kid = f"fake-{len(self.keys) + 1}"
+            self.keys.append((kid, private, cert))
+        return kid
+
+    def certs(self) -> Dict[str, str]:
+        return {kid: cert for kid, _, cert in self.keys}
+
+    def mint(self, claims: Dict[str, Any], ttl: int = 3600, kid: Optional[str] = None) -> str:
+        """An RS256 ID token like Google's (iss/iat/exp filled in unless given)."""
+        kid, private, _ = next(k for k in self.keys if k[0] == kid) if kid else self.keys[-1]
+        now = int(time.time())
+        payload = {"iss": "https://accounts.google.com", "iat": now, "exp": now + ttl,
+                   "sub": "1234567890", **claims}
+        return jwt.encode(crypt.RSASigner.from_string(private, key_id=kid), payload).decode()
+
+
+def _handler(state: FakeGoogle):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # keep test output quiet
+            pass
+
+        def do_GET(self):
+            with state._lock:
+                state.hits += 1
+            if self.path.split("?")[0] != "/oauth2/v1/certs":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps(state.certs()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", f"public, max-age={state.max_age}, must-revalidate, no-transform")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path == "/mint":
+                claims = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                body = state.mint(claims).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path == "/rotate":
+                state.rotate()
+            self.send_response(204)
+            self.end_headers()
+
+    return Handler
+
+
+def serve_in_thread(max_age: int = 300, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a server on a background thread; returns (server, certs url)."""
+    state = FakeGoogle(max_age)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    server.state = state  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/oauth2/v1/certs"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--port", type=int, default=8767)
+    ap.add_argument("--max-age", type=int, default=300)
+    args = ap.parse_args()
+    state = FakeGoogle(args.max_age)
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"serving http://127.0.0.1:{args.port}/oauth2/v1/certs (max-age {args.max_age})")
+    srv.serve_forever()
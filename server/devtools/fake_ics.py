@@ -0,0 +1,146 @@
+# server/devtools/fake_ics.py
+"""
+Local fake ICS server for exercising the feed cache offline.
+
+    python -m devtools.fake_ics --port 8765 --events 500 --delay 2
+
+then point W2W_ICS_URL / GCAL_ICS_URL at http://127.0.0.1:8765/feed.ics.
+
+The feed honours If-None-Match / If-Modified-Since (304), can be slowed
+down with --delay or `?delay=` to simulate a slow upstream, supports
+`Range: bytes=a-b` (206; set `state.ranges = False` to ignore it like
+some servers do), and counts requests so callers can check
+coalescing. POST /bump changes the body.
+
+From Python: `server, url = serve_in_thread(events=100)`.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def make_ics(events: int = 50, revision: int = 0, start: datetime | None = None,
+             description_len: int = 200) -> str:
+    """Deterministic feed: one 8h shift per day starting at `start`."""
+    start = (start or datetime.now(timezone.utc)).replace(hour=9, minute=0, second=0, microsecond=0)
+    out = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//fake-ics//EN"]
+    desc = ("Shift notes rev %d. " % revision) * max(1, description_len // 20)
+    for i in range(events):
+        s = start + timedelta(days=i)
+        e = s + timedelta(hours=8)
+        out += [
+            "BEGIN:VEVENT",
+            f"UID:fake-{i}@fake-ics",
+            f"SUMMARY:Shift {i}",
+            f"DTSTART:{s:%Y%m%dT%H%M%SZ}",
+            f"DTEND:{e:%Y%m%dT%H%M%SZ}",
+            "LOCATION:Front desk",
+        ]
+        # fold DESCRIPTION at 75 octets like real exporters
+        line = "DESCRIPTION:" + desc
+        out.append(line[:75])
+        out += [" " + line[j:j + 74] for j in range(75, len(line), 74)]
+        out.append("END:VEVENT")
+    out.append("END:VCALENDAR")
+    return "\r\n".join(out) + "\r\n"
+
+
+class FakeICS:
+    def __init__(self, events: int = 50, delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.revision = 0
+        self.hits = 0
+        self.full_bodies = 0
+        self.ranges = True
+        self._lock = threading.Lock()
+        self._render()
+
+    def _render(self) -> None:
+        self.serve(make_ics(self.events, self.revision).encode())
+
+    def serve(self, body: bytes) -> None:
+        """Replace the feed body (e.g. with a generated one from bench.generators)."""
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()[:16]
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def bump(self) -> None:
+        with self._lock:
+            self.revision += 1
+            self._render()
+
+
+def _handler(state: FakeICS):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # keep test output quiet
+            pass
+
+        def do_GET(self):
+            q = parse_qs(urlparse(self.path).query)
+            with state._lock:
+                state.hits += 1
+            delay = float(q.get("delay", [state.delay])[0])
+            if delay:
+                time.sleep(delay)
+            if state.etag == self.headers.get("If-None-Match") or (
+                not self.headers.get("If-None-Match")
+                and self.headers.get("If-Modified-Since") == state.last_modified
+            ):
+                self.send_response(304)
+                self.end_headers()
+                return
+            body, status = state.body, 200
+            rng = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+            if rng and state.ranges:
+                lo = int(rng.group(1))
+                hi = int(rng.group(2)) if rng.group(2) else len(body) - 1
+                body, status = body[lo:hi + 1], 206
+            else:
+                with state._lock:
+                    state.full_bodies += 1
+            self.send_response(status)
+            self.send_header("Content-Type", "text/calendar; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", state.etag)
+            self.send_header("Last-Modified", state.last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/bump":
+                state.bump()
+            self.send_response(204)
+            self.end_headers()
+
+    return Handler
+
+
+def serve_in_thread(events: int = 50, delay: float = 0.0, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a server on a background thread; returns (server, feed url)."""
+    state = FakeICS(events, delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    server.state = state  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/feed.ics"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--events", type=int, default=50)
+    ap.add_argument("--delay", type=float, default=0.0)
+    args = ap.parse_args()
+    state = FakeICS(args.events, args.delay)
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"serving http://127.0.0.1:{args.port}/feed.ics ({args.events} events)")
+    srv.serve_forever()
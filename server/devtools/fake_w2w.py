@@ -0,0 +1,132 @@
+# server/devtools/fake_w2w.py
+"""
+Local stub of the W2W shifts API, for exercising server/w2w.py offline.
+
+    python -m devtools.fake_w2w --port 8766 --per-day 3 --delay 0.2
+
+then set W2W_BASE_URL=http://127.0.0.1:8766, W2W_API_KEY=anything and
+W2W_ACCOUNT_ID=demo.
+
+GET /v1/accounts/<id>/shifts?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive)
+returns {"shifts": [...], "nextCursor": ...} paged by `limit` (and
+`cursor`). Shifts are deterministic per date and revision; requests
+without a bearer token get 401. `--delay` / `?delay=` slow every page
+down, and the server records the ranges asked for so callers can check
+that only missing chunks were fetched. POST /bump changes every shift.
+
+From Python: `server, base_url = serve_in_thread(per_day=3)`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ROLES = ("Front desk", "Kitchen", "Bar", "Café floor")
+LOCATIONS = ("Main St", "Airport", "Downtown")
+
+
+class FakeW2W:
+    def __init__(self, per_day: int = 3, delay: float = 0.0):
+        self.per_day = per_day
+        self.delay = delay
+        self.revision = 0
+        self.hits = 0
+        self.ranges: List[Tuple[str, str]] = []   # (start, end) of first pages served
+        self._lock = threading.Lock()
+
+    def shifts(self, day: date) -> List[Dict[str, str]]:
+        rng = random.Random(f"{day.isoformat()}:{self.revision}")
+        out = []
+        for i in range(self.per_day):
+            begin = datetime(day.year, day.month, day.day, rng.choice((6, 8, 12, 16, 22)), tzinfo=timezone.utc)
+            out.append({
+                "id": f"{day:%Y%m%d}-{i}",
+                "positionName": rng.choice(ROLES),
+                "locationName": rng.choice(LOCATIONS),
+                "start": begin.isoformat(),
+                "end": (begin + timedelta(hours=rng.choice((4, 6, 8)))).isoformat(),
+                "notes": f"rev {self.revision}",
+            })
+        return out
+
+    def bump(self) -> None:
+        with self._lock:
+            self.revision += 1
+
+
+def _handler(state: FakeW2W):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # keep test output quiet
+            pass
+
+        def _json(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            with state._lock:
+                state.hits += 1
+            delay = float(q.get("delay", state.delay))
+            if delay:
+                time.sleep(delay)
+            if not re.fullmatch(r"/v1/accounts/[^/]*/shifts", url.path):
+                return self._json(404, {"error": "not found"})
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._json(401, {"error": "missing bearer token"})
+            try:
+                start, end = date.fromisoformat(q["start"]), date.fromisoformat(q["end"])
+                limit, cursor = int(q.get("limit", 100)), int(q.get("cursor", 0))
+            except (KeyError, ValueError):
+                return self._json(400, {"error": "start and end (YYYY-MM-DD) are required"})
+            if cursor == 0:
+                with state._lock:
+                    state.ranges.append((q["start"], q["end"]))
+            shifts = []
+            for i in range((end - start).days + 1):
+                shifts += state.shifts(start + timedelta(days=i))
+            page = shifts[cursor:cursor + limit]
+            more = cursor + limit < len(shifts)
+            self._json(200, {"shifts": page, "nextCursor": str(cursor + limit) if more else None})
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/bump":
+                state.bump()
+            self.send_response(204)
+            self.end_headers()
+
+    return Handler
+
+
+def serve_in_thread(per_day: int = 3, delay: float = 0.0, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a server on a background thread; returns (server, base url)."""
+    state = FakeW2W(per_day, delay)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    server.state = state  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--per-day", type=int, default=3)
+    ap.add_argument("--delay", type=float, default=0.0)
+    args = ap.parse_args()
+    state = FakeW2W(args.per_day, args.delay)
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"serving http://127.0.0.1:{args.port}/v1/accounts/demo/shifts ({args.per_day} shifts/day)")
+    srv.serve_forever()
@@ -0,0 +1,69 @@
+# server/services/cache.py
+"""
+Small bounded LRU cache with per-entry TTL.
+
+Entries expire after `ttl` seconds (or `negative_ttl` for results stored
+with ok=False, so failures are retried sooner) with +/- `jitter` spread so
+entries written together do not all expire together. The least recently
+used entry is evicted once `maxsize` is reached.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, negative_ttl: float = 60,
+                 jitter: float = 0.1):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.jitter = jitter
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or MISSING if absent/expired."""
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return MISSING
+            expires, value = hit
+            if expires <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ok: bool = True, ttl: Optional[float] = None) -> None:
+        base = ttl if ttl is not None else (self.ttl if ok else self.negative_ttl)
+        expires = time.monotonic() + base * (1 + random.uniform(-self.jitter, self.jitter))
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # async callers use these; SharedCache runs its SQLite I/O off the event loop
+    async def aget(self, key: Hashable) -> Any:
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: Any, ok: bool = True, ttl: Optional[float] = None) -> None:
+        self.set(key, value, ok, ttl)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,201 @@
+# server/services/changes.py
+"""
+Versioned change log for delta sync.
+
+Every task write is recorded under a monotonic `version` (one per batch).
+Clients remember the last version they saw and ask for what happened since:
+
+    changes, reset, version = CHANGES.since(v)
+
+The log is compacted as it goes: it keeps only the latest change per task
+id (an edit supersedes the previous one, a delete leaves a tombstone), and
+once more than `max_entries` ids are tracked the oldest are dropped and
+`floor` is raised. A client whose version is below the floor, or from
+another process lifetime (`epoch`), gets `reset=True` and should refetch
+/tasks.
+
+`wait()` lets async handlers (long-poll, SSE) sleep until a newer version
+exists; writes come from worker threads, so waiters are woken through
+their own loop.
+
+With a shared (SQLite) store the log lives in the database instead:
+`StoreChangeLog` reads the store's `changes` table, so every worker process
+sees the same versions and the same deltas. Use `make_change_log(store)`.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class ChangeLog:
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self.floor = 0   # changes at or below this version may be gone
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._log: "OrderedDict[str, Tuple[int, Optional[Any]]]" = OrderedDict()  # id -> (version, task|None)
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def record(self, puts: Iterable[Any], deletes: Iterable[str] = ()) -> int:
+        """Append one batch (tasks written, ids deleted); returns its version."""
+        with self._lock:
+            v = self._version + 1
+            n = 0
+            for t in puts:
+                self._log[t.id] = (v, t)
+                self._log.move_to_end(t.id)
+                n += 1
+            for tid in deletes:
+                self._log[tid] = (v, None)
+                self._log.move_to_end(tid)
+                n += 1
+            if not n:
+                return self._version
+            self._version = v
+            while len(self._log) > self.max_entries:
+                _, (old, _) = self._log.popitem(last=False)
+                self.floor = max(self.floor, old)
+        self._wake_all()
+        return v
+
+    def delta(self, version: int, epoch: Optional[str] = None) -> Tuple[bool, int, List[Tuple[int, str, Optional[Any]]]]:
+        """(reset?, current version, [(version, id, task or None if deleted)] oldest first)."""
+        with self._lock:
+            current = self._version
+            if (epoch and epoch != self._epoch) or version < self.floor or version > current:
+                return True, current, []
+            out = []
+            for tid in reversed(self._log):
+                v, t = self._log[tid]
+                if v <= version:
+                    break
+                out.append((v, tid, t))
+        out.reverse()
+        return False, current, out
+
+    def since(self, version: int, epoch: Optional[str] = None) -> Tuple[List[Dict[str, Any]], bool, int]:
+        """(changes newer than `version` oldest first, reset?, current version)."""
+        reset, current, out = self.delta(version, epoch)
+        return [
+            {"version": v, "op": "delete", "id": tid} if t is None
+            else {"version": v, "op": "upsert", "id": tid, "task": t.model_dump()}
+            for v, tid, t in out
+        ], reset, current
+
+    # ───────────── waiting ─────────────
+    def _latest(self) -> int:
+        """Newest version known without I/O (checked under the lock)."""
+        return self._version
+
+    def _wake_all(self) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass  # loop already closed
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Sleep until something newer than `version` exists; False on timeout."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self._latest() > version:
+                return True
+            self._waiters.append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if (loop, fut) in self._waiters:
+                    self._waiters.remove((loop, fut))
+
+
+class StoreChangeLog(ChangeLog):
+    """
+    Change log backed by a shared store's `changes` table. Local writes
+    wake local waiters immediately; writes from other processes are noticed
+    by one poller per process (every `poll` seconds, only while someone is
+    waiting), however many clients are parked.
+    """
+
+    def __init__(self, store: Any, poll: float = 0.25):
+        super().__init__()
+        self.store = store
+        self.poll = poll
+        self._seen = store.version
+        self._poller: Optional[asyncio.Task] = None
+
+    @property
+    def epoch(self) -> str:
+        return self.store.epoch
+
+    @property
+    def version(self) -> int:
+        return self.store.version
+
+    def record(self, puts: Iterable[Any], deletes: Iterable[str] = ()) -> int:
+        # the change rows were written with the batch; just wake local waiters
+        self._seen = self.store.version
+        self._wake_all()
+        return self._seen
+
+    def delta(self, version, epoch=None):
+        floor, rows = self.store.changes_since(version)
+        current = rows[-1][0] if rows else self.store.version
+        if (epoch and epoch != self.epoch) or version < floor or version > current:
+            return True, current, []
+        latest: Dict[str, Tuple[int, bool]] = {}
+        for seq, tid, deleted in rows:
+            latest.pop(tid, None)  # keep order of each id's last change
+            latest[tid] = (seq, deleted)
+        tasks = self.store.get_many([tid for tid, (_, d) in latest.items() if not d])
+        # an id missing from `tasks` was deleted by a write logged after the read
+        return False, current, [(seq, tid, None if d else tasks.get(tid))
+                                for tid, (seq, d) in latest.items()]
+
+    def _latest(self) -> int:
+        return self._seen
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        self._seen = max(self._seen, await asyncio.to_thread(lambda: self.store.version))
+        loop = asyncio.get_running_loop()
+        if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+            self._poller = loop.create_task(self._poll())
+        return await super().wait(version, timeout)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll)
+            if not self._waiters:
+                return
+            v = await asyncio.to_thread(lambda: self.store.version)
+            if v > self._seen:
+                self._seen = v
+                self._wake_all()
+
+
+def make_change_log(store: Any) -> ChangeLog:
+    return StoreChangeLog(store) if getattr(store, "shared", False) else ChangeLog()
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
@@ -0,0 +1,288 @@
+# server/services/columns.py
+"""
+Columnar mirror of the task set for analytics.
+
+Each task is one row across parallel NumPy arrays: epoch-ms timestamps,
+small-int codes for status/priority/source and int64 counters. `extend()`
+bulk-loads rows (a store scan) a chunk at a time with vectorized parsing;
+`upsert()`/`remove()` keep the mirror current in place afterwards. Queries
+are plain vectorized NumPy (`group_by`) and never touch the pydantic models.
+
+Missing timestamps/numbers are stored as NULL (int64 min).
+"""
+from __future__ import annotations
+
+import warnings
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from services.metrics import DoneRecord, iso_ms
+
+NULL = np.iinfo(np.int64).min
+DAY_MS = 86_400_000
+_DENSE_GROUPS = 1 << 22  # above this many possible groups, fall back to np.unique
+
+STATUSES = ("todo", "in-progress", "done")
+PRIORITIES = ("low", "medium", "high", "urgent")
+
+_INT_COLS = ("created", "updated", "due", "completed", "timeSpentMs", "estimateMinutes")
+_CODE_COLS = {"status": np.int8, "priority": np.int8, "source": np.int16}
+# a row as services.metrics.DoneRecord
+_RECORD_COLS = ("completed", "created", "due", "priority", "source", "timeSpentMs", "estimateMinutes")
+
+_EXTEND_CHUNK = 65_536   # rows parsed per vectorized step in extend()
+
+KEYS = ("status", "priority", "source", "week", "month")
+VALUES = ("timeSpentMs", "estimateMinutes", "cycleMs")  # cycleMs = completed - created
+
+
+def _ms(s: Optional[str]) -> int:
+    ms = iso_ms(s)
+    return NULL if ms is None else ms
+
+
+def _ms_array(values: Sequence[Optional[str]]) -> np.ndarray:
+    """_ms over many strings at once; NumPy parses ISO 8601 (offsets included) natively."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")   # it warns about explicit offsets, then applies them
+            # NaT is int64 min, i.e. NULL
+            return np.array([v or "NaT" for v in values]).astype("datetime64[ms]").astype(np.int64)
+    except ValueError:   # something NumPy cannot read: parse this chunk one by one
+        return np.fromiter((_ms(v) for v in values), np.int64, len(values))
+
+
+def _int_array(values: Sequence[Optional[int]]) -> np.ndarray:
+    return np.fromiter((NULL if v is None else v for v in values), np.int64, len(values))
+
+
+class TaskColumns:
+    def __init__(self, capacity: int = 1024) -> None:
+        self._cap = capacity
+        self._n = 0
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._sources: List[Optional[str]] = [None]  # code 0 = no source
+        self._source_code: Dict[Optional[str], int] = {None: 0}
+        self._cols: Dict[str, np.ndarray] = {c: np.full(capacity, NULL, np.int64) for c in _INT_COLS}
+        for c, dt in _CODE_COLS.items():
+            self._cols[c] = np.zeros(capacity, dt)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def clear(self) -> None:
+        self.__init__(self._cap)
+
+    # ───────────── writes ─────────────
+    def _grow(self) -> None:
+        self._cap *= 2
+        for c, a in self._cols.items():
+            b = np.full(self._cap, NULL if a.dtype == np.int64 else 0, a.dtype)
+            b[: self._n] = a[: self._n]
+            self._cols[c] = b
+
+    def _code_source(self, src: Optional[str]) -> int:
+        code = self._source_code.get(src)
+        if code is None:
+            code = self._source_code[src] = len(self._sources)
+            self._sources.append(src)
+        return code
+
+    def upsert(self, task: Any) -> None:
+        i = self._row.get(task.id)
+        if i is None:
+            if self._n == self._cap:
+                self._grow()
+            i = self._n
+            self._n += 1
+            self._ids.append(task.id)
+            self._row[task.id] = i
+        c = self._cols
+        updated = _ms(task.updatedAt)
+        c["created"][i] = _ms(task.createdAt)
+        c["updated"][i] = updated
+        c["due"][i] = _ms(task.dueDate)
+        c["completed"][i] = updated if task.status == "done" else NULL
+        c["timeSpentMs"][i] = NULL if task.timeSpentMs is None else task.timeSpentMs
+        c["estimateMinutes"][i] = NULL if task.estimateMinutes is None else task.estimateMinutes
+        c["status"][i] = STATUSES.index(task.status)
+        c["priority"][i] = PRIORITIES.index(task.priority)
+        c["source"][i] = self._code_source(task.source)
+
+    def extend(self, rows: Iterable[Any]) -> None:
+        """
+        Append many tasks (or store.scan() rows) whose ids are not in the
+        mirror yet, _EXTEND_CHUNK at a time with vectorized parsing. Ids
+        already present are upserted one by one instead.
+        """
+        it = iter(rows)
+        while chunk := list(islice(it, _EXTEND_CHUNK)):
+            fresh: Dict[str, Any] = {}
+            for r in chunk:
+                if r.id in self._row:
+                    self.upsert(r)
+                else:
+                    fresh[r.id] = r   # a repeated id keeps its last row
+            if fresh:
+                self._append(list(fresh.values()))
+
+    def _append(self, rows: List[Any]) -> None:
+        n = len(rows)
+        while self._n + n > self._cap:
+            self._grow()
+        lo, hi = self._n, self._n + n
+        c = self._cols
+        updated = _ms_array([r.updatedAt for r in rows])
+        status = np.fromiter((STATUSES.index(r.status) for r in rows), np.int8, n)
+        c["created"][lo:hi] = _ms_array([r.createdAt for r in rows])
+        c["updated"][lo:hi] = updated
+        c["due"][lo:hi] = _ms_array([r.dueDate for r in rows])
+        c["completed"][lo:hi] = np.where(status == STATUSES.index("done"), updated, NULL)
+        c["timeSpentMs"][lo:hi] = _int_array([r.timeSpentMs for r in rows])
+        c["estimateMinutes"][lo:hi] = _int_array([r.estimateMinutes for r in rows])
+        c["status"][lo:hi] = status
+        c["priority"][lo:hi] = np.fromiter((PRIORITIES.index(r.priority) for r in rows), np.int8, n)
+        c["source"][lo:hi] = np.fromiter((self._code_source(r.source) for r in rows), np.int16, n)
+        for i, r in enumerate(rows, start=lo):
+            self._row[r.id] = i
+        self._ids.extend(r.id for r in rows)
+        self._n = hi
+
+    def remove(self, task_id: str) -> None:
+        """Swap the last row into the hole so the arrays stay dense."""
+        i = self._row.pop(task_id, None)
+        if i is None:
+            return
+        last = self._n - 1
+        if i != last:
+            moved = self._ids[last]
+            for a in self._cols.values():
+                a[i] = a[last]
+            self._ids[i] = moved
+            self._row[moved] = i
+        self._ids.pop()
+        self._n = last
+
+    # ───────────── reads ─────────────
+    def _record(self, done: int, created: int, due: int, pr: int, src: int,
+                spent: int, est: int) -> DoneRecord:
+        def val(v: int) -> Optional[int]:
+            return None if v == NULL else v
+        return done, val(created), val(due), PRIORITIES[pr], self._sources[src], val(spent), val(est)
+
+    def done_record(self, task_id: str) -> Optional[DoneRecord]:
+        """What services.metrics reads from this task as the mirror holds it (None: absent or not done)."""
+        i = self._row.get(task_id)
+        if i is None or self._cols["completed"][i] == NULL:
+            return None
+        return self._record(*(int(self._cols[k][i]) for k in _RECORD_COLS))
+
+    def done_records(self) -> Iterator[DoneRecord]:
+        """done_record() of every done task, for seeding the aggregates."""
+        rows = np.flatnonzero(self._cols["completed"][: self._n] != NULL)
+        for vals in zip(*(self._cols[k][rows].tolist() for k in _RECORD_COLS)):
+            yield self._record(*vals)
+
+    def col(self, name: str) -> np.ndarray:
+        """Live view of the first n rows of a column (do not mutate)."""
+        if name == "cycleMs":
+            done, created = self._cols["completed"][: self._n], self._cols["created"][: self._n]
+            ok = (done != NULL) & (created != NULL) & (done >= created)
+            return np.where(ok, done - created, NULL)
+        return self._cols[name][: self._n]
+
+    def status_mask(self, status: str) -> np.ndarray:
+        return self.col("status") == STATUSES.index(status)
+
+    def source_mask(self, source: Optional[str]) -> np.ndarray:
+        code = self._source_code.get(source)
+        if code is None:
+            return np.zeros(self._n, bool)
+        return self.col("source") == code
+
+    def _key(self, name: str, time_col: str) -> tuple[np.ndarray, Any]:
+        """(int codes, decoder) for a group-by key."""
+        if name == "status":
+            return self.col("status").astype(np.int64), lambda k: STATUSES[k]
+        if name == "priority":
+            return self.col("priority").astype(np.int64), lambda k: PRIORITIES[k]
+        if name == "source":
+            return self.col("source").astype(np.int64), lambda k: self._sources[k]
+        ts = self.col(time_col)
+        days = ts // DAY_MS
+        if name == "week":
+            # 1970-01-01 was a Thursday: shift so weeks start on Monday
+            wk = (days + 3) // 7
+            return wk, lambda k: str(np.datetime64(int(k) * 7 - 3, "D"))
+        if name == "month":
+            months = ts.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+            return months, lambda k: str(np.datetime64(int(k), "M"))
+        raise ValueError(f"unknown group-by key: {name}")
+
+    def group_by(
+        self,
+        by: Sequence[str],
+        values: Sequence[str] = (),
+        time_col: str = "completed",
+        mask: Optional[np.ndarray] = None,
+    ) -> List[dict]:
+        """
+        Group rows by `by` keys and return count, plus sum/mean of each of
+        `values` (NULLs ignored) per group. `week`/`month` bucket `time_col`; rows
+        where it is NULL are dropped.
+        """
+        keep = mask
+        if "week" in by or "month" in by:
+            has_time = self.col(time_col) != NULL
+            keep = has_time if keep is None else keep & has_time
+        sel = (lambda a: a) if keep is None else (lambda a: a[keep])
+        # fold the keys into one mixed-radix int64 code per row; codes are
+        # small (enum codes, week/month numbers) so bincount can aggregate in
+        # O(n) without sorting
+        codes = np.zeros(self._n if keep is None else int(keep.sum()), np.int64)
+        levels = []
+        for name in by:
+            k, dec = self._key(name, time_col)
+            k = sel(k)
+            lo = int(k.min()) if len(k) else 0
+            radix = (int(k.max()) - lo + 1) if len(k) else 1
+            codes = codes * radix + (k - lo)
+            levels.append((name, lo, radix, dec))
+        space = int(np.prod([lvl[2] for lvl in levels], dtype=np.int64)) if levels else 1
+        if space <= _DENSE_GROUPS:
+            inverse, ngroups = codes, space
+        else:
+            uniq, inverse = np.unique(codes, return_inverse=True)
+            inverse, ngroups = inverse.reshape(-1), len(uniq)
+
+        counts = np.bincount(inverse, minlength=ngroups)
+        aggs = []
+        for value in values:
+            v = sel(self.col(value))
+            has = v != NULL
+            # bincount's weights are float64, exact only below 2**53; add
+            # into int64 instead (exact to 2**63, e.g. ~292M years of ms)
+            sums = np.zeros(ngroups, np.int64)
+            np.add.at(sums, inverse[has], v[has])
+            nvals = np.bincount(inverse[has], minlength=ngroups)
+            aggs.append((value, sums, nvals))
+
+        out = []
+        for g in np.flatnonzero(counts).tolist():
+            code = g if space <= _DENSE_GROUPS else int(uniq[g])
+            row: dict = {}
+            for name, lo, radix, dec in reversed(levels):
+                code, digit = divmod(code, radix)
+                row[name] = dec(lo + digit)
+            row = {name: row[name] for name in by}
+            row["count"] = int(counts[g])
+            for value, sums, nvals in aggs:
+                total, n = int(sums[g]), int(nvals[g])
+                row[f"sum_{value}"] = total
+                # truncated toward zero, in Python ints so large sums stay exact
+                row[f"avg_{value}"] = (total // n if total >= 0 else -(-total // n)) if n else 0
+            out.append(row)
+        return out
@@ -0,0 +1,267 @@
+# server/services/feeds.py
+"""
+Shared cache for remote ICS feeds.
+
+One FeedCache serves every feed URL with the same policy:
+
+- conditional GETs (If-None-Match / If-Modified-Since); a 304 just renews
+  the entry,
+- the body is hashed while it streams to a spooled temp file, and parsing
+  is skipped when the hash matches the previous body,
+- stale-while-revalidate: once an entry is older than `ttl` it is still
+  served immediately while a background task refreshes it,
+- concurrent refreshes of the same URL share one upstream request,
+- with `reparse_after`, a parse older than that is redone before it is
+  served, even if the bytes have not changed (the refresh skips the
+  conditional headers to get them), for parsers whose output depends
+  on when they ran, like a feed windowed around "now".
+
+Only a cold miss (nothing cached yet) waits on the network. Fetches go
+through the shared async client in services/http.py; parsing runs in a
+worker thread so a large feed never blocks the event loop.
+
+With a `share` (services/shared.py) several worker processes cooperate:
+the worker holding a feed's lease fetches it and publishes the raw body,
+the others adopt that body (parsing it locally) instead of going upstream.
+Bodies move between the spool and the shared store in chunks.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from services.http import HTTP, HttpClient
+from services.instrument import CACHE_EVENTS, PARSE_SECONDS, UPSTREAM_BYTES, UPSTREAM_SECONDS
+from services.shared import FeedShare
+
+# turns the feed's text lines into whatever the caller caches (list, index...)
+Parser = Callable[[Iterable[str]], Any]
+
+
+@dataclass
+class FeedEntry:
+    data: Any = None                 # parser output for the current body
+    fetched_at: float = 0.0          # last successful fetch or 304 (monotonic)
+    fetched_wall: float = 0.0        # same, wall clock (for responses)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    body_hash: Optional[str] = None
+    error: Optional[str] = None
+    parsed_wall: float = 0.0         # when `data` was parsed (wall clock)
+    version: int = 0                 # bumped whenever `data` changes
+    ready: bool = False              # has a successful fetch ever happened
+
+
+@dataclass
+class FeedResult:
+    data: Any
+    fetched_at: float
+    stale: bool
+    version: int
+    error: Optional[str] = None
+
+
+class FeedError(Exception):
+    pass
+
+
+class FeedCache:
+    def __init__(self, ttl: float = 900, timeout: float = 20, spool_bytes: int = 1 << 20,
+                 http: HttpClient = HTTP, share: Optional[FeedShare] = None,
+                 reparse_after: Optional[float] = None):
+        self.ttl = ttl
+        self.reparse_after = reparse_after
+        self.timeout = timeout
+        self.spool_bytes = spool_bytes
+        self.http = http
+        self.share = share
+        self._entries: Dict[str, FeedEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, url: str) -> FeedEntry:
+        return self._entries.setdefault(url, FeedEntry())
+
+    async def get(self, url: str, parse: Parser) -> FeedResult:
+        e = self.entry(url)
+        if not e.ready:
+            CACHE_EVENTS.inc("feed", "miss")
+            await asyncio.shield(self._refresh(url, parse))
+            if not e.ready:
+                raise FeedError(e.error or "fetch failed")
+        elif self._reparse_due(e):
+            CACHE_EVENTS.inc("feed", "stale")
+            if e.error:
+                # the last try failed: serve the old parse, but keep retrying behind it
+                self._refresh(url, parse)
+            else:
+                # the parse is too old to serve: redo it first
+                await asyncio.shield(self._refresh(url, parse))
+        elif time.monotonic() - e.fetched_at > self.ttl:
+            CACHE_EVENTS.inc("feed", "stale")
+            self._refresh(url, parse)  # fire and forget; serve stale now
+        else:
+            CACHE_EVENTS.inc("feed", "hit")
+        stale = time.monotonic() - e.fetched_at > self.ttl
+        return FeedResult(e.data, e.fetched_wall, stale, e.version, e.error)
+
+    async def refresh(self, url: str, parse: Parser, fresh_for: float = 0.0) -> FeedResult:
+        """
+        Bring `url` up to date now (prefetching): a conditional GET unless
+        another worker published a copy younger than `fresh_for` seconds.
+        Raises FeedError when the refresh fails.
+        """
+        e = self.entry(url)
+        await asyncio.shield(self._refresh(url, parse, fresh_for))
+        if e.error or not e.ready:
+            raise FeedError(e.error or "fetch failed")
+        return FeedResult(e.data, e.fetched_wall, False, e.version, None)
+
+    def invalidate(self, url: str) -> None:
+        self._entries.pop(url, None)
+        if self.share is not None:
+            self.share.forget(url)
+
+    def _reparse_due(self, e: FeedEntry) -> bool:
+        return (e.ready and self.reparse_after is not None
+                and time.time() - e.parsed_wall > self.reparse_after)
+
+    # ───────────── refresh ─────────────
+    def _refresh(self, url: str, parse: Parser, fresh_for: Optional[float] = None) -> asyncio.Task:
+        """Start (or join) the single in-flight refresh for `url`."""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(url)
+        if task is None or task.get_loop() is not loop:
+            task = self._inflight[url] = loop.create_task(self._run(url, parse, fresh_for))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return task
+
+    async def _run(self, url: str, parse: Parser, fresh_for: Optional[float]) -> None:
+        e = self.entry(url)
+        try:
+            await self._fetch(url, parse, e, fresh_for)
+            e.error = None
+        except Exception as ex:
+            e.error = f"{type(ex).__name__}: {ex}"
+        finally:
+            self._inflight.pop(url, None)
+
+    async def _fetch(self, url: str, parse: Parser, e: FeedEntry, fresh_for: Optional[float]) -> None:
+        share = self.share
+        if share is None:
+            await self._fetch_upstream(url, parse, e)
+            return
+        if await self._adopt(url, parse, e, fresh_for):
+            return
+        deadline = time.monotonic() + self.timeout
+        while not await asyncio.to_thread(share.acquire, url):
+            # another worker is refreshing: keep serving our copy, or wait for its result
+            if e.ready:
+                return
+            if time.monotonic() > deadline:
+                raise FeedError("timed out waiting for another worker's refresh")
+            await asyncio.sleep(0.2)
+            if await self._adopt(url, parse, e, fresh_for):
+                return
+        try:
+            await self._fetch_upstream(url, parse, e)
+        finally:
+            await asyncio.to_thread(share.release, url)
+
+    async def _adopt(self, url: str, parse: Parser, e: FeedEntry, fresh_for: Optional[float]) -> bool:
+        """Take the shared copy of `url`; True when it is fresh enough (default: ttl) to skip upstream."""
+        row = await asyncio.to_thread(self.share.peek, url)
+        if row is None:
+            return False
+        if row.body_hash != e.body_hash or self._reparse_due(e):
+            with tempfile.SpooledTemporaryFile(max_size=self.spool_bytes) as spool:
+                if not await asyncio.to_thread(self.share.read_body, url, row.body_hash, spool):
+                    return False
+                spool.seek(0)
+                data = await asyncio.to_thread(self._parse, spool, row.encoding or "utf-8", parse)
+            e.data, e.body_hash, e.parsed_wall = data, row.body_hash, time.time()
+            e.etag, e.last_modified = row.etag, row.last_modified
+            e.version += 1
+            e.ready = True
+        age = time.time() - row.fetched_wall
+        e.fetched_at = time.monotonic() - age
+        e.fetched_wall = row.fetched_wall
+        return age <= (self.ttl if fresh_for is None else fresh_for)
+
+    async def _fetch_upstream(self, url: str, parse: Parser, e: FeedEntry) -> None:
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            outcome = await self._fetch_body(url, parse, e)
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "feed", outcome)
+
+    async def _fetch_body(self, url: str, parse: Parser, e: FeedEntry) -> str:
+        """Conditional GET + parse; returns the outcome label for the fetch metrics."""
+        headers = {}
+        reparse = self._reparse_due(e)   # needs the body even if it did not change
+        if e.ready and e.etag and not reparse:
+            headers["If-None-Match"] = e.etag
+        if e.ready and e.last_modified and not reparse:
+            headers["If-Modified-Since"] = e.last_modified
+
+        async with self.http.stream("GET", url, headers=headers, timeout=self.timeout) as r:
+            if r.status_code == 304:
+                await self._touch_shared(url, e)
+                return "not_modified"
+            r.raise_for_status()
+            h = hashlib.sha256()
+            size = 0
+            with tempfile.SpooledTemporaryFile(max_size=self.spool_bytes) as spool:
+                async for chunk in r.aiter_bytes(64 * 1024):
+                    h.update(chunk)
+                    spool.write(chunk)
+                    size += len(chunk)
+                UPSTREAM_BYTES.inc("feed", amount=size)
+                digest = h.hexdigest()
+                e.etag = r.headers.get("ETag")
+                e.last_modified = r.headers.get("Last-Modified")
+                if e.ready and digest == e.body_hash and not reparse:
+                    await self._touch_shared(url, e)  # same bytes: skip parsing
+                    return "unchanged"
+                spool.seek(0)
+                # RFC 5545 default is UTF-8 when the server names no charset
+                enc = r.charset_encoding or "utf-8"
+                data = await asyncio.to_thread(self._parse, spool, enc, parse)
+                if self.share is not None:
+                    spool.seek(0)
+                    await asyncio.to_thread(self.share.publish, url, spool, digest, enc,
+                                            e.etag, e.last_modified)
+        e.data, e.body_hash, e.parsed_wall = data, digest, time.time()
+        e.version += 1
+        e.ready = True
+        self._touch(e)
+        return "fetched"
+
+    async def _touch_shared(self, url: str, e: FeedEntry) -> None:
+        self._touch(e)
+        if self.share is not None:
+            await asyncio.to_thread(self.share.touch, url)
+
+    @staticmethod
+    def _parse(spool: Any, enc: str, parse: Parser) -> Any:
+        text = io.TextIOWrapper(spool, encoding=enc, errors="replace", newline="")
+        try:
+            with PARSE_SECONDS.time("ics"):
+                return parse(text)
+        finally:
+            text.detach()
+
+    @staticmethod
+    def _touch(e: FeedEntry) -> None:
+        e.fetched_at = time.monotonic()
+        e.fetched_wall = time.time()
@@ -0,0 +1,132 @@
+# server/services/http.py
+"""
+Shared async HTTP layer for every outbound integration call.
+
+One pooled keep-alive `httpx.AsyncClient` per event loop (closed when
+that loop shuts down, or by `aclose()`), a per-host semaphore so a slow
+upstream cannot hog every connection, default timeouts, and retry with
+exponential backoff + jitter on transport errors and 429/502/503/504. Use the module-level `HTTP` instance:
+
+    r = await HTTP.get(url)
+    async with HTTP.stream("GET", url, headers=...) as r:
+        async for chunk in r.aiter_bytes(): ...
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class _LoopClient(NamedTuple):
+    client: httpx.AsyncClient
+    hosts: Dict[str, asyncio.Semaphore]
+    closer: asyncio.Task
+
+
+class HttpClient:
+    def __init__(
+        self,
+        timeout: float = 20,
+        per_host: int = 4,
+        retries: int = 2,
+        backoff: float = 0.25,
+        max_connections: int = 100,
+    ):
+        self.timeout = timeout
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=20)
+        self._loops: Dict[asyncio.AbstractEventLoop, _LoopClient] = {}
+
+    def _slot(self) -> _LoopClient:
+        # clients and semaphores are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        slot = self._loops.get(loop)
+        if slot is None:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, follow_redirects=True)
+            slot = self._loops[loop] = _LoopClient(client, {}, loop.create_task(self._close_at_exit(loop, client)))
+        return slot
+
+    async def _close_at_exit(self, loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+        # asyncio.run() (and anyio's runner) cancel leftover tasks before closing
+        # the loop: the pool's sockets are closed then, while the loop still runs
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._loops.pop(loop, None)
+            await client.aclose()
+
+    def _host_slot(self, hosts: Dict[str, asyncio.Semaphore], url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = hosts.get(host)
+        if sem is None:
+            sem = hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def _sleep(self, attempt: int) -> None:
+        await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[httpx.Response]:
+        """Streamed request; retries only happen before the body is handed out."""
+        client, hosts, _ = self._slot()
+        async with self._host_slot(hosts, url):
+            for attempt in range(self.retries + 1):
+                req = client.build_request(method, url, headers=headers,
+                                           timeout=timeout or self.timeout)
+                try:
+                    r = await client.send(req, stream=True)
+                except httpx.TransportError:
+                    if attempt == self.retries:
+                        raise
+                    await self._sleep(attempt)
+                    continue
+                if r.status_code in RETRY_STATUS and attempt < self.retries:
+                    await r.aclose()
+                    await self._sleep(attempt)
+                    continue
+                try:
+                    yield r
+                finally:
+                    await r.aclose()
+                return
+
+    async def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """GET with the whole body read."""
+        async with self.stream("GET", url, headers=headers, timeout=timeout) as r:
+            await r.aread()
+            return r
+
+    async def aclose(self) -> None:
+        """Close this loop's client now; clients of other running loops close on their own loop."""
+        loop = asyncio.get_running_loop()
+        for other, slot in list(self._loops.items()):
+            if other is loop:
+                slot.closer.cancel()
+                await asyncio.wait([slot.closer])
+            elif not other.is_closed():
+                other.call_soon_threadsafe(slot.closer.cancel)
+            else:   # closed without cancelling its tasks: nothing left to run the close on
+                self._loops.pop(other, None)
+
+
+HTTP = HttpClient()
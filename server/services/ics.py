@@ -0,0 +1,201 @@
+# server/services/ics.py
+"""
+Streaming ICS (iCalendar) parsing.
+
+Everything here works on iterators so a feed is never held in memory as a
+whole: `iter_text_lines` splits decoded chunks into physical lines,
+`unfold` joins RFC 5545 continuation lines in linear time, and
+`iter_ics_events` yields one event dict at a time. An optional
+[window_start, window_end) drops events outside the window before their
+dict is built. Recurrence rules are expanded later, lazily, by
+services/recurrence.py.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, Iterator, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+ISO_RE = re.compile(r"^(\d{8})T(\d{6})Z?$")
+DATE_RE = re.compile(r"^(\d{8})$")
+
+
+DURATION_RE = re.compile(r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+TZID_RE = re.compile(r";TZID=\"?([^;:\"]+)\"?", re.I)
+
+# properties whose value is a time and may carry a TZID parameter
+_TIME_PROPS = {"DTSTART", "DTEND", "EXDATE", "RECURRENCE-ID"}
+
+
+def tzinfo_for(tzid: Optional[str]) -> tzinfo:
+    if tzid:
+        try:
+            return ZoneInfo(tzid)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.utc
+
+
+def ics_time(v: str, tzid: Optional[str] = None) -> Optional[datetime]:
+    """
+    Parse an ICS DATE-TIME or DATE value to an aware UTC datetime; None if
+    unknown. Local times use `tzid`; floating times and dates count as UTC.
+    """
+    v = v.strip()
+    m = ISO_RE.match(v)
+    if m:
+        date, clock = m.groups()
+        dt = datetime.strptime(date + clock, "%Y%m%d%H%M%S")
+        if v.endswith("Z"):
+            return dt.replace(tzinfo=timezone.utc)
+        return dt.replace(tzinfo=tzinfo_for(tzid)).astimezone(timezone.utc)
+    m = DATE_RE.match(v)
+    if m:
+        return datetime.strptime(m.group(1), "%Y%m%d").replace(tzinfo=timezone.utc)
+    return None
+
+
+def ics_duration(v: str) -> Optional[timedelta]:
+    m = DURATION_RE.match(v.strip())
+    if not m:
+        return None
+    sign, w, d, h, mi, sec = m.groups()
+    td = timedelta(weeks=int(w or 0), days=int(d or 0), hours=int(h or 0),
+                   minutes=int(mi or 0), seconds=int(sec or 0))
+    return -td if sign == "-" else td
+
+
+def iter_text_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split a stream of text chunks into lines without re-joining the stream."""
+    tail: List[str] = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts = chunk.split("\n")
+        if len(parts) == 1:
+            tail.append(chunk)
+            continue
+        tail.append(parts[0])
+        yield "".join(tail)
+        yield from parts[1:-1]
+        tail = [parts[-1]] if parts[-1] else []
+    if tail:
+        yield "".join(tail)
+
+
+def unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join folded lines (leading space/tab = continuation), O(total length)."""
+    parts: List[str] = []
+    for raw in lines:
+        ln = raw.rstrip("\r\n")
+        if parts and ln[:1] in (" ", "\t"):
+            parts.append(ln[1:])
+            continue
+        if parts:
+            yield "".join(parts)
+        parts = [ln]
+    if parts:
+        yield "".join(parts)
+
+
+def _event_id(block: Dict[str, str]) -> str:
+    uid = block.get("UID")
+    if uid:
+        return uid
+    # stable across processes, unlike hash()
+    return hashlib.sha1((block["SUMMARY"] + block["DTSTART"]).encode()).hexdigest()[:16]
+
+
+def _event(b: Dict[str, str], tz: Dict[str, str], exdates: List[datetime],
+           window_start: Optional[datetime], window_end: Optional[datetime]) -> Optional[Dict]:
+    if not {"DTSTART", "SUMMARY"} <= b.keys():
+        return None
+    start = ics_time(b["DTSTART"], tz.get("DTSTART"))
+    if start is None:
+        return None
+    if "DTEND" in b:
+        end = ics_time(b["DTEND"], tz.get("DTEND"))
+    elif "DURATION" in b:
+        dur = ics_duration(b["DURATION"])
+        end = start + dur if dur is not None else None
+    else:
+        end = None
+    if end is None:
+        return None
+
+    recurring = "RRULE" in b
+    override = "RECURRENCE-ID" in b
+    # series masters and their overrides are windowed at expansion time
+    if not (recurring or override):
+        if window_start and end <= window_start:
+            return None
+        if window_end and start >= window_end:
+            return None
+
+    ev = {
+        "id": _event_id(b),
+        "title": b["SUMMARY"],
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "location": b.get("LOCATION", ""),
+        "raw": {"description": b.get("DESCRIPTION", "")},
+    }
+    if recurring:
+        ev["rrule"] = b["RRULE"]
+        ev["tzid"] = tz.get("DTSTART")
+        ev["exdates"] = [d.isoformat() for d in exdates]
+    if override:
+        rid = ics_time(b["RECURRENCE-ID"], tz.get("RECURRENCE-ID"))
+        ev["recurrenceId"] = rid.isoformat() if rid else b["RECURRENCE-ID"]
+        ev["cancelled"] = b.get("STATUS", "").upper() == "CANCELLED"
+    return ev
+
+
+def iter_ics_events(
+    lines: Iterable[str],
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None,
+) -> Iterator[Dict]:
+    """
+    Yield VEVENTs as dicts with UTC ISO start/end. Recurring masters carry
+    `rrule`/`tzid`/`exdates` and overrides carry `recurrenceId`; both are
+    passed through regardless of the window (see services/recurrence.py).
+    """
+    block: Optional[Dict[str, str]] = None
+    tz: Dict[str, str] = {}
+    exdates: List[datetime] = []
+    for ln in unfold(lines):
+        if ln.startswith("BEGIN:VEVENT"):
+            block, tz, exdates = {}, {}, []
+            continue
+        if block is None:
+            continue
+        if ln.startswith("END:VEVENT"):
+            ev = _event(block, tz, exdates, window_start, window_end)
+            block = None
+            if ev is not None:
+                yield ev
+            continue
+        if ":" not in ln:
+            continue
+        k, v = ln.split(":", 1)
+        name = k.split(";")[0].upper()
+        if name in _TIME_PROPS:
+            m = TZID_RE.search(k)
+            if m:
+                tz[name] = m.group(1)
+        if name == "EXDATE":
+            for part in v.split(","):
+                d = ics_time(part, tz.get("EXDATE"))
+                if d:
+                    exdates.append(d)
+            continue
+        block[name] = v
+
+
+def parse_ics_events(ics_text: str) -> List[Dict]:
+    """Parse a whole ICS document (kept for callers that already have text)."""
+    return list(iter_ics_events(ics_text.splitlines()))
+
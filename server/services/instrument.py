@@ -0,0 +1,277 @@
+# server/services/instrument.py
+"""
+In-process metrics with Prometheus text exposition, no dependencies.
+
+Counters and histograms are plain dicts keyed by label values; recording
+one sample is a bisect plus a short locked update (~1 µs), so they can sit
+on every request. Gauges are callbacks evaluated only when scraped.
+
+    REGISTRY.render()  -> text/plain; version=0.0.4 body for /metrics/prometheus
+
+MetricsMiddleware times every request by route template. The metric
+objects other modules record into are defined at the bottom of this file.
+
+SamplingProfiler is an opt-in wall-clock sampler (a daemon thread reading
+sys._current_frames) that can be started and stopped at runtime; it
+aggregates collapsed stacks in the format flamegraph.pl / speedscope read.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: Any) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        out = self.header()
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, v in values:
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}")
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}   # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    @contextmanager
+    def time(self, *labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def count(self, *labels: Any) -> int:
+        s = self._series.get(labels)
+        return sum(s[0]) if s else 0
+
+    def render(self) -> List[str]:
+        out = self.header()
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cum = 0
+            for bound, n in zip((*map(_num, self.buckets), "+Inf"), counts):
+                cum += n
+                le = f'le="{bound}"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cum}")
+        return out
+
+
+class Gauge(_Metric):
+    """Evaluated at scrape time: `fn()` returns a number or an iterable of (label values, number)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            v = self.fn()
+        except Exception:
+            return []   # a broken gauge must not break the scrape
+        if v is None:
+            return []
+        out = self.header()
+        items: Iterable[Tuple[tuple, float]] = [((), v)] if isinstance(v, (int, float)) else v
+        for labels, x in items:
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(x)}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric   # re-registering a name replaces it
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any], labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, fn, labels))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in list(self._metrics.values()):
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ───────────── request timing ─────────────
+class MetricsMiddleware:
+    """
+    Pure ASGI. Records time to response start (so SSE / NDJSON streams do
+    not count their whole lifetime) against the matched route template.
+    """
+
+    def __init__(self, app: Any, histogram: Optional[Histogram] = None):
+        self.app = app
+        self.histogram = histogram or HTTP_SECONDS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        observe = self.histogram.observe
+
+        async def timed(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                observe(time.perf_counter() - t0, scope["method"],
+                        getattr(route, "path", "unmatched"), f"{message['status'] // 100}xx")
+            await send(message)
+
+        await self.app(scope, receive, timed)
+
+
+# ───────────── profiler ─────────────
+class SamplingProfiler:
+    """Samples every thread's stack `hz` times a second while running."""
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.stacks: _Counter = _Counter()
+        self.samples = 0
+        self.hz = 0
+        self.started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, hz: int = 100) -> None:
+        if self.running:
+            return
+        self.hz = hz
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+        self._thread = None
+
+    def reset(self) -> None:
+        self.stacks.clear()
+        self.samples = 0
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        interval = 1.0 / self.hz
+        while not self._stop.wait(interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        """`stack;frames count` lines, hottest first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common(limit))
+
+
+PROFILER = SamplingProfiler()
+
+
+# ───────────── metrics recorded across the app ─────────────
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to response start by route.", ("method", "route", "status"))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_fetch_duration_seconds", "Upstream HTTP calls (ICS feeds and probes).",
+    ("target", "outcome"))
+UPSTREAM_BYTES = REGISTRY.counter(
+    "upstream_fetch_bytes_total", "Bytes received from upstream.", ("target",))
+PARSE_SECONDS = REGISTRY.histogram(
+    "parse_duration_seconds", "Parsing of fetched documents.", ("kind",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds", "Inner stages of request handling.", ("stage",))
+CACHE_EVENTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by result (hit, miss, stale).", ("cache", "result"))
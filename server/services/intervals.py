@@ -0,0 +1,82 @@
+# server/services/intervals.py
+"""
+Sorted interval index for calendar/shift events.
+
+Events are parsed once into numeric [start, end) epoch seconds and kept
+sorted by start. Because every event that overlaps a window must start
+before the window ends and no earlier than `window_start - max_duration`,
+a window or point query is two bisections plus a scan of the candidates in
+that slice: O(log n + k) for feeds whose events have bounded length
+(shifts, meetings). The few very long events (multi-day all-day blocks)
+are kept in a separate small list so they do not widen that slice for
+everyone else.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+# events longer than this go to the "long" side list
+LONG_EVENT_SEC = 2 * 86400
+
+
+def iso_ts(iso: str) -> Optional[float]:
+    """Epoch seconds for an ISO timestamp (naive = UTC), or None if it does not parse."""
+    try:
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return None
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class IntervalIndex:
+    def __init__(self, events: Sequence[Dict[str, Any]] = ()) -> None:
+        short, long_ = [], []
+        for ev in events:
+            s, e = iso_ts(ev.get("start", "")), iso_ts(ev.get("end", ""))
+            if s is None or e is None:
+                continue
+            e = max(e, s)
+            (long_ if e - s > LONG_EVENT_SEC else short).append((s, e, ev))
+        short.sort(key=lambda x: x[0])
+        self._starts: List[float] = [x[0] for x in short]
+        self._ends: List[float] = [x[1] for x in short]
+        self._events: List[Dict[str, Any]] = [x[2] for x in short]
+        self._max_dur = max((e - s for s, e, _ in short), default=0.0)
+        self._long = sorted(long_, key=lambda x: x[0])
+
+    def __len__(self) -> int:
+        return len(self._events) + len(self._long)
+
+    def __iter__(self):
+        return iter(self.window())
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Events overlapping [start, end) in start order; None = unbounded."""
+        lo = 0 if start is None else bisect_left(self._starts, start - self._max_dur)
+        hi = len(self._starts) if end is None else bisect_left(self._starts, end)
+        out = []
+        for i in range(lo, hi):
+            if start is None or self._ends[i] > start:
+                out.append((self._starts[i], self._events[i]))
+        for s, e, ev in self._long:
+            if (end is None or s < end) and (start is None or e > start):
+                out.append((s, ev))
+        if self._long:
+            out.sort(key=lambda x: x[0])
+        return [ev for _, ev in out]
+
+    def at(self, t: float) -> List[Dict[str, Any]]:
+        """Events in progress at instant `t` (start <= t < end)."""
+        lo = bisect_left(self._starts, t - self._max_dur)
+        hi = bisect_left(self._starts, t, lo)
+        # include events starting exactly at t
+        while hi < len(self._starts) and self._starts[hi] == t:
+            hi += 1
+        out = [(self._starts[i], self._events[i]) for i in range(lo, hi) if self._ends[i] > t]
+        out += [(s, ev) for s, e, ev in self._long if s <= t < e]
+        out.sort(key=lambda x: x[0])
+        return [ev for _, ev in out]
@@ -0,0 +1,232 @@
+# server/services/llm.py
+"""
+LLM access for the coach endpoints (/chat, /retro).
+
+- LLMClient: anything with an async `stream(prompt, system)` yielding text
+  chunks. GeminiLLM wraps google-generativeai; FakeLLM is a deterministic
+  local model for offline development and tests (LLM_BACKEND=fake).
+- build_context(): renders tasks one line each, most relevant first,
+  until a token budget is spent, so prompts stay bounded however many
+  tasks the user has.
+- LLMGateway: answers cached by key (a hash of the prompt plus the task
+  set it was built from), and identical requests in flight share one
+  generation. Every caller streams the shared generation from its first
+  chunk; the finished text is cached even if the callers went away.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from services.cache import MISSING
+
+CHARS_PER_TOKEN = 4    # rough, but stable: good enough to bound a prompt
+
+_PRIORITY_RANK = {"urgent": 0, "high": 1, "medium": 2, "low": 3}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMClient:
+    name = "llm"
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class GeminiLLM(LLMClient):
+    """
+    google-generativeai client. The SDK is imported and configured on the
+    first call (in a thread: it takes a while), models are built lazily,
+    one per system prompt.
+    """
+
+    def __init__(self, api_key: str, model: str):
+        self._api_key = api_key
+        self._genai: Any = None
+        self.name = model
+        self._models: Dict[Optional[str], Any] = {}
+
+    def _load(self) -> Any:
+        import google.generativeai as genai
+        genai.configure(api_key=self._api_key)
+        return genai
+
+    async def _model(self, system: Optional[str]) -> Any:
+        if self._genai is None:
+            self._genai = await asyncio.to_thread(self._load)
+        m = self._models.get(system)
+        if m is None:
+            m = self._models[system] = self._genai.GenerativeModel(self.name, system_instruction=system)
+        return m
+
+    async def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        try:
+            model = await self._model(system)
+            resp = await model.generate_content_async(prompt, stream=True)
+            async for chunk in resp:
+                try:
+                    text = chunk.text
+                except ValueError:   # blocked / empty candidate
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            raise LLMError(str(e)) from e
+
+
+class FakeLLM(LLMClient):
+    """
+    Same prompt, same answer: the reply is derived from a hash of the
+    prompt and streamed word by word (`delay` seconds apart). `calls`
+    counts generations, which makes caching and coalescing observable.
+    """
+
+    name = "fake"
+    _LINES = [
+        "Pick the most urgent open task and timebox 25 minutes for it.",
+        "Batch the small tasks into one block after lunch.",
+        "Anything without a due date can wait until the dated work is done.",
+        "Close out one in-progress task before starting a new one.",
+        "Review what slipped last week and re-estimate it honestly.",
+    ]
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def reply(self, prompt: str) -> str:
+        h = hashlib.blake2b(prompt.encode(), digest_size=8).digest()
+        picks = [self._LINES[b % len(self._LINES)] for b in h[:3]]
+        tasks = sum(1 for line in prompt.splitlines() if line.startswith("- "))
+        return f"Looking at {tasks} tasks. " + " ".join(dict.fromkeys(picks))
+
+    async def stream(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        self.calls += 1
+        words = self.reply(prompt).split(" ")
+        for i, w in enumerate(words):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield w if i == 0 else " " + w
+
+
+# ───────────── context ─────────────
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _rank(t: Mapping[str, Any]) -> tuple:
+    # open before done; then priority; then soonest due (undated last)
+    return (t.get("status") == "done", _PRIORITY_RANK.get(t.get("priority"), 4),
+            t.get("dueDate") or "~", t.get("id") or "")
+
+
+def task_line(t: Mapping[str, Any]) -> str:
+    parts = [f"[{t.get('status', '?')}/{t.get('priority', '?')}] {t.get('title', '')}".strip()]
+    if t.get("dueDate"):
+        parts.append(f"due {str(t['dueDate'])[:16]}")
+    if t.get("estimateMinutes"):
+        parts.append(f"est {t['estimateMinutes']}m")
+    if t.get("timeSpentMs"):
+        parts.append(f"spent {round(t['timeSpentMs'] / 60000)}m")
+    return "- " + ", ".join(parts)
+
+
+def build_context(tasks: Iterable[Mapping[str, Any]], budget: int) -> Tuple[str, int, int]:
+    """(context text, tasks kept, tasks left out) within `budget` tokens."""
+    ranked = sorted(tasks, key=_rank)
+    lines: List[str] = []
+    used = 0
+    for t in ranked:
+        line = task_line(t)
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    omitted = len(ranked) - len(lines)
+    if omitted:
+        lines.append(f"(+{omitted} lower-priority tasks not shown)")
+    return "\n".join(lines), len(lines) - (1 if omitted else 0), omitted
+
+
+def prompt_key(*parts: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(str(p).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def today() -> str:
+    return datetime.now().strftime("%A %Y-%m-%d")
+
+
+# ───────────── gateway ─────────────
+class _Generation:
+    """One model call; any number of followers replay it from the start."""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None   # the producer; referenced so it is not collected
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done, self.error = True, error
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise LLMError(str(self.error))
+                return
+            await self._changed.wait()
+
+
+class LLMGateway:
+    def __init__(self, client: LLMClient, cache: Any):
+        self.client = client
+        self.cache = cache        # TTLCache / SharedCache
+        self._inflight: Dict[str, _Generation] = {}
+
+    async def cached(self, key: str) -> Optional[str]:
+        hit = await self.cache.aget(key)
+        return None if hit is MISSING else hit
+
+    def stream(self, key: str, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """Chunks of the answer for `key`; joins a matching generation already running."""
+        gen = self._inflight.get(key)
+        if gen is None:
+            gen = self._inflight[key] = _Generation()
+            gen.task = asyncio.get_running_loop().create_task(self._run(key, gen, prompt, system))
+        return gen.follow()
+
+    async def _run(self, key: str, gen: _Generation, prompt: str, system: Optional[str]) -> None:
+        try:
+            async for chunk in self.client.stream(prompt, system):
+                gen.push(chunk)
+            await self.cache.aset(key, "".join(gen.chunks))
+            gen.finish()
+        except Exception as e:
+            gen.finish(e)
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,37 @@
+# server/services/locks.py
+"""
+Striped per-key locks for task writers.
+
+A fixed pool of locks; a key (task id) always maps to the same stripe, so
+writers of the same task serialize while writers of different tasks almost
+never touch the same lock. Multi-key holders acquire stripes in index
+order, which rules out deadlocks between them.
+
+This only orders writers inside one process; the store's version check
+(`apply(..., expect=...)`) is what keeps separate worker processes honest.
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+
+class StripedLock:
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _stripes(self, keys: Iterable[str]) -> list:
+        n = len(self._locks)
+        return sorted({hash(k) % n for k in keys})
+
+    @contextmanager
+    def hold(self, keys: Iterable[str]) -> Iterator[None]:
+        held = [self._locks[i] for i in self._stripes(keys)]
+        for lock in held:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
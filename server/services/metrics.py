@@ -0,0 +1,364 @@
+# server/services/metrics.py
+"""
+Task metrics.
+
+WeeklyMetrics keeps running per-ISO-week aggregates, so /metrics/weekly
+never rescans the tasks. A done task is reduced to a `done_record()`
+(timestamps as epoch ms) and contributes to exactly one week bucket (the
+Monday of the week its `updatedAt` falls in). Neither class remembers
+anything per task: `update(before, after)` takes the record a change
+replaces along with the new one (services/views.py reads the old one from
+the columnar mirror), so memory is O(weeks), not O(completed tasks).
+
+TaskDistributions follows the same update contract but keeps quantile
+sketches (services/sketch.py) of cycle time, lateness against the due
+date and time-spent/estimate per week x priority x source bucket, so
+percentiles over any range come from merging a few bucket sketches.
+
+The *_rollup helpers at the bottom shape weekly/monthly/priority rollups
+computed over the columnar mirror (services/columns.py).
+
+This module is the metrics core shared with the serverless handler in
+src/api/, so it sticks to the standard library: the app writes the weekly
+buckets to a snapshot file (write_snapshot) and the handler turns them
+into the same series (read_snapshot + weekly_series) without the task
+store or FastAPI.
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from services.sketch import Distribution
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+DAY_MS = 86_400_000
+
+
+def iso_ms(dt_str: str | None) -> int | None:
+    """Epoch ms of an ISO timestamp (naive = UTC); None if missing or invalid."""
+    if not dt_str:
+        return None
+    try:
+        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if not dt.tzinfo:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
+def week_start(dt: datetime) -> date:
+    """Monday (UTC) of the ISO week containing `dt`."""
+    d = dt.astimezone(timezone.utc).date()
+    return d - timedelta(days=d.weekday())
+
+
+def week_of(ms: int) -> date:
+    """Monday (UTC) of the ISO week containing epoch ms `ms`."""
+    days = ms // DAY_MS
+    return date.fromordinal(_EPOCH_DAY + days - (days + 3) % 7)   # 1970-01-01 was a Thursday
+
+
+# (updatedAt, createdAt, dueDate as epoch ms, priority, source, timeSpentMs, estimateMinutes)
+DoneRecord = Tuple[int, Optional[int], Optional[int], str, Optional[str], Optional[int], Optional[int]]
+# (week, cycle_ms or None, has_due, on_time)
+Contribution = Tuple[date, Optional[int], bool, bool]
+# week -> [done, cycle_sum_ms, cycle_n, with_due, on_time]
+Buckets = Mapping[date, Sequence[int]]
+
+
+def done_record(task: Any) -> DoneRecord | None:
+    """What the metrics read from a task (or store row); None unless it is done."""
+    if task.status != "done":
+        return None
+    updated = iso_ms(task.updatedAt)
+    if updated is None:
+        return None
+    return (updated, iso_ms(task.createdAt), iso_ms(task.dueDate), task.priority,
+            getattr(task, "source", None), getattr(task, "timeSpentMs", None),
+            getattr(task, "estimateMinutes", None))
+
+
+def contribution(rec: DoneRecord) -> Contribution:
+    """What a done task adds to the weekly buckets."""
+    updated, created, due = rec[0], rec[1], rec[2]
+    cycle_ms = updated - created if created is not None and updated >= created else None
+    return week_of(updated), cycle_ms, due is not None, due is not None and updated <= due
+
+
+class WeeklyMetrics:
+    """
+    Per-week aggregates: done count, cycle-time sum/count, due count and
+    on-time count. Reads cost O(weeks) regardless of how many tasks exist.
+    """
+
+    def __init__(self) -> None:
+        # week -> [done, cycle_sum_ms, cycle_n, with_due, on_time]
+        self._weeks: Dict[date, List[int]] = {}
+
+    def __len__(self) -> int:
+        return sum(b[0] for b in self._weeks.values())
+
+    def _apply(self, c: Contribution, sign: int) -> None:
+        wk, cycle_ms, has_due, on_time = c
+        b = self._weeks.get(wk)
+        if b is None:
+            if sign < 0:
+                return   # nothing counted there to withdraw
+            b = self._weeks[wk] = [0, 0, 0, 0, 0]
+        b[0] += sign
+        if cycle_ms is not None:
+            b[1] += sign * cycle_ms
+            b[2] += sign
+        if has_due:
+            b[3] += sign
+            if on_time:
+                b[4] += sign
+        if b[0] == 0:
+            del self._weeks[wk]
+
+    def add(self, rec: DoneRecord | None) -> None:
+        if rec is not None:
+            self._apply(contribution(rec), +1)
+
+    def update(self, before: DoneRecord | None, after: DoneRecord | None) -> None:
+        """Replace a task's earlier record (None: was not done) with its new one (None: no longer done)."""
+        if before == after:
+            return
+        if before is not None:
+            self._apply(contribution(before), -1)
+        self.add(after)
+
+    def clear(self) -> None:
+        self._weeks.clear()
+
+    def series(self, weeks: int = 1, now: datetime | None = None) -> dict:
+        return weekly_series(self._weeks, weeks, now)
+
+    def buckets(self, weeks: int, now: datetime | None = None) -> Dict[date, List[int]]:
+        """Copy of the buckets of the last `weeks` weeks (for snapshots)."""
+        first = week_start(now or datetime.now(timezone.utc)) - timedelta(weeks=weeks - 1)
+        return {wk: list(b) for wk, b in self._weeks.items() if wk >= first}
+
+
+def weekly_series(buckets: Buckets, weeks: int = 1, now: datetime | None = None) -> dict:
+    """
+    Oldest-to-newest series ending with the current week, in the same
+    shape as the client-side getWeekly* helpers.
+    """
+    now = now or datetime.now(timezone.utc)
+    first = week_start(now) - timedelta(weeks=weeks - 1)
+    done, cycle, on_time = [], [], []
+    for i in range(weeks):
+        wk = first + timedelta(weeks=i)
+        n, cyc_sum, cyc_n, with_due, ok = buckets.get(wk, (0, 0, 0, 0, 0))
+        key = wk.isoformat()
+        done.append({"weekStart": key, "count": n})
+        cycle.append({"weekStart": key, "avgCycleMs": int(cyc_sum / cyc_n) if cyc_n else 0})
+        on_time.append({"weekStart": key, "onTimePct": round(ok / with_due * 100) if with_due else 0})
+    return {"weeklyDone": done, "weeklyCycle": cycle, "weeklyOnTime": on_time}
+
+
+# ───────────────────────────── Snapshot file ─────────────────────────────
+SNAPSHOT_WEEKS = 104   # longest range /metrics/weekly serves
+
+
+def write_snapshot(path: str | os.PathLike, buckets: Buckets, version: Any = None,
+                   now: datetime | None = None) -> None:
+    """Write weekly buckets as JSON, atomically (readers never see a partial file)."""
+    doc = {
+        "generatedAt": (now or datetime.now(timezone.utc)).isoformat(timespec="seconds"),
+        "version": version,
+        "weeks": {wk.isoformat(): list(b) for wk, b in sorted(buckets.items())},
+    }
+    tmp = f"{os.fspath(path)}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: str | os.PathLike) -> Tuple[Dict[date, List[int]], dict]:
+    """(buckets, {"generatedAt", "version"}) from a write_snapshot file."""
+    with open(path) as f:
+        doc = json.load(f)
+    buckets = {date.fromisoformat(wk): b for wk, b in doc["weeks"].items()}
+    return buckets, {"generatedAt": doc.get("generatedAt"), "version": doc.get("version")}
+
+
+# ───────────────────────────── Distributions ─────────────────────────────
+DIST_METRICS = ("cycleMs", "latenessMs", "estimateRatio")
+DIST_DIMENSIONS = ("week", "priority", "source")
+
+BucketKey = Tuple[date, str, str]   # (week, priority, source)
+# (bucket, cycle ms, ms past dueDate (negative = early), timeSpent / estimate)
+Sample = Tuple[BucketKey, Optional[float], Optional[float], Optional[float]]
+
+
+def sample(rec: DoneRecord) -> Sample:
+    """What a done task adds to the distribution buckets."""
+    updated, created, due, priority, source, spent, est = rec
+    cycle = updated - created if created is not None and updated >= created else None
+    late = updated - due if due is not None else None
+    ratio = spent / (est * 60_000) if est and spent else None
+    return (week_of(updated), priority, source or "manual"), cycle, late, ratio
+
+
+def _pct_name(q: float) -> str:
+    return "p" + f"{q * 100:.3f}".rstrip("0").rstrip(".")
+
+
+class TaskDistributions:
+    """
+    Per-bucket sketches. Memory per bucket is O(k) whatever the number of
+    tasks; a bucket whose tasks all left is dropped along with its
+    removal sketch. Values retracted by edits pile up in the removal
+    sketches, so the owner rebuilds once `removed_share()` grows.
+    """
+
+    def __init__(self, k: int = 200) -> None:
+        self.k = k
+        # bucket -> [done count, one Distribution per DIST_METRICS]
+        self._buckets: Dict[BucketKey, list] = {}
+
+    def __len__(self) -> int:
+        return sum(b[0] for b in self._buckets.values())
+
+    def removed_share(self) -> float:
+        """Weight of removed values relative to added ones, over all buckets."""
+        added = removed = 0
+        for b in self._buckets.values():
+            for dist in b[1:]:
+                added += dist.added.n
+                removed += dist.removed.n
+        return removed / added if added else 0.0
+
+    def _apply(self, s: Sample, sign: int) -> None:
+        key, *values = s
+        b = self._buckets.get(key)
+        if b is None:
+            if sign < 0:
+                return
+            b = self._buckets[key] = [0, *(Distribution(self.k) for _ in DIST_METRICS)]
+        b[0] += sign
+        if b[0] == 0:
+            del self._buckets[key]
+            return
+        for dist, v in zip(b[1:], values):
+            if v is not None:
+                (dist.add if sign > 0 else dist.remove)(v)
+
+    def add(self, rec: DoneRecord | None) -> None:
+        if rec is not None:
+            self._apply(sample(rec), +1)
+
+    def update(self, before: DoneRecord | None, after: DoneRecord | None) -> None:
+        """Same contract as WeeklyMetrics.update; unchanged samples are not retracted."""
+        if before is not None and after is not None:
+            old, new = sample(before), sample(after)
+            if old == new:
+                return
+            self._apply(old, -1)
+            self._apply(new, +1)
+            return
+        if before is not None:
+            self._apply(sample(before), -1)
+        self.add(after)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def query(self, start: date | None = None, end: date | None = None,
+              priority: str | None = None, source: str | None = None,
+              group_by: Sequence[str] = (), qs: Sequence[float] = (0.5, 0.9, 0.99)) -> List[dict]:
+        """
+        Percentiles of each metric over the weeks in [week of `start`, `end`],
+        one item per combination of the `group_by` dimensions.
+        """
+        lo = week_start(datetime.combine(start, datetime.min.time(), timezone.utc)) if start else None
+        dims = [DIST_DIMENSIONS.index(d) for d in group_by]
+        groups: Dict[tuple, List[list]] = {}
+        for key, b in self._buckets.items():
+            wk, pr, src = key
+            if (lo and wk < lo) or (end and wk > end) or (priority and pr != priority) \
+                    or (source and src != source):
+                continue
+            groups.setdefault(tuple(key[i] for i in dims), []).append(b)
+        items = []
+        for gkey in sorted(groups):
+            parts = groups[gkey]
+            item: Dict[str, Any] = {d: (v.isoformat() if isinstance(v, date) else v)
+                                    for d, v in zip(group_by, gkey)}
+            item["count"] = sum(b[0] for b in parts)
+            for m, name in enumerate(DIST_METRICS, start=1):
+                dist = Distribution.merged((b[m] for b in parts), self.k)
+                values = dist.quantiles(qs)
+                digits = 3 if name == "estimateRatio" else 0
+                item[name] = {"n": dist.count, **{
+                    _pct_name(q): (None if v is None else round(v, digits) if digits else int(v))
+                    for q, v in zip(qs, values)}}
+            items.append(item)
+        return items
+
+
+# ───────────────────────────── Columnar rollups ─────────────────────────────
+# `cols` is a services.columns.TaskColumns; everything below is vectorized
+# there, these helpers only shape the output.
+
+def _month_start(d: date, back: int) -> date:
+    m = d.year * 12 + d.month - 1 - back
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def weekly_rollup(cols: Any, weeks: int, now: datetime | None = None) -> List[dict]:
+    """Completed count, avg cycle time and time spent per ISO week (oldest first)."""
+    now = now or datetime.now(timezone.utc)
+    rows = {r["week"]: r for r in cols.group_by(["week"], values=("cycleMs", "timeSpentMs"))}
+    first = week_start(now) - timedelta(weeks=weeks - 1)
+    out = []
+    for i in range(weeks):
+        wk = (first + timedelta(weeks=i)).isoformat()
+        r = rows.get(wk, {})
+        out.append({
+            "weekStart": wk,
+            "done": r.get("count", 0),
+            "avgCycleMs": r.get("avg_cycleMs", 0),
+            "timeSpentMs": r.get("sum_timeSpentMs", 0),
+        })
+    return out
+
+
+def monthly_rollup(cols: Any, months: int, now: datetime | None = None) -> List[dict]:
+    """Same as weekly_rollup, bucketed by calendar month (UTC)."""
+    today = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).date()
+    rows = {r["month"]: r for r in cols.group_by(["month"], values=("cycleMs", "timeSpentMs"))}
+    out = []
+    for back in range(months - 1, -1, -1):
+        key = _month_start(today, back).isoformat()[:7]
+        r = rows.get(key, {})
+        out.append({
+            "month": key,
+            "done": r.get("count", 0),
+            "avgCycleMs": r.get("avg_cycleMs", 0),
+            "timeSpentMs": r.get("sum_timeSpentMs", 0),
+        })
+    return out
+
+
+def priority_rollup(cols: Any) -> List[dict]:
+    """Per priority: task count by status, total time spent and estimates."""
+    from services.columns import PRIORITIES, STATUSES
+
+    out = {p: {"priority": p, "total": 0, **{s: 0 for s in STATUSES},
+               "timeSpentMs": 0, "estimateMinutes": 0} for p in PRIORITIES}
+    for r in cols.group_by(["priority", "status"], values=("timeSpentMs", "estimateMinutes")):
+        row = out[r["priority"]]
+        row[r["status"]] = r["count"]
+        row["total"] += r["count"]
+        row["timeSpentMs"] += r["sum_timeSpentMs"]
+        row["estimateMinutes"] += r["sum_estimateMinutes"]
+    return list(out.values())
@@ -0,0 +1,277 @@
+# server/services/recurrence.py
+"""
+Lazy RRULE expansion for ICS feeds.
+
+A recurring event is stored once as a `Series` (master event, parsed rule,
+EXDATEs and RECURRENCE-ID overrides) and only expanded for the window a
+request asks for. Occurrences are generated in the event's own time zone
+(so a 09:00 meeting stays at 09:00 across DST) and converted to UTC.
+
+Rules without COUNT jump straight to the period containing the window, so
+expansion cost is proportional to the occurrences returned rather than to
+the age of the series. COUNT rules must be walked from DTSTART (the count
+depends on every earlier occurrence) but are finite by definition.
+Results are memoized per (series, day-aligned window); the memo is shared
+by the event loop and threadpool readers, so it is guarded by a lock
+(expansion itself runs outside it).
+
+Supported: FREQ=DAILY/WEEKLY/MONTHLY/YEARLY with INTERVAL, COUNT, UNTIL,
+BYDAY (incl. ordinals like 2TU / -1FR), BYMONTHDAY and BYMONTH.
+"""
+from __future__ import annotations
+
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.ics import ics_time, tzinfo_for
+from services.intervals import IntervalIndex
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+MAX_STEPS = 100_000   # hard stop for pathological rules
+MEMO_SIZE = 32        # memoized windows per series
+DAY = 86400
+
+
+def parse_rrule(rule: str) -> Dict[str, Any]:
+    parts = dict(p.split("=", 1) for p in rule.strip().split(";") if "=" in p)
+    byday: List[Tuple[int, int]] = []  # (ordinal or 0, weekday)
+    for tok in filter(None, parts.get("BYDAY", "").split(",")):
+        n, wd = tok[:-2], tok[-2:].upper()
+        if wd in WEEKDAYS:
+            byday.append((int(n) if n not in ("", "+") else 0, WEEKDAYS[wd]))
+    return {
+        "freq": parts.get("FREQ", "").upper(),
+        "interval": max(1, int(parts.get("INTERVAL", "1") or 1)),
+        "count": int(parts["COUNT"]) if parts.get("COUNT") else None,
+        "until": ics_time(parts["UNTIL"]) if parts.get("UNTIL") else None,
+        "byday": byday,
+        "bymonthday": [int(x) for x in filter(None, parts.get("BYMONTHDAY", "").split(","))],
+        "bymonth": [int(x) for x in filter(None, parts.get("BYMONTH", "").split(","))],
+    }
+
+
+def _month_days(y: int, m: int, start: date, rule: Dict[str, Any]) -> List[date]:
+    """Candidate days within one month for MONTHLY/YEARLY rules."""
+    ndays = calendar.monthrange(y, m)[1]
+    days: set[int] = set()
+    for md in rule["bymonthday"]:
+        d = md if md > 0 else ndays + md + 1
+        if 1 <= d <= ndays:
+            days.add(d)
+    for n, wd in rule["byday"]:
+        first = (wd - date(y, m, 1).weekday()) % 7 + 1
+        hits = list(range(first, ndays + 1, 7))
+        if n == 0:
+            days.update(hits)
+        elif -len(hits) <= n <= len(hits):
+            days.add(hits[n - 1] if n > 0 else hits[n])
+    if not rule["bymonthday"] and not rule["byday"]:
+        if start.day <= ndays:
+            days.add(start.day)
+    return [date(y, m, d) for d in sorted(days)]
+
+
+class Series:
+    def __init__(self, master: Dict[str, Any], overrides: Iterable[Dict[str, Any]] = ()):
+        self.master = master
+        self.uid = master["id"]
+        self.rule = parse_rrule(master["rrule"])
+        self.tz = tzinfo_for(master.get("tzid"))
+        start = datetime.fromisoformat(master["start"])
+        self.duration = datetime.fromisoformat(master["end"]) - start
+        self.local_start = start.astimezone(self.tz).replace(tzinfo=None)
+        self.exdates = {datetime.fromisoformat(d).timestamp() for d in master.get("exdates", [])}
+        self.overrides: Dict[float, Dict[str, Any]] = {}
+        for ov in overrides:
+            try:
+                self.overrides[datetime.fromisoformat(ov["recurrenceId"]).timestamp()] = ov
+            except ValueError:
+                continue
+        self._memo: "OrderedDict[Tuple[int, int], List[Tuple[float, float, Dict]]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    # ───────────── rule walking (local wall time) ─────────────
+    def _first_period(self, lo_local: datetime) -> int:
+        """Period index to start from: 0 for COUNT rules, else jump near `lo`."""
+        r = self.rule
+        if r["count"] is not None:
+            return 0
+        lo = lo_local - self.duration
+        s = self.local_start
+        if lo <= s:
+            return 0
+        f = r["freq"]
+        if f == "DAILY":
+            span = (lo.date() - s.date()).days
+        elif f == "WEEKLY":
+            span = (lo.date() - s.date()).days // 7
+        elif f == "MONTHLY":
+            span = (lo.year - s.year) * 12 + lo.month - s.month
+        else:
+            span = lo.year - s.year
+        return max(0, span // r["interval"] - 1)
+
+    def _period_days(self, k: int) -> Tuple[date, List[date]]:
+        """(first day of period k, candidate days in it, ascending)."""
+        r, s = self.rule, self.local_start.date()
+        step = k * r["interval"]
+        f = r["freq"]
+        if f == "DAILY":
+            d = s + timedelta(days=step)
+            ok = not r["byday"] or d.weekday() in {wd for _, wd in r["byday"]}
+            ok = ok and (not r["bymonth"] or d.month in r["bymonth"])
+            return d, [d] if ok else []
+        if f == "WEEKLY":
+            monday = s - timedelta(days=s.weekday()) + timedelta(weeks=step)
+            wds = sorted({wd for _, wd in r["byday"]} or {s.weekday()})
+            return monday, [monday + timedelta(days=wd) for wd in wds]
+        if f == "MONTHLY":
+            m = s.month - 1 + step
+            y, m = s.year + m // 12, m % 12 + 1
+            if r["bymonth"] and m not in r["bymonth"]:
+                return date(y, m, 1), []
+            return date(y, m, 1), _month_days(y, m, s, r)
+        # YEARLY
+        y = s.year + step
+        months = r["bymonth"] or [s.month]
+        days: List[date] = []
+        for m in sorted(months):
+            days += _month_days(y, m, s, r)
+        return date(y, 1, 1), days
+
+    def _iter_local(self, lo_local: datetime, hi_local: datetime) -> Iterator[datetime]:
+        r = self.rule
+        if r["freq"] not in ("DAILY", "WEEKLY", "MONTHLY", "YEARLY"):
+            if self.local_start < hi_local:
+                yield self.local_start  # unsupported rule: keep the first instance
+            return
+        clock = self.local_start.time()
+        until = r["until"]
+        n = 0
+        k = self._first_period(lo_local)
+        for _ in range(MAX_STEPS):
+            period_start, days = self._period_days(k)
+            if datetime.combine(period_start, time.min) >= hi_local:
+                return
+            for d in days:
+                t = datetime.combine(d, clock)
+                if t < self.local_start:
+                    continue
+                if until is not None and t.replace(tzinfo=self.tz).astimezone(timezone.utc) > until:
+                    return
+                n += 1
+                if r["count"] is not None and n > r["count"]:
+                    return
+                if t >= hi_local:
+                    return
+                yield t
+            k += 1
+
+    # ───────────── public ─────────────
+    def _expand_days(self, lo_day: int, hi_day: int) -> List[Tuple[float, float, Dict]]:
+        key = (lo_day, hi_day)
+        with self._memo_lock:
+            hit = self._memo.get(key)
+            if hit is not None:
+                self._memo.move_to_end(key)
+                return hit
+        lo, hi = lo_day * DAY, hi_day * DAY
+        lo_local = datetime.fromtimestamp(lo, self.tz).replace(tzinfo=None)
+        hi_local = datetime.fromtimestamp(hi, self.tz).replace(tzinfo=None)
+        dur = self.duration.total_seconds()
+        out: List[Tuple[float, float, Dict]] = []
+        for t in self._iter_local(lo_local, hi_local):
+            start = t.replace(tzinfo=self.tz).astimezone(timezone.utc)
+            ts = start.timestamp()
+            if ts + dur <= lo or ts in self.exdates or ts in self.overrides:
+                continue
+            ev = {k: v for k, v in self.master.items() if k not in ("rrule", "tzid", "exdates")}
+            ev["id"] = f"{self.uid}-{start:%Y%m%dT%H%M%SZ}"
+            ev["seriesId"] = self.uid
+            ev["start"] = start.isoformat()
+            ev["end"] = (start + self.duration).isoformat()
+            out.append((ts, ts + dur, ev))
+        # overrides may move an occurrence into (or out of) the window
+        for rid, ov in self.overrides.items():
+            if ov.get("cancelled") or rid in self.exdates:
+                continue
+            s = datetime.fromisoformat(ov["start"]).timestamp()
+            e = datetime.fromisoformat(ov["end"]).timestamp()
+            if s < hi and e > lo:
+                ev = {k: v for k, v in ov.items() if k not in ("recurrenceId", "cancelled")}
+                ev["id"] = f"{self.uid}-{datetime.fromtimestamp(rid, timezone.utc):%Y%m%dT%H%M%SZ}"
+                ev["seriesId"] = self.uid
+                out.append((s, e, ev))
+        with self._memo_lock:
+            self._memo[key] = out
+            while len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return out
+
+    def expand(self, lo: float, hi: float) -> List[Tuple[float, Dict]]:
+        """(start ts, event) for occurrences overlapping [lo, hi)."""
+        # memoize on whole UTC days so sliding "now"-based windows still hit
+        occ = self._expand_days(int(lo // DAY), int(-(-hi // DAY)))
+        return [(s, ev) for s, e, ev in occ if s < hi and e > lo]
+
+
+class Calendar:
+    """
+    A parsed feed: one-off events in an IntervalIndex plus recurring Series.
+    Unbounded queries (and iteration) are clamped to [horizon_start,
+    horizon_end) so a series is never expanded forever.
+    """
+
+    def __init__(self, events: Iterable[Dict[str, Any]], horizon_start: float, horizon_end: float):
+        singles: List[Dict[str, Any]] = []
+        masters: List[Dict[str, Any]] = []
+        overrides: Dict[str, List[Dict[str, Any]]] = {}
+        for ev in events:
+            if "rrule" in ev:
+                masters.append(ev)
+            elif "recurrenceId" in ev:
+                overrides.setdefault(ev["id"], []).append(ev)
+            else:
+                singles.append(ev)
+        self.series: List[Series] = []
+        for m in masters:
+            try:
+                self.series.append(Series(m, overrides.pop(m["id"], ())))
+            except (ValueError, KeyError):
+                singles.append({k: v for k, v in m.items() if k not in ("rrule", "tzid", "exdates")})
+        # overrides whose master is missing are plain events
+        for ovs in overrides.values():
+            singles += [{k: v for k, v in ov.items() if k not in ("recurrenceId", "cancelled")}
+                        for ov in ovs if not ov.get("cancelled")]
+        self.index = IntervalIndex(singles)
+        self.horizon = (horizon_start, horizon_end)
+
+    def __len__(self) -> int:
+        return len(self.index) + len(self.series)
+
+    def __iter__(self):
+        return iter(self.window())
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        items = self.index.window(start, end)
+        if not self.series:
+            return items
+        lo = self.horizon[0] if start is None else start
+        hi = self.horizon[1] if end is None else end
+        occ = [x for s in self.series for x in s.expand(lo, hi)]
+        if not occ:
+            return items
+        merged = [(ev["start"], ev) for ev in items] + [(ev["start"], ev) for _, ev in occ]
+        merged.sort(key=lambda x: x[0])
+        return [ev for _, ev in merged]
+
+    def at(self, t: float) -> List[Dict[str, Any]]:
+        items = self.index.at(t)
+        for s in self.series:
+            items += [ev for _, ev in s.expand(t, t + 0.001)
+                      if datetime.fromisoformat(ev["start"]).timestamp() <= t]
+        items.sort(key=lambda ev: ev["start"])
+        return items
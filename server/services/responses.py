@@ -0,0 +1,141 @@
+# server/services/responses.py
+"""
+Fast response path.
+
+- `dumps()` serializes with orjson when it is installed and falls back to
+  the stdlib (same compact output) when it is not.
+- `FastJSONResponse` renders with `dumps()`. Returning one directly from an
+  endpoint also skips FastAPI's `jsonable_encoder` walk, and returning a
+  plain `Response` around an already-serialized body (see `json_bytes`)
+  skips response_model re-validation of models that were validated on the
+  way in.
+- `CompressionMiddleware` negotiates brotli (if installed) or gzip for
+  large single-body responses; streaming responses (SSE, NDJSON) and bodies
+  that are already encoded pass through untouched.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+    ORJSON_READY = True
+except Exception:
+    orjson = None  # type: ignore
+    ORJSON_READY = False
+
+try:
+    import brotli
+    BROTLI_READY = True
+except Exception:
+    brotli = None  # type: ignore
+    BROTLI_READY = False
+
+_COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_bytes(body: bytes | str, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Response for a body that is already JSON text."""
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+# ───────────── compression ─────────────
+def pick_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Best encoding we can produce for an Accept-Encoding header: the highest
+    q among br (when installed) and gzip, `*` standing in for unlisted ones,
+    br on a tie. None means send the body as is.
+    """
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    wildcard = offered.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ("br", "gzip") if BROTLI_READY else ("gzip",):
+        q = offered.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+class CompressionMiddleware:
+    """ASGI middleware; see module docstring. Small bodies are not worth the CPU."""
+
+    def __init__(self, app: Any, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def wrapped(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message  # hold until we see whether the body is one piece
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            head, start = start, None
+            headers = MutableHeaders(raw=head["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body") or "content-encoding" in headers
+                    or len(body) < self.minimum_size
+                    or not headers.get("content-type", "").startswith(_COMPRESSIBLE)):
+                await send(head)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(head)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, wrapped)
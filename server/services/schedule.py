@@ -0,0 +1,240 @@
+# server/services/schedule.py
+"""
+Free time, double bookings and task fit across shifts, calendar events and
+task estimates.
+
+Everything is epoch seconds on a sorted sweep line:
+
+- busy(): events from the feeds turned into [start, end) intervals
+  clipped to the window (all-day entries skipped unless asked for),
+- overlaps(): one pass in start order with a heap of the events still
+  running; each new event is compared only against those,
+- union() + free_windows(): working hours (per local day, in `tz`) minus
+  the merged busy intervals, walked with two pointers,
+- place_tasks(): open tasks' remaining estimates (estimateMinutes minus
+  timeSpentMs) are laid into the free windows earliest-due-first, split
+  across windows when needed. EDF is optimal for this single-resource,
+  splittable case, so a task that misses its dueDate here cannot fit in
+  any order; it is reported with how much free time there was before it.
+
+plan() runs all of it once; the app caches the result per
+(feed versions, task-set version, window).
+"""
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from services.intervals import iso_ts
+
+DAY = 86400
+
+# (start, end, source, event)
+Busy = Tuple[float, float, str, Dict[str, Any]]
+Window = Tuple[float, float]
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _all_day(s: float, e: float) -> bool:
+    return s % DAY == 0 and e % DAY == 0 and e > s
+
+
+def busy(sources: Dict[str, Iterable[Dict[str, Any]]], lo: float, hi: float,
+         all_day: bool = False) -> List[Busy]:
+    """Events from each source as start-sorted intervals inside [lo, hi)."""
+    out: List[Busy] = []
+    for source, events in sources.items():
+        for ev in events:
+            s, e = iso_ts(ev.get("start", "")), iso_ts(ev.get("end", ""))
+            if s is None or e is None or e <= lo or s >= hi or e <= s:
+                continue
+            if not all_day and _all_day(s, e):
+                continue
+            out.append((max(s, lo), min(e, hi), source, ev))
+    out.sort(key=lambda b: (b[0], b[1]))
+    return out
+
+
+def overlaps(items: Sequence[Busy], limit: int = 1000) -> Tuple[List[dict], int]:
+    """Pairs of items that overlap (first `limit`), and the total number of pairs."""
+    found: List[dict] = []
+    total = 0
+    active: List[Tuple[float, int]] = []   # heap of (end, index) still running
+    for i, (s, e, source, ev) in enumerate(items):
+        while active and active[0][0] <= s:
+            heapq.heappop(active)
+        for end, j in active:
+            total += 1
+            if len(found) < limit:
+                other = items[j]
+                found.append({
+                    "start": _iso(s), "end": _iso(min(e, end)),
+                    "minutes": round((min(e, end) - s) / 60),
+                    "items": [_ref(other[2], other[3]), _ref(source, ev)],
+                })
+        heapq.heappush(active, (e, i))
+    return found, total
+
+
+def _ref(source: str, ev: Dict[str, Any]) -> dict:
+    return {"source": source, "id": ev.get("id"), "title": ev.get("title", ""),
+            "start": ev.get("start"), "end": ev.get("end")}
+
+
+def working_hours(lo: float, hi: float, tz: tzinfo, day_start: int, day_end: int) -> List[Window]:
+    """[lo, hi) cut down to day_start:00-day_end:00 local time on each day (whole range if 0-24)."""
+    if day_start <= 0 and day_end >= 24:
+        return [(lo, hi)]
+    out: List[Window] = []
+    day = datetime.fromtimestamp(lo, tz).date() - timedelta(days=1)
+    last = datetime.fromtimestamp(hi, tz).date()
+    while day <= last:
+        s = datetime.combine(day, time(day_start), tz).timestamp()
+        e = (datetime.combine(day, time(0), tz) + timedelta(hours=day_end)).timestamp()
+        s, e = max(s, lo), min(e, hi)
+        if e > s:
+            out.append((s, e))
+        day += timedelta(days=1)
+    return out
+
+
+def union(items: Sequence[Busy]) -> List[Window]:
+    """Start-sorted intervals merged into disjoint, sorted ones."""
+    out: List[List[float]] = []
+    for s, e, _, _ in items:
+        if out and s <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], e)
+        else:
+            out.append([s, e])
+    return [(s, e) for s, e in out]
+
+
+def free_windows(hours: Sequence[Window], taken: Sequence[Window], min_len: float = 0) -> List[Window]:
+    """`hours` minus the disjoint `taken` intervals, keeping gaps of at least `min_len` seconds."""
+    out: List[Window] = []
+    j, n = 0, len(taken)
+    for s, e in hours:
+        while j < n and taken[j][1] <= s:
+            j += 1
+        cur = s
+        k = j
+        while k < n and taken[k][0] < e:
+            if taken[k][0] - cur >= min_len and taken[k][0] > cur:
+                out.append((cur, taken[k][0]))
+            cur = max(cur, taken[k][1])
+            k += 1
+        if e - cur >= min_len and e > cur:
+            out.append((cur, e))
+    return out
+
+
+@dataclass
+class Placement:
+    blocks: List[dict] = field(default_factory=list)
+    unfit: List[dict] = field(default_factory=list)
+    unplaced: int = 0            # tasks (no dueDate or due past the window) left without room
+    remaining: List[Window] = field(default_factory=list)   # free time left after the blocks
+
+
+def open_tasks(tasks: Iterable[Mapping[str, Any]]) -> List[Tuple[float, float, Mapping[str, Any]]]:
+    """(due ts or inf, remaining seconds, task) for open tasks with an estimate left."""
+    out = []
+    for t in tasks:
+        est = t.get("estimateMinutes")
+        if not est or t.get("status") == "done" or t.get("source") in ("w2w", "gcal"):
+            continue
+        left = est * 60 - (t.get("timeSpentMs") or 0) / 1000
+        if left <= 0:
+            continue
+        due = iso_ts(t["dueDate"]) if t.get("dueDate") else None
+        out.append((due if due is not None else float("inf"), left, t))
+    out.sort(key=lambda x: (x[0], x[2].get("priority") != "urgent", x[2]["id"]))
+    return out
+
+
+def place_tasks(free: Sequence[Window], tasks: Sequence[Tuple[float, float, Any]], lo: float,
+                hi: float, min_block: float = 0) -> Placement:
+    """Earliest-due-first fill of `free` with each task's remaining estimate."""
+    p = Placement()
+    slots = [list(w) for w in free]            # mutable [start, end]
+    # free seconds available before a time: prefix sums over the windows
+    ends = [w[1] for w in free]
+    cum = [0.0]
+    for s, e in free:
+        cum.append(cum[-1] + e - s)
+
+    def free_before(t: float) -> float:
+        i = bisect_right(ends, t)
+        partial = max(0.0, t - free[i][0]) if i < len(free) and free[i][0] < t else 0.0
+        return cum[i] + partial
+
+    i = 0
+    for due, left, t in tasks:
+        need = left
+        deadline = min(due, hi)
+        pieces = []
+        while need > 0 and i < len(slots):
+            s, e = slots[i]
+            end = min(e, deadline)
+            avail = end - s
+            if avail < min(min_block, need):
+                if end < e:
+                    break    # cut off by the deadline; later windows are past it too
+                i += 1       # a sliver left over in this window
+                continue
+            take = min(need, avail)
+            pieces.append((s, s + take))
+            need -= take
+            slots[i][0] = s + take
+            if slots[i][0] >= e:
+                i += 1
+        for s, e in pieces:
+            p.blocks.append({"taskId": t["id"], "title": t["title"], "start": _iso(s), "end": _iso(e),
+                             "minutes": round((e - s) / 60)})
+        if need <= 0:
+            continue
+        if due <= hi:
+            available = free_before(due) if due > lo else 0.0
+            p.unfit.append({
+                "taskId": t["id"], "title": t["title"], "priority": t.get("priority"), "dueDate": t["dueDate"],
+                "reason": "overdue" if due <= lo else "no_room",
+                "needMinutes": round(left / 60),
+                "freeMinutesBeforeDue": round(available / 60),
+                "shortMinutes": round(need / 60),
+            })
+        else:
+            p.unplaced += 1
+    p.remaining = [(s, e) for s, e in slots[i:] if e > s]
+    return p
+
+
+def plan(sources: Dict[str, Iterable[Dict[str, Any]]], tasks: Iterable[Mapping[str, Any]], lo: float, hi: float,
+         tz: tzinfo = timezone.utc, day_start: int = 0, day_end: int = 24, min_minutes: int = 15,
+         all_day: bool = False, overlap_limit: int = 1000) -> dict:
+    """Free windows, overlaps and task fit for [lo, hi); the cached /schedule/* payload."""
+    items = busy(sources, lo, hi, all_day)
+    hours = working_hours(lo, hi, tz, day_start, day_end)
+    free = free_windows(hours, union(items), min_minutes * 60)
+    todo = open_tasks(tasks)
+    placed = place_tasks(free, todo, lo, hi, min_block=min_minutes * 60)
+    found, total = overlaps(items, overlap_limit)
+    min_len = min_minutes * 60
+    return {
+        "from": _iso(lo), "to": _iso(hi),
+        "busyItems": len(items),
+        "free": [{"start": _iso(s), "end": _iso(e), "minutes": round((e - s) / 60)} for s, e in free],
+        "freeAfterTasks": [{"start": _iso(s), "end": _iso(e), "minutes": round((e - s) / 60)}
+                           for s, e in placed.remaining if e - s >= min_len],
+        "blocks": placed.blocks,
+        "overlaps": found,
+        "overlapCount": total,
+        "unfit": placed.unfit,
+        "unplaced": placed.unplaced,
+        "tasksConsidered": len(todo),
+    }
@@ -0,0 +1,174 @@
+# server/services/scheduler.py
+"""
+Small asyncio job scheduler, started and stopped by the app's lifespan.
+
+Each job is an async callable run every `interval` seconds (+/- `jitter`
+so workers and jobs drift apart instead of firing together). A failing
+job is retried with exponential backoff (full jitter, capped at
+`backoff_max`) and returns to its normal interval after one success.
+`timeout` bounds a single run. `health()` reports runs, failures, the last
+error and the next run per job; `stop()` wakes every sleeping job, lets
+running ones finish for a grace period, then cancels what is left.
+
+Snapshots is where jobs leave precomputed results for request handlers:
+a value is served only while it was computed at the current data version
+and is younger than `max_age`, otherwise the handler computes it itself.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from services.cache import MISSING
+
+log = logging.getLogger("scheduler")
+
+JobFn = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    name: str
+    fn: JobFn
+    interval: float
+    jitter: float = 0.1
+    initial_delay: float = 0.0
+    timeout: Optional[float] = None
+    retry_base: float = 5.0
+    backoff_max: float = 600.0
+    # health
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    running: bool = False
+    last_started: Optional[float] = None
+    last_success: Optional[float] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    last_result: Any = None
+    next_run: Optional[float] = None
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def next_delay(self) -> float:
+        if self.consecutive_failures:
+            cap = min(self.backoff_max, self.retry_base * 2 ** (self.consecutive_failures - 1))
+            return random.uniform(cap / 2, cap)
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def health(self) -> Dict[str, Any]:
+        ok = self.last_success is not None and not self.consecutive_failures
+        return {
+            "ok": ok,
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "lastStarted": self.last_started,
+            "lastSuccess": self.last_success,
+            "lastDurationMs": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "lastError": self.last_error,
+            "lastResult": self.last_result,
+            "nextRun": self.next_run,
+        }
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.jobs: Dict[str, Job] = {}
+        self._stop: Optional[asyncio.Event] = None
+
+    def add(self, name: str, fn: JobFn, interval: float, **opts: Any) -> Job:
+        job = self.jobs[name] = Job(name, fn, interval, **opts)
+        return job
+
+    @property
+    def started(self) -> bool:
+        return self._stop is not None and not self._stop.is_set()
+
+    async def start(self) -> None:
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for job in self.jobs.values():
+            job._task = loop.create_task(self._loop(job), name=f"job:{job.name}")
+
+    async def stop(self, grace: float = 5.0) -> None:
+        if self._stop is None:
+            return
+        self._stop.set()
+        tasks = [j._task for j in self.jobs.values() if j._task is not None]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=grace)
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for job in self.jobs.values():
+            job._task, job.next_run = None, None
+
+    async def run_now(self, name: str) -> Job:
+        """Run one job immediately (outside its schedule); returns it with updated health."""
+        job = self.jobs[name]
+        await self._run(job)
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        jobs = {name: j.health() for name, j in self.jobs.items()}
+        return {"running": self.started, "ok": all(j["ok"] for j in jobs.values()), "jobs": jobs}
+
+    async def _loop(self, job: Job) -> None:
+        delay = job.initial_delay * random.uniform(0.5, 1.0) if job.initial_delay else 0.0
+        while True:
+            job.next_run = time.time() + delay
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+                return   # stop requested
+            except asyncio.TimeoutError:
+                pass
+            await self._run(job)
+            delay = job.next_delay()
+
+    async def _run(self, job: Job) -> None:
+        job.running = True
+        job.last_started = time.time()
+        t0 = time.perf_counter()
+        try:
+            job.last_result = await asyncio.wait_for(job.fn(), timeout=job.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.consecutive_failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            log.warning("job %s failed (%d in a row): %s", job.name, job.consecutive_failures, job.last_error)
+        else:
+            job.consecutive_failures = 0
+            job.last_error = None
+            job.last_success = time.time()
+        finally:
+            job.runs += 1
+            job.running = False
+            job.last_duration = time.perf_counter() - t0
+
+
+class Snapshots:
+    """Precomputed values tagged with the data version they were computed at."""
+
+    def __init__(self, max_age: float = 120):
+        self.max_age = max_age
+        self._data: Dict[Hashable, Tuple[Any, float, Any]] = {}   # key -> (version, monotonic time, value)
+
+    def put(self, key: Hashable, version: Any, value: Any) -> None:
+        self._data[key] = (version, time.monotonic(), value)
+
+    def get(self, key: Hashable, version: Any) -> Any:
+        hit = self._data.get(key)
+        if hit is None or hit[0] != version or time.monotonic() - hit[1] > self.max_age:
+            return MISSING
+        return hit[2]
+
+    def __len__(self) -> int:
+        return len(self._data)
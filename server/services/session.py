@@ -0,0 +1,222 @@
+# server/services/session.py
+"""
+Google sign-in verification with cached certs, and local session tokens.
+
+GoogleVerifier checks an ID token the way google.oauth2.id_token does
+(signature against Google's certs, audience, issuer, expiry), except that:
+
+- the certs are fetched once and kept for their Cache-Control max-age;
+  a token signed with a key id the cached set lacks (Google rotated)
+  triggers an early refetch, at most once per `refresh_floor` seconds,
+- a token already verified is remembered (by hash) until its `exp`, so
+  a retried login skips the RSA check.
+
+The signature check itself is google.auth.jwt.decode from the optional
+google-auth dependency; the app passes it in as `decode`.
+
+SessionSigner issues the server's own token after a Google login,
+`<base64url claims>.<base64url HMAC-SHA256>`, valid for `ttl` seconds.
+Checking one is an HMAC and a JSON parse, no network, so
+SessionMiddleware can run it on every request.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from services.cache import TTLCache, MISSING
+from services.http import HTTP, HttpClient
+from services.instrument import CACHE_EVENTS, UPSTREAM_SECONDS
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# decode(token, certs=..., audience=..., clock_skew_in_seconds=...) -> claims; raises on a bad token
+Decoder = Callable[..., Dict[str, Any]]
+
+
+class AuthError(Exception):
+    pass
+
+
+def _b64d(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _b64e(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).rstrip(b"=").decode()
+
+
+def max_age(cache_control: Optional[str]) -> Optional[float]:
+    """max-age from a Cache-Control header (None if absent or no-store/no-cache)."""
+    if not cache_control or re.search(r"no-(store|cache)", cache_control):
+        return None
+    m = re.search(r"max-age=(\d+)", cache_control)
+    return float(m.group(1)) if m else None
+
+
+def token_kid(token: str) -> Optional[str]:
+    try:
+        return json.loads(_b64d(token.split(".", 1)[0])).get("kid")
+    except Exception:
+        return None
+
+
+# ───────────── Google certs ─────────────
+class CertCache:
+    """Google's signing certs ({key id: PEM}), kept as long as the response allows."""
+
+    def __init__(self, url: str, http: HttpClient = HTTP, default_ttl: float = 3600,
+                 refresh_floor: float = 60):
+        self.url = url
+        self.http = http
+        self.default_ttl = default_ttl
+        self.refresh_floor = refresh_floor
+        self.certs: Dict[str, str] = {}
+        self.expires = 0.0         # monotonic
+        self.fetched_at = 0.0      # monotonic, last successful fetch
+        self.fetches = 0
+        self._inflight: Optional[asyncio.Future] = None
+
+    async def get(self, kid: Optional[str] = None) -> Dict[str, str]:
+        now = time.monotonic()
+        fresh = now < self.expires
+        rotated = kid is not None and kid not in self.certs and now - self.fetched_at >= self.refresh_floor
+        if fresh and not rotated:
+            CACHE_EVENTS.inc("google_certs", "hit")
+            return self.certs
+        CACHE_EVENTS.inc("google_certs", "miss")
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(lambda _: setattr(self, "_inflight", None))
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> Dict[str, str]:
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            r = await self.http.get(self.url, timeout=10)
+            r.raise_for_status()
+            certs = r.json()
+            outcome = "ok"
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "google_certs", outcome)
+        ttl = max_age(r.headers.get("Cache-Control"))
+        self.certs = certs
+        self.fetched_at = time.monotonic()
+        self.expires = self.fetched_at + (self.default_ttl if ttl is None else ttl)
+        self.fetches += 1
+        return certs
+
+
+class GoogleVerifier:
+    def __init__(self, certs: CertCache, decode: Optional[Decoder], audience: Optional[str] = None,
+                 clock_skew: float = 10, cache: Optional[TTLCache] = None):
+        self.certs = certs
+        self.decode = decode
+        self.audience = audience
+        self.clock_skew = clock_skew
+        self.cache = cache if cache is not None else TTLCache(maxsize=1024, jitter=0)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Verified claims of a Google ID token; raises AuthError."""
+        if self.decode is None:
+            raise AuthError("google-auth not installed")
+        key = hashlib.sha256(token.encode()).hexdigest()
+        hit = self.cache.get(key)
+        CACHE_EVENTS.inc("google_tokens", "miss" if hit is MISSING else "hit")
+        if hit is not MISSING:
+            return hit
+        try:
+            certs = await self.certs.get(token_kid(token))
+        except Exception as e:
+            raise AuthError(f"could not fetch Google certs: {e}")
+        try:
+            # RSA verification is CPU work; keep it off the event loop
+            claims = await asyncio.to_thread(self.decode, token, certs=certs, audience=self.audience,
+                                             clock_skew_in_seconds=self.clock_skew)
+        except Exception as e:
+            raise AuthError(str(e))
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise AuthError(f"wrong issuer {claims.get('iss')!r}")
+        left = float(claims.get("exp", 0)) - time.time()
+        if left > 0:
+            self.cache.set(key, claims, ttl=left)
+        return claims
+
+
+# ───────────── local sessions ─────────────
+class SessionSigner:
+    def __init__(self, secret: bytes, ttl: float = 3600):
+        if len(secret) < 16:
+            raise ValueError("session secret must be at least 16 bytes")
+        self.secret = secret
+        self.ttl = ttl
+
+    def _sign(self, payload: str) -> str:
+        return _b64e(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, claims: Dict[str, Any]) -> Tuple[str, int]:
+        """A token carrying `claims` (plus iat/exp); returns (token, exp)."""
+        now = int(time.time())
+        exp = now + int(self.ttl)
+        payload = _b64e(json.dumps({**claims, "iat": now, "exp": exp}, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}", exp
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a token this signer issued; raises AuthError if forged, malformed or expired."""
+        payload, _, sig = token.partition(".")
+        if not sig or not hmac.compare_digest(sig, self._sign(payload)):
+            raise AuthError("bad session signature")
+        try:
+            claims = json.loads(_b64d(payload))
+        except ValueError:
+            raise AuthError("malformed session")
+        if claims.get("exp", 0) <= time.time():
+            raise AuthError("session expired")
+        return claims
+
+
+class SessionMiddleware:
+    """
+    Pure ASGI. A valid `Authorization: Bearer <session>` puts its claims in
+    request.state.user. With `required`, any other request outside the
+    `public` path prefixes (and CORS preflights) gets 401.
+    """
+
+    def __init__(self, app: Any, sessions: SessionSigner, required: bool = False,
+                 public: Iterable[str] = ()):
+        self.app = app
+        self.sessions = sessions
+        self.required = required
+        self.public = tuple(public)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        user = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        user = self.sessions.verify(token.strip())
+                    except AuthError:
+                        pass
+                break
+        scope.setdefault("state", {})["user"] = user
+        if user is None and self.required and scope["method"] != "OPTIONS" \
+                and not scope["path"].startswith(self.public):
+            body = b'{"detail":"sign in required"}'
+            await send({"type": "http.response.start", "status": 401,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"www-authenticate", b"Bearer")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,225 @@
+# server/services/shared.py
+"""
+Cross-process state for running uvicorn with several workers.
+
+Everything lives in tables of one SQLite file (WAL mode, the same file as
+the task store), so any number of worker processes on the box see the
+same values:
+
+- SharedCache: TTLCache-compatible key/value cache (JSON values).
+- FeedShare: the latest raw body of each ICS feed plus a lease, so one
+  worker refreshes a feed upstream and the others adopt its result instead
+  of fetching the same feed themselves. Bodies are stored as compressed
+  chunks and streamed in and out, so no worker holds a whole feed in memory.
+
+Only the parsed form of a feed stays per process (it is rebuilt from the
+shared body when that changes).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Hashable, Optional
+
+from services.cache import MISSING
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_cache (
+    ns      TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value   TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE TABLE IF NOT EXISTS feed_share (
+    url           TEXT PRIMARY KEY,
+    owner         TEXT,
+    lease_until   REAL NOT NULL DEFAULT 0,
+    etag          TEXT,
+    last_modified TEXT,
+    body_hash     TEXT,
+    encoding      TEXT,
+    fetched_wall  REAL
+);
+CREATE TABLE IF NOT EXISTS feed_chunks (
+    url       TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    data      BLOB NOT NULL,
+    PRIMARY KEY (url, seq)
+);
+"""
+
+FEED_CHUNK_BYTES = 256 * 1024   # raw bytes per stored chunk (compressed on its own)
+
+
+class SharedDB:
+    """Per-thread connections to the shared SQLite file."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = str(path)
+        self._local = threading.local()
+        self.conn().executescript(_SCHEMA)
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+
+class SharedCache:
+    """Same get/set/pop/clear contract as TTLCache; expired rows are purged as writes go by."""
+
+    def __init__(self, db: SharedDB, ns: str, ttl: float = 300, negative_ttl: float = 60,
+                 jitter: float = 0.1):
+        self.db = db
+        self.ns = ns
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.jitter = jitter
+        self._writes = 0
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key)
+
+    def get(self, key: Hashable) -> Any:
+        row = self.db.conn().execute(
+            "SELECT value FROM shared_cache WHERE ns = ? AND key = ? AND expires > ?",
+            (self.ns, self._key(key), time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else MISSING
+
+    def set(self, key: Hashable, value: Any, ok: bool = True, ttl: Optional[float] = None) -> None:
+        base = ttl if ttl is not None else (self.ttl if ok else self.negative_ttl)
+        expires = time.time() + base * (1 + random.uniform(-self.jitter, self.jitter))
+        conn = self.db.conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO shared_cache VALUES (?, ?, ?, ?)",
+                         (self.ns, self._key(key), json.dumps(value), expires))
+            self._writes += 1
+            if self._writes % 256 == 0:
+                conn.execute("DELETE FROM shared_cache WHERE ns = ? AND expires <= ?",
+                             (self.ns, time.time()))
+
+    async def aget(self, key: Hashable) -> Any:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: Hashable, value: Any, ok: bool = True, ttl: Optional[float] = None) -> None:
+        await asyncio.to_thread(self.set, key, value, ok, ttl)
+
+    def pop(self, key: Hashable) -> None:
+        conn = self.db.conn()
+        with conn:
+            conn.execute("DELETE FROM shared_cache WHERE ns = ? AND key = ?", (self.ns, self._key(key)))
+
+    def clear(self) -> None:
+        conn = self.db.conn()
+        with conn:
+            conn.execute("DELETE FROM shared_cache WHERE ns = ?", (self.ns,))
+
+
+@dataclass
+class SharedFeed:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+    encoding: str
+    fetched_wall: float
+
+
+class FeedShare:
+    """
+    Shared feed bodies plus refresh leases. A worker calls `acquire(url)`
+    before going upstream; while its lease (`lease` seconds) is live the
+    other workers wait for `publish`/`touch` instead. A crashed holder's
+    lease simply runs out.
+    """
+
+    def __init__(self, db: SharedDB, lease: float = 30):
+        self.db = db
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def peek(self, url: str) -> Optional[SharedFeed]:
+        row = self.db.conn().execute(
+            "SELECT etag, last_modified, body_hash, encoding, fetched_wall FROM feed_share "
+            "WHERE url = ? AND body_hash IS NOT NULL", (url,),
+        ).fetchone()
+        return SharedFeed(*row) if row else None
+
+    def read_body(self, url: str, body_hash: str, out: BinaryIO) -> bool:
+        """
+        Stream the shared body with `body_hash` into `out` chunk by chunk.
+        False if there is none (a newer body replaced it meanwhile).
+        """
+        found = False
+        # one statement = one read snapshot, so the chunks all belong to the same publish
+        for (data,) in self.db.conn().execute(
+                "SELECT data FROM feed_chunks WHERE url = ? AND body_hash = ? ORDER BY seq",
+                (url, body_hash)):
+            out.write(zlib.decompress(data))
+            found = True
+        return found
+
+    def acquire(self, url: str) -> bool:
+        now = time.time()
+        conn = self.db.conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO feed_share (url, owner, lease_until) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until "
+                "WHERE feed_share.lease_until < ? OR feed_share.owner = excluded.owner",
+                (url, self.owner, now + self.lease, now),
+            )
+            row = conn.execute("SELECT owner FROM feed_share WHERE url = ?", (url,)).fetchone()
+        return bool(row) and row[0] == self.owner
+
+    def publish(self, url: str, body: BinaryIO, body_hash: str, encoding: str,
+                etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Replace the shared body with the rest of `body`, read FEED_CHUNK_BYTES at a time."""
+        conn = self.db.conn()
+        with conn:
+            conn.execute("DELETE FROM feed_chunks WHERE url = ?", (url,))
+            seq = 0
+            while chunk := body.read(FEED_CHUNK_BYTES):
+                conn.execute("INSERT INTO feed_chunks VALUES (?, ?, ?, ?)",
+                             (url, body_hash, seq, zlib.compress(chunk, 6)))
+                seq += 1
+            conn.execute(
+                "UPDATE feed_share SET body_hash = ?, encoding = ?, etag = ?, "
+                "last_modified = ?, fetched_wall = ? WHERE url = ?",
+                (body_hash, encoding, etag, last_modified, time.time(), url),
+            )
+
+    def touch(self, url: str) -> None:
+        """Upstream confirmed the shared body is current (304 / same bytes)."""
+        conn = self.db.conn()
+        with conn:
+            conn.execute("UPDATE feed_share SET fetched_wall = ? WHERE url = ? AND body_hash IS NOT NULL",
+                         (time.time(), url))
+
+    def forget(self, url: str) -> None:
+        conn = self.db.conn()
+        with conn:
+            conn.execute("DELETE FROM feed_share WHERE url = ?", (url,))
+            conn.execute("DELETE FROM feed_chunks WHERE url = ?", (url,))
+
+    def release(self, url: str) -> None:
+        conn = self.db.conn()
+        with conn:
+            conn.execute("UPDATE feed_share SET lease_until = 0 WHERE url = ? AND owner = ?",
+                         (url, self.owner))
@@ -0,0 +1,150 @@
+# server/services/sketch.py
+"""
+Mergeable streaming quantile sketches.
+
+KLL: a stack of compactors. Level h holds items of weight 2**h; when a
+level outgrows its capacity (k at the top, shrinking by 2/3 per level
+below) it is sorted and every other item is promoted to the next level.
+Size stays O(k) however many values go in; rank error is about 1.7/k
+of the count (~1% at k=200). Two sketches merge by concatenating levels
+and compacting, so per-bucket sketches can be combined for any range
+without touching the original values. Compaction offsets alternate
+instead of being random, so results are deterministic.
+
+Distribution: a KLL of added values plus a KLL of removed ones. Metrics
+change when a task is edited or leaves `done`, and a sketch cannot forget
+a value, so removals are tracked on the side and subtracted at query time
+(net rank = added rank - removed rank). The error is relative to all
+values ever added, which is fine while removals are rare.
+"""
+from __future__ import annotations
+
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+class KLL:
+    __slots__ = ("k", "levels", "n", "_size", "_max", "_coin")
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.levels: List[List[float]] = [[]]
+        self.n = 0          # total weight (values added)
+        self._size = 0      # items held
+        self._max = self._max_size()
+        self._coin = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, x: float) -> None:
+        self.levels[0].append(x)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max:
+            self._compress()
+
+    def _grow(self) -> None:
+        self.levels.append([])
+        self._max = self._max_size()
+
+    def _compress(self) -> None:
+        for h in range(len(self.levels)):
+            level = self.levels[h]
+            if len(level) < self._capacity(h):
+                continue
+            if h + 1 == len(self.levels):
+                self._grow()
+            level.sort()
+            keep = [level.pop()] if len(level) % 2 else []   # odd one out stays at this level
+            self._coin ^= 1
+            promoted = level[self._coin::2]
+            self.levels[h + 1].extend(promoted)
+            self._size -= len(level) - len(promoted)
+            self.levels[h] = keep
+            if self._size < self._max:
+                break
+
+    def merge(self, other: "KLL") -> "KLL":
+        """Fold `other` into this sketch (other is left unchanged)."""
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self._size += other._size
+        while self._size >= self._max:
+            before = self._size
+            self._compress()
+            if self._size == before:
+                break
+        return self
+
+    def weighted(self) -> Iterable[Tuple[float, int]]:
+        for h, level in enumerate(self.levels):
+            w = 1 << h
+            for x in level:
+                yield x, w
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        return _quantiles(sorted(self.weighted()), self.n, qs)
+
+
+def _quantiles(items: List[Tuple[float, int]], total: float, qs: Sequence[float]) -> List[Optional[float]]:
+    """Smallest value whose cumulative weight reaches q * total, for each q."""
+    res: List[Optional[float]] = [None] * len(qs)
+    if total <= 0 or not items:
+        return res
+    cum, j = 0, 0
+    for i in sorted(range(len(qs)), key=qs.__getitem__):
+        target = max(qs[i] * total, 1)   # p0 too must land on a value still present
+        while j < len(items) and cum < target:
+            cum += items[j][1]
+            j += 1
+        res[i] = items[j - 1][0]
+    return res
+
+
+class Distribution:
+    """Values added and removed over time; quantiles of what is left."""
+
+    __slots__ = ("added", "removed")
+
+    def __init__(self, k: int = 200):
+        self.added = KLL(k)
+        self.removed = KLL(k)
+
+    @property
+    def count(self) -> int:
+        return self.added.n - self.removed.n
+
+    def add(self, x: float) -> None:
+        self.added.update(x)
+
+    def remove(self, x: float) -> None:
+        self.removed.update(x)
+
+    def merge(self, other: "Distribution") -> "Distribution":
+        self.added.merge(other.added)
+        self.removed.merge(other.removed)
+        return self
+
+    @classmethod
+    def merged(cls, parts: Iterable["Distribution"], k: int = 200) -> "Distribution":
+        out = cls(k)
+        for p in parts:
+            out.merge(p)
+        return out
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        if not self.removed.n:
+            return self.added.quantiles(qs)
+        items = sorted([*self.added.weighted(), *((x, -w) for x, w in self.removed.weighted())])
+        return _quantiles(items, self.count, qs)
@@ -0,0 +1,453 @@
+# server/services/store.py
+"""
+Task storage backends.
+
+`TaskStore` is the small interface the API talks to. Two implementations:
+
+- MemoryTaskStore: the old process-local dict (handy for tests/demos).
+- SqliteTaskStore: durable, WAL-mode SQLite file. The full task is kept as a
+  JSON blob next to a few indexed columns (status, updatedAt, dueDate,
+  source) used for filtering. Nothing is loaded into memory at startup.
+
+Tasks arrive with times in several ISO spellings (client `...Z`, naive
+server `utcnow()`, feed `+00:00`, date-only due dates). The blob keeps
+them verbatim; filters compare `utc_text` of them, one fixed-width UTC
+form that sorts as text, which is also what the indexed columns hold.
+
+Tasks are validated once on the way in, so rows are rebuilt with
+`model_construct` on the way out instead of being re-validated.
+
+Each task also carries its own `version`, stamped by the store inside the
+write transaction (previous + 1). `apply(..., expect={id: version})` is a
+compare-and-set: the whole batch is rejected with VersionConflict if any
+listed task changed in between, across processes too (SQLite serializes
+the check and the write under BEGIN IMMEDIATE). Reads never lock: WAL
+readers see a committed snapshot and the memory store swaps in new task
+objects instead of mutating them.
+
+Every write bumps the store `version`; together with `epoch` it identifies the
+current contents, e.g. for collection ETags. The SQLite store also logs
+each written/deleted id to a `changes` table in the same transaction, so
+several worker processes sharing one file agree on `version` and can catch
+up on each other's writes (`changes_since`). It is `shared`; the memory
+store is process-local.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+
+class VersionConflict(Exception):
+    def __init__(self, task_id: str, expected: int, current: Optional[int]):
+        super().__init__(f"{task_id}: expected version {expected}, found {current}")
+        self.task_id = task_id
+        self.expected = expected
+        self.current = current
+
+
+def utc_text(value: str | date | None) -> Optional[str]:
+    """
+    `value` as fixed-width UTC text (YYYY-MM-DDTHH:MM:SS.ffffffZ) that
+    orders like the instants it names. Naive and date-only values count as
+    UTC; None if missing or unparseable.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if not value.tzinfo:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _stamp(puts: List[Any], current: Dict[str, int], expect: Optional[Dict[str, int]]) -> List[Any]:
+    """Check `expect` against `current` versions, then return puts with version+1."""
+    for tid, want in (expect or {}).items():
+        have = current.get(tid, 0)
+        if have != want:
+            raise VersionConflict(tid, want, current.get(tid))
+    out = []
+    for t in puts:
+        v = current[t.id] = current.get(t.id, 0) + 1
+        out.append(t.model_copy(update={"version": v}))
+    return out
+
+
+class TaskRow(NamedTuple):
+    """The fields the analytics views read, without building a Task model."""
+    id: str
+    status: str
+    priority: str
+    source: Optional[str]
+    createdAt: Optional[str]
+    updatedAt: str
+    dueDate: Optional[str]
+    timeSpentMs: Optional[int]
+    estimateMinutes: Optional[int]
+
+
+class TaskStore:
+    """Interface for task persistence. `model` is the pydantic Task class."""
+
+    shared = False   # safe to use from several processes at once
+
+    def __init__(self, model: Type[Any]):
+        self.model = model
+        self.epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[int, str, bool]]]:
+        """(floor, [(version, id, deleted)...]) for writes after `version`."""
+        raise NotImplementedError
+
+    def get(self, task_id: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """Existing tasks among `ids`, keyed by id."""
+        return {t.id: t for t in map(self.get, ids) if t is not None}
+
+    def versions(self, ids: Iterable[str]) -> Dict[str, int]:
+        """Current versions of the existing tasks among `ids`."""
+        return {tid: t.version or 0 for tid, t in self.get_many(ids).items()}
+
+    def list(self) -> List[Any]:
+        raise NotImplementedError
+
+    def iter_by_status(self, status: str) -> Iterator[Any]:
+        raise NotImplementedError
+
+    def iter_by_source(self, source: str) -> Iterator[Any]:
+        raise NotImplementedError
+
+    def scan(self, status: Optional[str] = None) -> Iterator[Any]:
+        """
+        Every task (or every one with `status`) with at least TaskRow's
+        fields, streamed from one consistent read; for bulk loads.
+        """
+        raise NotImplementedError
+
+    def query_json(self, q: "TaskQuery") -> List[str]:
+        """Tasks matching `q`, ordered by id, as JSON text (one per task)."""
+        raise NotImplementedError
+
+    def put(self, task: Any) -> Any:
+        return self.apply([task], ())[0]
+
+    def put_many(self, tasks: Iterable[Any]) -> List[Any]:
+        return self.apply(tasks, ())
+
+    def apply(self, puts: Iterable[Any], deletes: Iterable[str],
+              expect: Optional[Dict[str, int]] = None) -> List[Any]:
+        """
+        Upsert `puts` and delete `deletes` ids as one batch; returns the
+        written tasks with their new versions. `expect` maps ids to the
+        version the caller read (0 = absent).
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class TaskQuery:
+    """
+    Filters for a page of tasks. Dates are `utc_text` strings, compared as
+    text against `utc_text` of the task's dueDate/updatedAt. `after` is the
+    last id of the previous page.
+    """
+    status: Tuple[str, ...] = ()
+    source: Optional[str] = None
+    due_from: Optional[str] = None
+    due_to: Optional[str] = None
+    updated_since: Optional[str] = None
+    after: Optional[str] = None
+    limit: Optional[int] = None
+
+    def match(self, t: Any) -> bool:
+        if self.status and t.status not in self.status:
+            return False
+        if self.source is not None and t.source != self.source:
+            return False
+        if self.due_from is not None or self.due_to is not None:
+            due = utc_text(t.dueDate)
+            if not due or (self.due_from is not None and due < self.due_from) \
+                    or (self.due_to is not None and due >= self.due_to):
+                return False
+        if self.updated_since is not None and (utc_text(t.updatedAt) or "") <= self.updated_since:
+            return False
+        return self.after is None or t.id > self.after
+
+
+class MemoryTaskStore(TaskStore):
+    def __init__(self, model: Type[Any]):
+        super().__init__(model)
+        self._tasks: Dict[str, Any] = {}
+        self._write = threading.Lock()   # writers only; readers never take it
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def list(self):
+        return list(self._tasks.values())
+
+    def iter_by_status(self, status):
+        return (t for t in list(self._tasks.values()) if t.status == status)
+
+    def iter_by_source(self, source):
+        return (t for t in list(self._tasks.values()) if t.source == source)
+
+    def scan(self, status=None):
+        # the models are already in memory and never mutated
+        return (t for t in list(self._tasks.values()) if status is None or t.status == status)
+
+    def query_json(self, q):
+        hits = sorted((t for t in list(self._tasks.values()) if q.match(t)), key=lambda t: t.id)
+        return [t.model_dump_json() for t in hits[:q.limit]]
+
+    def apply(self, puts, deletes, expect=None):
+        puts, deletes = list(puts), list(deletes)
+        if not puts and not deletes:
+            return []
+        with self._write:
+            ids = [t.id for t in puts] + deletes + list(expect or ())
+            current = {tid: self._tasks[tid].version or 0 for tid in ids if tid in self._tasks}
+            stamped = _stamp(puts, current, expect)
+            for t in stamped:
+                self._tasks[t.id] = t
+            for task_id in deletes:
+                self._tasks.pop(task_id, None)
+            self._version += 1
+        return stamped
+
+    def count(self):
+        return len(self._tasks)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id        TEXT PRIMARY KEY,
+    status    TEXT NOT NULL,
+    updatedAt TEXT NOT NULL,
+    dueDate   TEXT,
+    source    TEXT,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_tasks_status    ON tasks(status);
+CREATE INDEX IF NOT EXISTS ix_tasks_updatedAt ON tasks(updatedAt);
+CREATE INDEX IF NOT EXISTS ix_tasks_dueDate   ON tasks(dueDate);
+CREATE INDEX IF NOT EXISTS ix_tasks_source    ON tasks(source);
+CREATE TABLE IF NOT EXISTS changes (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    id      TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+# meta key marking that updatedAt/dueDate hold utc_text; files written before
+# that kept the raw strings and are re-indexed once on open
+_TIME_TEXT = "time_text"
+CHANGES_KEEP = 50_000   # change rows kept for catch-up; older ones are compacted away
+
+# Fixed SQL text so sqlite3's per-connection statement cache reuses the
+# prepared statements.
+_SQL_GET = "SELECT data FROM tasks WHERE id = ?"
+_SQL_GET_MANY = "SELECT data FROM tasks WHERE id IN (%s)"
+_SQL_VERSIONS = "SELECT id, COALESCE(json_extract(data, '$.version'), 0) FROM tasks WHERE id IN (%s)"
+_GET_MANY_CHUNK = 500   # stays under SQLite's bound-parameter limit
+_SQL_ALL = "SELECT data FROM tasks"
+_SQL_BY_STATUS = "SELECT data FROM tasks WHERE status = ?"
+_SQL_BY_SOURCE = "SELECT data FROM tasks WHERE source = ?"
+# the tasks' own time strings, not the utc_text index columns
+_SQL_SCAN = ("SELECT id, status, json_extract(data, '$.priority'), source, "
+             "json_extract(data, '$.createdAt'), json_extract(data, '$.updatedAt'), "
+             "json_extract(data, '$.dueDate'), "
+             "json_extract(data, '$.timeSpentMs'), json_extract(data, '$.estimateMinutes') FROM tasks")
+_SCAN_BATCH = 10_000
+_SQL_DELETE = "DELETE FROM tasks WHERE id = ?"
+_SQL_COUNT = "SELECT COUNT(*) FROM tasks"
+_SQL_LOG = "INSERT INTO changes (id, deleted) VALUES (?, ?)"
+_SQL_VERSION = "SELECT MAX(seq) FROM changes"
+_SQL_FLOOR = "SELECT MIN(seq) - 1 FROM changes"
+_SQL_SINCE = "SELECT seq, id, deleted FROM changes WHERE seq > ? ORDER BY seq"
+_SQL_COMPACT = "DELETE FROM changes WHERE seq <= ?"
+_SQL_TIMES = "SELECT id, json_extract(data, '$.updatedAt'), json_extract(data, '$.dueDate') FROM tasks"
+_SQL_SET_TIMES = "UPDATE tasks SET updatedAt = ?, dueDate = ? WHERE id = ?"
+_SQL_UPSERT = """
+INSERT INTO tasks (id, status, updatedAt, dueDate, source, data)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    status = excluded.status, updatedAt = excluded.updatedAt,
+    dueDate = excluded.dueDate, source = excluded.source, data = excluded.data
+"""
+
+
+class SqliteTaskStore(TaskStore):
+    """One connection per thread (FastAPI runs sync handlers on a threadpool)."""
+
+    shared = True
+
+    def __init__(self, model: Type[Any], path: str | os.PathLike):
+        super().__init__(model)
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        with conn:  # first process to open the file picks the epoch for everyone
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('epoch', ?)", (self.epoch,))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")   # one process re-indexes, the others wait and skip
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (_TIME_TEXT,)).fetchone() is None:
+                conn.executemany(_SQL_SET_TIMES, [
+                    (utc_text(u) or "", utc_text(d), tid) for tid, u, d in conn.execute(_SQL_TIMES).fetchall()
+                ])
+                conn.execute("INSERT INTO meta VALUES (?, '1')", (_TIME_TEXT,))
+
+    @property
+    def version(self) -> int:
+        return self._conn().execute(_SQL_VERSION).fetchone()[0] or 0
+
+    def changes_since(self, version):
+        conn = self._conn()
+        rows = [(seq, tid, bool(d)) for seq, tid, d in conn.execute(_SQL_SINCE, (version,))]
+        floor = conn.execute(_SQL_FLOOR).fetchone()[0]
+        return (floor if floor is not None else 0), rows
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, data: str) -> Any:
+        return self.model.model_construct(**json.loads(data))
+
+    def get(self, task_id):
+        row = self._conn().execute(_SQL_GET, (task_id,)).fetchone()
+        return self._load(row[0]) if row else None
+
+    def get_many(self, ids):
+        ids = list(dict.fromkeys(ids))
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(ids), _GET_MANY_CHUNK):
+            chunk = ids[i:i + _GET_MANY_CHUNK]
+            for (d,) in conn.execute(_SQL_GET_MANY % ",".join("?" * len(chunk)), chunk):
+                t = self._load(d)
+                out[t.id] = t
+        return out
+
+    def versions(self, ids):
+        return self._versions(self._conn(), list(ids))
+
+    def list(self):
+        return [self._load(d) for (d,) in self._conn().execute(_SQL_ALL)]
+
+    def iter_by_status(self, status):
+        for (d,) in self._conn().execute(_SQL_BY_STATUS, (status,)):
+            yield self._load(d)
+
+    def iter_by_source(self, source):
+        for (d,) in self._conn().execute(_SQL_BY_SOURCE, (source,)):
+            yield self._load(d)
+
+    def scan(self, status=None):
+        # a connection of its own: the statement's read snapshot lasts for the whole
+        # scan, however slowly it is consumed, and the thread's connection stays free
+        conn = sqlite3.connect(self.path)
+        try:
+            cur = conn.execute(_SQL_SCAN + " WHERE status = ?", (status,)) if status else conn.execute(_SQL_SCAN)
+            while rows := cur.fetchmany(_SCAN_BATCH):
+                yield from map(TaskRow._make, rows)
+        finally:
+            conn.close()
+
+    def query_json(self, q):
+        # stored blobs are already serialized tasks: hand them out untouched
+        where, args = [], []
+        if q.status:
+            where.append("status IN (%s)" % ",".join("?" * len(q.status)))
+            args += q.status
+        for cond, val in (("source = ?", q.source), ("dueDate >= ?", q.due_from),
+                          ("dueDate < ?", q.due_to), ("updatedAt > ?", q.updated_since),
+                          ("id > ?", q.after)):
+            if val is not None:
+                where.append(cond)
+                args.append(val)
+        sql = "SELECT data FROM tasks"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if q.limit is not None:
+            sql += " LIMIT ?"
+            args.append(q.limit)
+        return [d for (d,) in self._conn().execute(sql, args)]
+
+    def _versions(self, conn: sqlite3.Connection, ids: List[str]) -> Dict[str, int]:
+        ids = list(dict.fromkeys(ids))
+        out: Dict[str, int] = {}
+        for i in range(0, len(ids), _GET_MANY_CHUNK):
+            chunk = ids[i:i + _GET_MANY_CHUNK]
+            out.update(conn.execute(_SQL_VERSIONS % ",".join("?" * len(chunk)), chunk))
+        return out
+
+    def apply(self, puts, deletes, expect=None):
+        puts, deletes = list(puts), list(deletes)
+        if not puts and not deletes:
+            return []
+        conn = self._conn()
+        with conn:  # one transaction for the whole batch and its change rows
+            conn.execute("BEGIN IMMEDIATE")  # take the write lock before reading versions
+            current = self._versions(conn, [t.id for t in puts] + deletes + list(expect or ()))
+            stamped = _stamp(puts, current, expect)
+            rows = [
+                (t.id, t.status, utc_text(t.updatedAt) or "", utc_text(t.dueDate), t.source,
+                 t.model_dump_json())
+                for t in stamped
+            ]
+            gone = [(task_id,) for task_id in deletes]
+            log = [(r[0], 0) for r in rows] + [(g[0], 1) for g in gone]
+            if rows:
+                conn.executemany(_SQL_UPSERT, rows)
+            if gone:
+                conn.executemany(_SQL_DELETE, gone)
+            conn.executemany(_SQL_LOG, log)
+            last = conn.execute(_SQL_VERSION).fetchone()[0]
+            if last % 1000 < len(log):  # roughly every 1000 changes
+                conn.execute(_SQL_COMPACT, (last - CHANGES_KEEP,))
+        return stamped
+
+    def count(self):
+        return self._conn().execute(_SQL_COUNT).fetchone()[0]
+
+
+def make_store(model: Type[Any]) -> TaskStore:
+    """Pick a backend from TASK_STORE (sqlite|memory) and TASKS_DB_PATH."""
+    kind = os.getenv("TASK_STORE", "sqlite").strip().lower()
+    if kind == "memory":
+        return MemoryTaskStore(model)
+    path = os.getenv("TASKS_DB_PATH", "").strip() or Path(__file__).resolve().parent.parent / "tasks.db"
+    return SqliteTaskStore(model, path)
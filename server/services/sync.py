@@ -0,0 +1,176 @@
+# server/services/sync.py
+"""
+Diff-based feed → task sync shared by /w2w and /gcal sync-to-tasks.
+
+Each synced task only owns a few fields that come from the event (title,
+description, createdAt, dueDate); everything else (status, priority, time
+spent...) belongs to the user and is left alone on resync. The engine keeps
+a fingerprint of those event fields per task id, so a resync is a dict
+lookup per event and an unchanged event costs no store read, no model
+validation and no write.
+
+A sync is planned first and applied as one store batch, guarded by the
+task versions the plan read (re-plan on VersionConflict):
+
+    plan = SYNC.plan("w2w", rows, horizon=(lo, hi))
+    STORE.apply(plan.puts, plan.deletes, expect=plan.expect)
+    SYNC.commit(plan)
+
+A task is removed when its event is gone from the feed, its due date lies
+inside `horizon` and it is not done. The horizon is the span the feed
+covers at the time of the sync (events outside it were clamped out of the
+cache, not deleted upstream), so callers derive it from the current time,
+not from when the feed was parsed.
+
+Given the change log, the engine folds in writes made elsewhere (task
+edits, other worker processes) before each plan, so its fingerprints never
+drift from the store.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EVENT_FIELDS = ("title", "description", "createdAt", "dueDate")
+
+
+def fingerprint(fields: Any) -> str:
+    """Short digest of the event-owned fields of a row dict or task."""
+    get = fields.get if isinstance(fields, dict) else lambda k: getattr(fields, k, None)
+    raw = "\x1f".join(str(get(k) or "") for k in EVENT_FIELDS)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def _ts(iso: Optional[str]) -> Optional[float]:
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@dataclass
+class SyncPlan:
+    source: str
+    puts: List[Any] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # fingerprints to record once the batch is written
+    fps: Dict[str, Tuple[str, Optional[float]]] = field(default_factory=dict)
+    # versions the plan was based on (0 = absent); pass to STORE.apply(expect=...)
+    expect: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        return {"created": self.created, "updated": self.updated,
+                "unchanged": self.unchanged, "removed": len(self.deletes)}
+
+
+class SyncEngine:
+    def __init__(self, store: Any, changes: Any = None):
+        self.store = store
+        self.changes = changes
+        self._known: Dict[str, Dict[str, Tuple[str, Optional[float]]]] = {}  # source -> id -> (fp, due ts)
+        self._at = 0   # change-log version the fingerprints reflect
+        self._lock = threading.Lock()
+
+    def _catch_up(self) -> None:
+        if self.changes is None:
+            return
+        if not self._known:
+            self._at = self.changes.version  # indexes loaded from here on are current
+            return
+        if self.changes.version == self._at:
+            return
+        reset, self._at, delta = self.changes.delta(self._at)
+        if reset:
+            self._known.clear()
+            return
+        for _, tid, t in delta:
+            for known in self._known.values():
+                known.pop(tid, None)
+            if t is not None and t.source in self._known:
+                self._known[t.source][tid] = (fingerprint(t), _ts(t.dueDate))
+
+    def _index(self, source: str) -> Dict[str, Tuple[str, Optional[float]]]:
+        """Fingerprints of tasks already stored for `source` (loaded once)."""
+        known = self._known.get(source)
+        if known is None:
+            known = {t.id: (fingerprint(t), _ts(t.dueDate)) for t in self.store.iter_by_source(source)}
+            self._known[source] = known
+        return known
+
+    def plan(
+        self,
+        source: str,
+        rows: Iterable[Dict[str, Any]],
+        seen: Iterable[str] = (),
+        horizon: Optional[Tuple[float, float]] = None,
+        now: Optional[str] = None,
+    ) -> SyncPlan:
+        """
+        `rows` are full task dicts for the events to sync. `seen` holds ids
+        that are still in the feed but not synced (e.g. past gcal events) so
+        they are not treated as deleted. Without `horizon` nothing is removed.
+        """
+        model = self.store.model
+        now = now or datetime.utcnow().isoformat()
+        p = SyncPlan(source)
+        with self._lock:
+            self._catch_up()
+            known = self._index(source)
+            present = set(seen)
+            for row in rows:
+                tid = row["id"]
+                present.add(tid)
+                fp = fingerprint(row)
+                prev = known.get(tid)
+                if prev is not None and prev[0] == fp:
+                    p.unchanged += 1
+                    continue
+                existing = self.store.get(tid)
+                if existing is None:
+                    # rows are built by the server from parsed events: no re-validation
+                    p.puts.append(model.model_construct(**row))
+                    p.expect[tid] = 0
+                    p.created += 1
+                else:
+                    update = {k: row.get(k) for k in EVENT_FIELDS}
+                    update["updatedAt"] = now
+                    p.puts.append(existing.model_copy(update=update))
+                    p.expect[tid] = existing.version or 0
+                    p.updated += 1
+                p.fps[tid] = (fp, _ts(row.get("dueDate")))
+
+            if horizon is not None:
+                lo, hi = horizon
+                for tid, (_, due) in known.items():
+                    if tid in present or due is None or not lo <= due < hi:
+                        continue
+                    t = self.store.get(tid)
+                    if t is not None and t.status != "done":
+                        p.deletes.append(tid)
+                        p.expect[tid] = t.version or 0
+        return p
+
+    def commit(self, plan: SyncPlan) -> None:
+        """Record a plan whose batch has been written."""
+        with self._lock:
+            known = self._index(plan.source)
+            known.update(plan.fps)
+            for tid in plan.deletes:
+                known.pop(tid, None)
+
+    def forget(self, source: Optional[str] = None) -> None:
+        """Drop cached fingerprints (all sources by default); reloaded on next plan."""
+        with self._lock:
+            if source is None:
+                self._known.clear()
+            else:
+                self._known.pop(source, None)
@@ -0,0 +1,131 @@
+# server/services/views.py
+"""
+Derived read models of the task set, kept off the write path.
+
+TaskViews owns the weekly aggregates (WeeklyMetrics), the percentile
+sketches (TaskDistributions) and, when NumPy is installed, the columnar
+mirror (TaskColumns). Writers never touch them: a write goes to the store
+and the change log and nothing else. Readers use `read()`, which first
+folds in whatever the change log recorded since the views were last
+brought up to date (writes from other workers included) and then hands
+the views out under the views' own lock. A slow analytics query can hold
+up other analytics queries, never a task write.
+
+The aggregates keep no per-task state. To fold in an edit they need what
+the task looked like before it, and that comes from the columnar mirror:
+its row is read as a DoneRecord, the row is replaced, and the aggregates
+swap the old record for the new one. Without NumPy there is no mirror,
+so a change is folded in by rebuilding, at most every `rebuild_every`
+seconds (reads in between see views that lag by that much).
+
+The views are seeded from the store on first use, not at boot, rebuilt
+when the change log no longer reaches back far enough, and rebuilt by
+`maintain()` once retracted values make up too much of the sketches. A
+rebuild streams lightweight rows from `store.scan()` (no pydantic models)
+into fresh objects outside the views lock and only takes it to swap them in.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from services.metrics import TaskDistributions, WeeklyMetrics, done_record
+
+if TYPE_CHECKING:
+    from services.columns import TaskColumns
+
+# removed / added values in the sketches above which maintain() rebuilds
+REBUILD_REMOVED_SHARE = 0.25
+
+
+class TaskViews:
+    def __init__(self, store: Any, changes: Any, columns: bool = False,
+                 rebuild_every: float = 5.0) -> None:
+        self.store = store
+        self.changes = changes
+        self.with_columns = columns   # NumPy installed: keep the columnar mirror too
+        self.weekly = WeeklyMetrics()
+        self.distributions = TaskDistributions()
+        self.columns: Optional["TaskColumns"] = None
+        self.at = 0                   # change-log version the views reflect
+        self.seeded = False
+        self.rebuild_every = rebuild_every   # without the mirror: longest a change waits for a rebuild
+        self.built_at = 0.0
+        self._lock = threading.Lock()         # readers and catch-up
+        self._build_lock = threading.Lock()   # one rebuild at a time
+
+    def rebuild(self, force: bool = False) -> None:
+        """
+        Build fresh views from a store scan without holding the views lock
+        (readers keep using the current ones), then swap them in and replay
+        what the change log recorded while the scan ran.
+        """
+        with self._build_lock:
+            if self.seeded and not force:
+                return   # another reader seeded them while this one waited
+            at = self.changes.version   # read first so nothing written meanwhile is missed
+            weekly, dists = WeeklyMetrics(), TaskDistributions()
+            if self.with_columns:
+                from services.columns import TaskColumns   # numpy: imported on first use
+                cols: Optional["TaskColumns"] = TaskColumns()
+                cols.extend(self.store.scan())
+                records = cols.done_records()
+            else:
+                cols = None
+                records = (done_record(r) for r in self.store.scan("done"))
+            for rec in records:
+                weekly.add(rec)
+                dists.add(rec)
+            with self._lock:
+                self.weekly, self.distributions, self.columns = weekly, dists, cols
+                self.at, self.seeded = at, True
+                self.built_at = time.monotonic()
+                self._catch_up()   # replaying a change the scan already saw is a no-op
+
+    def maintain(self) -> bool:
+        """Rebuild if retracted values have piled up in the sketches; True if it did."""
+        with self._lock:
+            share = self.distributions.removed_share() if self.seeded else 0.0
+        if share <= REBUILD_REMOVED_SHARE:
+            return False
+        self.rebuild(force=True)
+        return True
+
+    def _catch_up(self) -> bool:
+        """Fold in changes since `at`; False if the views must be rebuilt first."""
+        if self.changes.version == self.at:
+            return True
+        cols = self.columns
+        if cols is None:
+            if time.monotonic() - self.built_at < self.rebuild_every:
+                return True   # no earlier state to retract from; serve these until due
+            self.seeded = False
+            return False
+        reset, version, delta = self.changes.delta(self.at)
+        if reset:
+            self.seeded = False
+            return False
+        for _, tid, t in delta:
+            before = cols.done_record(tid)
+            if t is None:
+                cols.remove(tid)
+            else:
+                cols.upsert(t)
+            after = cols.done_record(tid)
+            self.weekly.update(before, after)
+            self.distributions.update(before, after)
+        self.at = version
+        return True
+
+    @contextmanager
+    def read(self) -> Iterator["TaskViews"]:
+        """The views, caught up with the change log, held for the duration of the block."""
+        while True:
+            if not self.seeded:
+                self.rebuild()
+            with self._lock:
+                if self.seeded and self._catch_up():
+                    yield self
+                    return
@@ -0,0 +1,47 @@
+# server/tests/conftest.py
+"""
+Tests run from server/ (`python -m pytest tests`); the app's modules are
+imported the way app.py imports them (`services.x`, `w2w`, `devtools.x`).
+Upstreams are the local stubs in devtools/, started per test on a free port.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_feed():
+    """The fake ICS server app_module's W2W feed points at."""
+    from devtools.fake_ics import serve_in_thread
+    server, url = serve_in_thread(events=90)
+    server.url = url
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def app_module(app_feed, tmp_path_factory):
+    """
+    server/app.py, imported once per session against a throwaway SQLite
+    file, with the W2W feed on app_feed and no scheduler. Tests share the
+    store, so each one writes its own task ids.
+    """
+    tmp = tmp_path_factory.mktemp("app")
+    mp = pytest.MonkeyPatch()
+    for k, v in {"TASK_STORE": "sqlite", "TASKS_DB_PATH": str(tmp / "tasks.db"),
+                 "SCHEDULER_ENABLED": "0", "REQUIRE_AUTH": "0", "W2W_ICS_URL": app_feed.url,
+                 "W2W_SHIFTS_SOURCE": "ics", "GCAL_ICS_URL": "",
+                 "METRICS_SNAPSHOT_PATH": str(tmp / "metrics_snapshot.json")}.items():
+        mp.setenv(k, v)
+    import app
+    yield app
+    mp.undo()
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    return TestClient(app_module.app)
@@ -0,0 +1,209 @@
+# server/tests/test_changes.py
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+import services.store as store_module
+from services.changes import ChangeLog, StoreChangeLog
+from services.store import MemoryTaskStore, SqliteTaskStore
+
+
+class Task(BaseModel):
+    id: str
+    title: str = "t"
+    status: str = "todo"
+    priority: str = "low"
+    dueDate: Optional[str] = None
+    createdAt: str = "2026-01-05T09:00:00"
+    updatedAt: str = "2026-01-05T09:00:00"
+    source: Optional[str] = None
+    version: int = 0
+
+
+class Writer:
+    """A store and its change log, written the way app._save does."""
+
+    def __init__(self, store, log):
+        self.store, self.log = store, log
+
+    def __call__(self, puts=(), deletes=()):
+        written = self.store.apply([Task(id=tid, title=title) for tid, title in puts], deletes)
+        return self.log.record(written, deletes)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def write(request, tmp_path):
+    if request.param == "memory":
+        return Writer(MemoryTaskStore(Task), ChangeLog())
+    store = SqliteTaskStore(Task, tmp_path / "tasks.db")
+    return Writer(store, StoreChangeLog(store, poll=0.05))
+
+
+def _ops(changes):
+    return [(c["op"], c["id"], c.get("task", {}).get("title")) for c in changes]
+
+
+def test_latest_change_per_task_oldest_first(write):
+    log = write.log
+    v0 = write([("a", "a1"), ("b", "b1")])
+    write([("a", "a2")])
+    v2 = write(deletes=["b"])
+    write([("c", "c1")])
+    changes, reset, version = log.since(0)
+    assert not reset and version == log.version
+    assert _ops(changes) == [("upsert", "a", "a2"), ("delete", "b", None), ("upsert", "c", "c1")]
+    assert [c["version"] for c in changes] == sorted(c["version"] for c in changes)
+    assert _ops(log.since(v2)[0]) == [("upsert", "c", "c1")]
+    assert log.since(version) == ([], False, version)
+    assert v0 < v2 < version
+    assert write() == version   # an empty batch is no new version
+
+
+def test_ids_in_a_batch_keep_the_batch_order(write):
+    write([("x", "1")])
+    v = write.log.version
+    write([("z", "z"), ("y", "y")], deletes=["x"])
+    assert [(c["op"], c["id"]) for c in write.log.since(v)[0]] == [("upsert", "z"), ("upsert", "y"), ("delete", "x")]
+
+
+def test_reset_for_another_epoch_or_a_future_version(write):
+    log = write.log
+    v = write([("a", "a1")])
+    assert log.since(v, log.epoch)[1] is False
+    assert log.since(v, "other")[1] is True       # e.g. a client of the last process lifetime
+    changes, reset, version = log.since(v + 1000)
+    assert reset and changes == [] and version == v
+
+
+def test_memory_log_floor_after_compaction():
+    write = Writer(MemoryTaskStore(Task), ChangeLog(max_entries=3))
+    versions = [write([(f"t{i}", "x")]) for i in range(5)]
+    log = write.log
+    assert log.floor == versions[1]                 # t0 and t1 were dropped
+    assert log.since(versions[0])[1] is True
+    changes, reset, _ = log.since(versions[1])
+    assert not reset and [c["id"] for c in changes] == ["t2", "t3", "t4"]
+    write([("t2", "again")])                        # re-recording an id does not grow the log
+    assert log.floor == versions[1] and len(log.since(versions[1])[0]) == 3
+
+
+def test_sqlite_log_floor_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "CHANGES_KEEP", 10)
+    store = SqliteTaskStore(Task, tmp_path / "tasks.db")
+    write = Writer(store, StoreChangeLog(store))
+    write([("a", "a1")])
+    v = write([(f"t{i:04d}", "x") for i in range(1000)])   # crosses seq 1000: compacts
+    floor, _ = store.changes_since(0)
+    assert floor == v - 10
+    assert write.log.since(1)[1] is True
+    changes, reset, _ = write.log.since(floor)
+    assert not reset and [c["id"] for c in changes] == [f"t{i:04d}" for i in range(990, 1000)]
+
+
+def test_epoch_lasts_as_long_as_the_log(tmp_path):
+    assert ChangeLog().epoch != ChangeLog().epoch   # in memory: a restart starts over
+    path = tmp_path / "tasks.db"
+    first = StoreChangeLog(SqliteTaskStore(Task, path))
+    Writer(first.store, first)([("a", "a1")])
+    again = StoreChangeLog(SqliteTaskStore(Task, path))   # restarted (or another worker)
+    assert again.epoch == first.epoch and again.version == first.version
+    assert StoreChangeLog(SqliteTaskStore(Task, tmp_path / "other.db")).epoch != first.epoch
+
+
+def test_wait_wakes_on_a_write_from_another_thread(write):
+    async def check():
+        v = write.log.version
+        assert await write.log.wait(v, 0.05) is False   # nothing new: times out
+        timer = threading.Timer(0.1, write, args=([("a", "a1")],))
+        timer.start()
+        t0 = time.monotonic()
+        woke = await write.log.wait(v, 5)
+        timer.join()
+        assert woke and time.monotonic() - t0 < 2
+        assert await write.log.wait(v, 5) is True      # already newer: returns at once
+
+    asyncio.run(check())
+
+
+def test_sqlite_log_sees_another_processes_writes(tmp_path):
+    path = tmp_path / "tasks.db"
+    here = StoreChangeLog(SqliteTaskStore(Task, path), poll=0.05)
+    # a second store and log on the same file stand in for another worker process
+    other = Writer(SqliteTaskStore(Task, path), StoreChangeLog(SqliteTaskStore(Task, path)))
+
+    async def check():
+        v = here.version
+        timer = threading.Timer(0.1, other, args=([("a", "from-there")],))
+        timer.start()
+        woke = await here.wait(v, 5)   # only the poller can notice this one
+        timer.join()
+        return v, woke
+
+    v, woke = asyncio.run(check())
+    assert woke and here.version > v
+    assert _ops(here.since(v)[0]) == [("upsert", "a", "from-there")]
+
+
+# ───────────── /tasks/changes and /tasks/stream ─────────────
+def _create(client, tid, title):
+    r = client.post("/tasks", json={"id": tid, "title": title, "priority": "low", "status": "todo",
+                                    "createdAt": "2026-01-05T09:00:00", "updatedAt": "2026-01-05T09:00:00"})
+    assert r.status_code == 200
+
+
+def test_changes_endpoint(client, app_module):
+    start = client.get("/tasks/changes", params={"since": 10 ** 9}).json()
+    assert start["reset"] is True
+    v, epoch = start["version"], start["epoch"]
+    _create(client, "changes-a", "first")
+    app_module._save([], ["changes-a"])
+    body = client.get("/tasks/changes", params={"since": v, "epoch": epoch}).json()
+    assert not body["reset"] and body["version"] > v
+    assert [(c["op"], c["id"]) for c in body["changes"]] == [("delete", "changes-a")]
+    assert client.get("/tasks/changes", params={"since": v, "epoch": "stale"}).json()["reset"] is True
+
+
+def test_changes_long_poll_returns_on_a_write(client):
+    v = client.get("/tasks/changes", params={"since": 10 ** 9}).json()["version"]
+    timer = threading.Timer(0.2, _create, args=(client, "changes-poll", "polled"))
+    timer.start()
+    t0 = time.monotonic()
+    body = client.get("/tasks/changes", params={"since": v, "wait": 10}).json()
+    timer.join()
+    assert time.monotonic() - t0 < 5
+    assert [c["id"] for c in body["changes"]] == ["changes-poll"]
+
+
+class _Request:
+    """What task_stream reads from its request; TestClient would wait for the endless body."""
+
+    headers: dict = {}
+
+    async def is_disconnected(self):
+        return False
+
+
+def test_stream_sends_changes_events(client, app_module):
+    v = client.get("/tasks/changes", params={"since": 10 ** 9}).json()["version"]
+    _create(client, "changes-sse", "streamed")
+
+    async def first_events():
+        r = await app_module.task_stream(_Request(), since=v, epoch=None)
+        assert r.media_type == "text/event-stream"
+        body = r.body_iterator
+        try:
+            return [await body.__anext__() for _ in range(2)]
+        finally:
+            await body.aclose()
+
+    retry, event = asyncio.run(first_events())
+    assert retry == "retry: 3000\n\n"
+    event_id, name, data = event.rstrip("\n").split("\n")
+    body = json.loads(data[len("data: "):])
+    assert name == "event: changes" and event_id == f"id: {body['version']}"
+    assert [c["id"] for c in body["changes"]] == ["changes-sse"]
@@ -0,0 +1,164 @@
+# server/tests/test_columns.py
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+import services.columns as columns_module
+from services.columns import PRIORITIES, STATUSES, TaskColumns
+from services.metrics import done_record, iso_ms
+
+
+class Task(BaseModel):
+    id: str
+    title: str = "t"
+    status: str = "todo"
+    priority: str = "low"
+    dueDate: Optional[str] = None
+    estimateMinutes: Optional[int] = None
+    timeSpentMs: Optional[int] = None
+    createdAt: str
+    updatedAt: str
+    source: Optional[str] = None
+    version: int = 0
+
+
+def _tasks(n, seed=5):
+    rng = random.Random(seed)
+    base = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        created = base + timedelta(hours=rng.randrange(24 * 90))
+        updated = created + timedelta(hours=rng.randrange(-24, 24 * 20))   # sometimes "done" before created
+        spelling = rng.choice(["naive", "z", "offset"])
+        fmt = {"naive": lambda d: d.replace(tzinfo=None).isoformat(),
+               "z": lambda d: d.strftime("%Y-%m-%dT%H:%M:%SZ"),
+               "offset": lambda d: d.astimezone(timezone(timedelta(hours=2))).isoformat()}[spelling]
+        out.append(Task(
+            id=f"t{i:04d}", status=rng.choice(STATUSES), priority=rng.choice(PRIORITIES),
+            source=rng.choice([None, "w2w", "gcal"]),
+            createdAt=fmt(created), updatedAt=fmt(updated),
+            dueDate=rng.choice([None, fmt(created + timedelta(days=3))]),
+            estimateMinutes=rng.choice([None, 15, 30, 90]),
+            timeSpentMs=rng.choice([None, 0, 60_000, 3_600_000]),
+        ))
+    return out
+
+
+def _keys(t):
+    """The group-by keys and values of a task, in plain Python."""
+    done = iso_ms(t.updatedAt) if t.status == "done" else None
+    created = iso_ms(t.createdAt)
+    keys = {"status": t.status, "priority": t.priority, "source": t.source}
+    if done is not None:
+        d = datetime.fromtimestamp(done / 1000, timezone.utc).date()
+        keys["week"] = (d - timedelta(days=d.weekday())).isoformat()
+        keys["month"] = d.strftime("%Y-%m")
+    values = {"timeSpentMs": t.timeSpentMs, "estimateMinutes": t.estimateMinutes,
+              "cycleMs": done - created if done is not None and created is not None and done >= created else None}
+    return keys, values
+
+
+def _reference(tasks, by, values):
+    groups = defaultdict(list)
+    for t in tasks:
+        keys, vals = _keys(t)
+        if any(k not in keys for k in by):   # week/month of a task that is not done
+            continue
+        groups[tuple(keys[k] for k in by)].append(vals)
+    out = {}
+    for key, rows in groups.items():
+        row = {"count": len(rows)}
+        for v in values:
+            present = [r[v] for r in rows if r[v] is not None]
+            row[f"sum_{v}"] = sum(present)
+            row[f"avg_{v}"] = int(sum(present) / len(present)) if present else 0
+        out[key] = row
+    return out
+
+
+def _grouped(cols, by, values):
+    out = {}
+    for row in cols.group_by(by, values=values):
+        out[tuple(row.pop(k) for k in by)] = row
+    return out
+
+
+BYS = [("status",), ("priority", "source"), ("status", "priority", "source"), ("week",), ("month", "source")]
+VALUES = ("timeSpentMs", "estimateMinutes", "cycleMs")
+
+
+def _loaded(tasks):
+    cols = TaskColumns(capacity=16)                 # grows along the way
+    cols.extend(tasks[: len(tasks) // 2])           # vectorized parsing
+    for t in tasks[len(tasks) // 2:]:
+        cols.upsert(t)                              # one row at a time
+    return cols
+
+
+@pytest.mark.parametrize("by", BYS)
+def test_group_by_matches_plain_python(by):
+    tasks = _tasks(500)
+    assert _grouped(_loaded(tasks), list(by), VALUES) == _reference(tasks, by, VALUES)
+
+
+def test_sparse_keys_fall_back_to_unique(monkeypatch):
+    monkeypatch.setattr(columns_module, "_DENSE_GROUPS", 1)
+    tasks = _tasks(300)
+    by = ["status", "priority", "week"]
+    assert _grouped(_loaded(tasks), by, VALUES) == _reference(tasks, by, VALUES)
+
+
+def test_nulls_are_left_out_of_sums_and_time_buckets():
+    cols = TaskColumns()
+    cols.extend([Task(id="a", status="done", createdAt="2026-01-05T09:00:00", updatedAt="2026-01-05T10:00:00",
+                      estimateMinutes=30),
+                 Task(id="b", status="done", createdAt="not a time", updatedAt="2026-01-06T09:00:00"),
+                 Task(id="c", status="todo", createdAt="2026-01-05T09:00:00", updatedAt="2026-01-05T09:00:00",
+                      estimateMinutes=60)])
+    assert cols.group_by(["week"], values=("estimateMinutes", "cycleMs")) == [
+        {"week": "2026-01-05", "count": 2, "sum_estimateMinutes": 30, "avg_estimateMinutes": 30,
+         "sum_cycleMs": 3_600_000, "avg_cycleMs": 3_600_000}]
+    assert cols.group_by([], values=("estimateMinutes",)) == [
+        {"count": 3, "sum_estimateMinutes": 90, "avg_estimateMinutes": 45}]
+    assert cols.done_record("b")[1] is None and cols.done_record("c") is None
+
+
+def test_sums_stay_exact_past_float_precision():
+    big = 2**53 + 1                     # the first integer float64 cannot hold
+    cols = TaskColumns()
+    cols.extend([Task(id=f"x{i}", createdAt="2026-01-05T09:00:00", updatedAt="2026-01-05T09:00:00",
+                      timeSpentMs=ms) for i, ms in enumerate([big, big, 1, 3])])
+    assert cols.group_by([], values=("timeSpentMs",)) == [
+        {"count": 4, "sum_timeSpentMs": 2 * big + 4, "avg_timeSpentMs": (2 * big + 4) // 4}]
+
+
+def test_remove_swaps_the_last_row_in():
+    tasks = _tasks(200, seed=9)
+    cols = _loaded(tasks)
+    rng = random.Random(2)
+    gone = {tasks[-1].id, tasks[0].id}                            # the last row, then a swap
+    gone |= {t.id for t in rng.sample(tasks, 60)}
+    for tid in [tasks[-1].id, tasks[0].id, *sorted(gone - {tasks[-1].id, tasks[0].id})]:
+        cols.remove(tid)
+    cols.remove("not-there")
+    left = [t for t in tasks if t.id not in gone]
+    assert len(cols) == len(left)
+    for by in BYS:
+        assert _grouped(cols, list(by), VALUES) == _reference(left, by, VALUES)
+    assert all(cols.done_record(t.id) == done_record(t) for t in left)
+    assert all(cols.done_record(tid) is None for tid in gone)
+    assert sorted(cols.done_records()) == sorted(r for r in map(done_record, left) if r is not None)
+
+
+def test_remove_until_empty_then_reuse():
+    tasks = _tasks(20, seed=3)
+    cols = _loaded(tasks)
+    for t in reversed(tasks):          # always the last row: nothing to swap
+        cols.remove(t.id)
+    assert len(cols) == 0 and cols.group_by(["status"]) == []
+    cols.upsert(tasks[0])
+    assert _grouped(cols, ["status"], VALUES) == _reference(tasks[:1], ("status",), VALUES)
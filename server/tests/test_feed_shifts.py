@@ -0,0 +1,34 @@
+# server/tests/test_feed_shifts.py
+import time
+from datetime import datetime, timedelta, timezone
+
+DAY = 86400
+
+
+def _iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+
+def test_horizon_follows_the_clock_not_the_parse(client, monkeypatch):
+    assert client.get("/w2w/shifts", params={"days": 14}).status_code == 200
+    later = time.time() + 3 * DAY
+    monkeypatch.setattr(time, "time", lambda: later)   # feed unchanged upstream since
+    r = client.get("/w2w/shifts", params={"to": _iso(later + 59 * DAY)})
+    assert r.status_code == 200, r.text
+    assert r.json()["to"] == _iso(later + 59 * DAY)
+    # the lookback is measured from now too
+    r = client.get("/w2w/shifts", params={"from": _iso(later - 31 * DAY), "to": _iso(later)})
+    assert r.status_code == 400
+
+
+def test_shifts_window_and_instant(client, app_feed):
+    now = datetime.now(timezone.utc)
+    r = client.get("/w2w/shifts", params={"days": 7, "upcoming": True})
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert 6 <= len(items) <= 8 and all(i["end"] > now.isoformat() for i in items)
+    noon = now.replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    r = client.get("/w2w/shifts", params={"at": noon.isoformat()})
+    assert [i["title"] for i in r.json()["items"]] == ["Shift 1"]
+    r = client.get("/w2w/shifts", params={"at": (now + timedelta(days=400)).isoformat()})
+    assert r.status_code == 400
@@ -0,0 +1,210 @@
+# server/tests/test_feeds.py
+import asyncio
+import time
+
+import pytest
+
+from devtools.fake_ics import serve_in_thread
+from services.feeds import FeedCache, FeedError
+from services.http import HttpClient
+from services.ics import iter_ics_events
+from services.shared import FeedShare, SharedDB
+
+
+class Parser:
+    """iter_ics_events into a list, counting how often a body gets parsed."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, lines):
+        self.calls += 1
+        return list(iter_ics_events(lines))
+
+
+@pytest.fixture
+def ics():
+    servers = []
+
+    def start(events=20, delay=0.0):
+        server, url = serve_in_thread(events=events, delay=delay)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for s in servers:
+        s.shutdown()
+
+
+def _cache(**kw):
+    return FeedCache(http=HttpClient(retries=0), **kw)
+
+
+async def _settle(cache):
+    """Wait for background refreshes started by stale reads."""
+    while cache._background:
+        await asyncio.gather(*cache._background)
+
+
+def test_cold_miss_then_hit(ics):
+    server, url = ics(events=20)
+    cache, parse = _cache(ttl=60), Parser()
+
+    async def check():
+        first = await cache.get(url, parse)
+        second = await cache.get(url, parse)
+        return first, second
+
+    first, second = asyncio.run(check())
+    assert len(first.data) == 20 and not first.stale
+    assert second.data is first.data and second.version == first.version == 1
+    assert server.state.hits == 1 and parse.calls == 1
+
+
+def test_stale_served_while_revalidating(ics):
+    server, url = ics()
+    cache, parse = _cache(ttl=0), Parser()
+
+    async def check():
+        first = await cache.get(url, parse)
+        server.state.bump()
+        stale = await cache.get(url, parse)   # returns at once, refresh runs behind it
+        assert stale.stale and stale.data is first.data
+        await _settle(cache)
+        return cache.entry(url)
+
+    fresh = asyncio.run(check())
+    assert fresh.version == 2
+    assert "rev 1" in fresh.data[0]["raw"]["description"]
+    assert server.state.hits == 2 and parse.calls == 2
+
+
+def test_conditional_get_and_unchanged_body(ics):
+    server, url = ics()
+    cache, parse = _cache(ttl=60), Parser()
+
+    async def check():
+        await cache.get(url, parse)
+        await cache.refresh(url, parse)      # ETag matches: 304
+        server.state.etag = '"changed-tag"'  # same bytes under a new validator
+        await cache.refresh(url, parse)
+        return await cache.get(url, parse)
+
+    res = asyncio.run(check())
+    assert server.state.full_bodies == 2  # the 304 sent no body
+    assert parse.calls == 1               # the re-sent identical body was not parsed again
+    assert res.version == 1
+    assert cache.entry(url).etag == '"changed-tag"'
+
+
+def test_unchanged_feed_reparsed_once_its_window_is_old(ics, monkeypatch):
+    server, url = ics()
+    cache, parse = _cache(ttl=60, reparse_after=86400), Parser()
+    later = time.time() + 2 * 86400
+
+    async def check():
+        first = await cache.get(url, parse)
+        await cache.refresh(url, parse)                       # 304, parse still current
+        assert parse.calls == 1
+        monkeypatch.setattr(time, "time", lambda: later)      # two days on, feed unchanged
+        res = await cache.refresh(url, parse)
+        assert res.version == 2 and res.data is not first.data
+        await cache.refresh(url, parse)                       # current again: 304
+        return res
+
+    asyncio.run(check())
+    assert parse.calls == 2
+    assert server.state.hits == 4 and server.state.full_bodies == 2
+    assert cache.entry(url).parsed_wall == later
+
+
+def test_get_waits_for_a_reparse_that_is_due(ics, monkeypatch):
+    server, url = ics()
+    cache, parse = _cache(ttl=3600, reparse_after=86400), Parser()
+    later = time.time() + 2 * 86400
+
+    async def check():
+        first = await cache.get(url, parse)
+        monkeypatch.setattr(time, "time", lambda: later)
+        return first, await cache.get(url, parse)   # within ttl, but parsed two days ago
+
+    first, res = asyncio.run(check())
+    assert res.version == 2 and res.data is not first.data and not res.stale
+    assert parse.calls == 2
+    assert server.state.hits == 2 and server.state.full_bodies == 2
+    assert cache.entry(url).parsed_wall == later
+
+
+def test_due_reparse_retried_behind_a_failed_one(ics, monkeypatch):
+    server, url = ics()
+    cache, parse = _cache(ttl=3600, reparse_after=86400), Parser()
+    later = time.time() + 2 * 86400
+
+    def broken(lines):
+        raise ValueError("bad feed")
+
+    async def check():
+        first = await cache.get(url, parse)
+        monkeypatch.setattr(time, "time", lambda: later)
+        failed = await cache.get(url, broken)     # the due re-parse fails: old parse, with the error
+        assert failed.data is first.data and failed.error
+        again = await cache.get(url, parse)       # still within ttl, but the re-parse is retried
+        assert again.data is first.data
+        await _settle(cache)
+        return first, await cache.get(url, parse)
+
+    first, res = asyncio.run(check())
+    assert res.version == 2 and res.data is not first.data and res.error is None
+    assert parse.calls == 2 and server.state.hits == 3
+    assert cache.entry(url).parsed_wall == later
+
+
+def test_concurrent_misses_share_one_fetch(ics):
+    server, url = ics(delay=0.2)
+    cache, parse = _cache(), Parser()
+
+    async def check():
+        return await asyncio.gather(*(cache.get(url, parse) for _ in range(8)))
+
+    results = asyncio.run(check())
+    assert server.state.hits == 1 and parse.calls == 1
+    assert all(r.data is results[0].data for r in results)
+
+
+def test_cold_miss_failure_raises():
+    cache, parse = _cache(), Parser()
+    with pytest.raises(FeedError):
+        asyncio.run(cache.get("http://127.0.0.1:9/feed.ics", parse))
+    assert parse.calls == 0
+
+
+def test_stale_copy_kept_when_refresh_fails(ics):
+    server, url = ics()
+    cache, parse = _cache(ttl=0), Parser()
+
+    async def check():
+        first = await cache.get(url, parse)
+        server.shutdown()
+        server.server_close()
+        with pytest.raises(FeedError):
+            await cache.refresh(url, parse)
+        again = await cache.get(url, parse)
+        assert again.data is first.data and again.stale and again.error
+
+    asyncio.run(check())
+
+
+def test_workers_adopt_a_published_body(ics, tmp_path):
+    server, url = ics()
+    db = SharedDB(tmp_path / "shared.db")
+    a, b = _cache(ttl=60, share=FeedShare(db)), _cache(ttl=60, share=FeedShare(db))
+    parse_a, parse_b = Parser(), Parser()
+
+    async def check():
+        ra = await a.get(url, parse_a)
+        rb = await b.get(url, parse_b)
+        return ra, rb
+
+    ra, rb = asyncio.run(check())
+    assert server.state.hits == 1  # b took a's copy instead of going upstream
+    assert rb.data == ra.data and parse_b.calls == 1
@@ -0,0 +1,60 @@
+# server/tests/test_http.py
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.http import HttpClient
+
+
+class _KeepAlive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # connections stay open in the client's pool
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAlive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_each_loop_closes_its_own_client(url):
+    http = HttpClient(retries=0)
+    clients = []
+
+    async def call():
+        r = await http.get(url)
+        clients.append(http._slot().client)
+        return r.text
+
+    assert asyncio.run(call()) == "ok"
+    assert asyncio.run(call()) == "ok"   # a new loop gets a new pool
+    assert clients[0] is not clients[1]
+    assert all(c.is_closed for c in clients)
+    assert http._loops == {}
+
+
+def test_aclose_closes_the_running_loops_client(url):
+    http = HttpClient(retries=0)
+
+    async def call():
+        await http.get(url)
+        client = http._slot().client
+        await http.aclose()
+        assert client.is_closed and http._loops == {}
+        await http.get(url)              # usable again afterwards
+        return http._slot().client
+
+    assert asyncio.run(call()).is_closed
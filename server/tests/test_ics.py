@@ -0,0 +1,112 @@
+# server/tests/test_ics.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.ics import ics_duration, iter_ics_events, iter_text_lines, parse_ics_events, unfold
+
+
+def _feed(*events):
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for props in events:
+        lines += ["BEGIN:VEVENT", *props, "END:VEVENT"]
+    return "\r\n".join(lines + ["END:VCALENDAR"]) + "\r\n"
+
+
+def _chunks(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_unfold_joins_space_and_tab_continuations():
+    raw = ["SUMMARY:Long\r\n", " er title\r\n", "\tand more\r\n", "DESCRIPTION:a\n", "  b", "LOCATION:x"]
+    assert list(unfold(raw)) == ["SUMMARY:Longer titleand more", "DESCRIPTION:a b", "LOCATION:x"]
+    assert list(unfold([])) == []
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 10_000])
+def test_lines_split_across_chunks(size):
+    text = _feed(["UID:fold-1", "SUMMARY:A folded", "  summary", "DTSTART:20260105T090000Z",
+                  "DTEND:20260105T170000Z", "DESCRIPTION:line one\\n", "\tline two"])
+    (ev,) = iter_ics_events(iter_text_lines(_chunks(text, size)))
+    assert ev["title"] == "A folded summary"
+    assert ev["raw"]["description"] == "line one\\nline two"
+    # physical lines keep their CR; unfold strips it
+    assert list(iter_text_lines(_chunks(text, size))) == [ln + "\r" for ln in text.split("\r\n")[:-1]]
+
+
+@pytest.mark.parametrize("props, start, end", [
+    (["DTSTART:20260105T090000Z", "DTEND:20260105T170000Z"], "2026-01-05T09:00:00", "2026-01-05T17:00:00"),
+    (["DTSTART:20260105T090000Z", "DURATION:PT1H30M"], "2026-01-05T09:00:00", "2026-01-05T10:30:00"),
+    (["DTSTART:20260105T090000Z", "DURATION:P1W"], "2026-01-05T09:00:00", "2026-01-12T09:00:00"),
+    (["DTSTART:20260105T090000Z", "DURATION:P1DT2H"], "2026-01-05T09:00:00", "2026-01-06T11:00:00"),
+    # DTEND wins over DURATION when both are present
+    (["DTSTART:20260105T090000Z", "DURATION:PT1H", "DTEND:20260105T120000Z"],
+     "2026-01-05T09:00:00", "2026-01-05T12:00:00"),
+    (["DTSTART;TZID=Europe/Berlin:20260105T090000", "DTEND;TZID=Europe/Berlin:20260105T170000"],
+     "2026-01-05T08:00:00", "2026-01-05T16:00:00"),
+    (['DTSTART;TZID="America/New_York":20260705T090000', "DURATION:PT8H"],   # quoted, summer time
+     "2026-07-05T13:00:00", "2026-07-05T21:00:00"),
+    (["DTSTART;TZID=Nowhere/Zone:20260105T090000", "DTEND;TZID=Nowhere/Zone:20260105T100000"],
+     "2026-01-05T09:00:00", "2026-01-05T10:00:00"),    # unknown zone: UTC
+    (["DTSTART:20260105T090000", "DTEND:20260105T100000"], "2026-01-05T09:00:00", "2026-01-05T10:00:00"),
+    (["DTSTART;VALUE=DATE:20260105", "DTEND;VALUE=DATE:20260106"], "2026-01-05T00:00:00", "2026-01-06T00:00:00"),
+    (["DTSTART;VALUE=DATE:20260105", "DURATION:P3D"], "2026-01-05T00:00:00", "2026-01-08T00:00:00"),
+])
+def test_event_times(props, start, end):
+    (ev,) = parse_ics_events(_feed(["UID:t", "SUMMARY:timed", *props]))
+    assert (ev["start"], ev["end"]) == (start + "+00:00", end + "+00:00")
+
+
+def test_duration_forms():
+    assert ics_duration("-PT15M") == -timedelta(minutes=15)
+    assert ics_duration("P2W") == timedelta(weeks=2)
+    assert ics_duration("PT90S") == timedelta(seconds=90)
+    assert ics_duration("soon") is None
+
+
+def test_event_fields_and_fallback_id():
+    (ev,) = parse_ics_events(_feed(["SUMMARY:No uid", "DTSTART:20260105T090000Z", "DTEND:20260105T100000Z",
+                                    "LOCATION:Front desk", "DESCRIPTION:notes", "X-CUSTOM;P=1:kept out"]))
+    (again,) = parse_ics_events(_feed(["SUMMARY:No uid", "DTSTART:20260105T090000Z", "DTEND:20260105T100000Z"]))
+    assert len(ev["id"]) == 16 and ev["id"] == again["id"]   # stable digest of SUMMARY + DTSTART
+    assert ev["location"] == "Front desk" and ev["raw"] == {"description": "notes"}
+    assert set(ev) == {"id", "title", "start", "end", "location", "raw"}
+
+
+def test_window_keeps_overlapping_events_and_all_series_parts():
+    day = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+    def shift(uid, start_h, end_h, *extra):
+        s, e = day + timedelta(hours=start_h), day + timedelta(hours=end_h)
+        return [f"UID:{uid}", f"SUMMARY:{uid}", f"DTSTART:{s:%Y%m%dT%H%M%SZ}", f"DTEND:{e:%Y%m%dT%H%M%SZ}", *extra]
+
+    text = _feed(shift("before", 0, 8), shift("touching-start", 6, 9), shift("inside", 10, 12),
+                 shift("spanning", 0, 48), shift("touching-end", 17, 20), shift("after", 30, 31),
+                 shift("series", -100, -99, "RRULE:FREQ=DAILY", "EXDATE:20260101T040000Z,20260102T040000Z"),
+                 shift("series", -70, -69, "RECURRENCE-ID:20260102T040000Z", "STATUS:CANCELLED"))
+    evs = list(iter_ics_events(text.splitlines(), day + timedelta(hours=9), day + timedelta(hours=17)))
+    assert [e["id"] for e in evs] == ["inside", "spanning", "series", "series"]
+    master, override = evs[2], evs[3]
+    assert master["rrule"] == "FREQ=DAILY" and master["tzid"] is None
+    assert master["exdates"] == ["2026-01-01T04:00:00+00:00", "2026-01-02T04:00:00+00:00"]
+    assert override["recurrenceId"] == "2026-01-02T04:00:00+00:00" and override["cancelled"] is True
+    assert len(list(iter_ics_events(text.splitlines()))) == 8   # no window: everything
+
+
+def test_malformed_events_are_skipped():
+    good = ["UID:good", "SUMMARY:good", "DTSTART:20260105T090000Z", "DTEND:20260105T100000Z"]
+    text = _feed(
+        ["UID:no-start", "SUMMARY:x", "DTEND:20260105T100000Z"],
+        ["UID:no-summary", "DTSTART:20260105T090000Z", "DTEND:20260105T100000Z"],
+        ["UID:bad-start", "SUMMARY:x", "DTSTART:tomorrow", "DTEND:20260105T100000Z"],
+        ["UID:bad-end", "SUMMARY:x", "DTSTART:20260105T090000Z", "DTEND:later"],
+        ["UID:bad-duration", "SUMMARY:x", "DTSTART:20260105T090000Z", "DURATION:an hour"],
+        ["UID:no-end", "SUMMARY:x", "DTSTART:20260105T090000Z"],
+        ["UID:junk", "SUMMARY:x", "no colon on this line", "DTSTART:20260105T090000Z", "DTEND:20260105T100000Z"],
+        good,
+    )
+    text += "BEGIN:VEVENT\r\nUID:unterminated\r\nSUMMARY:x\r\nDTSTART:20260105T090000Z\r\n"   # feed cut off
+    assert [e["id"] for e in iter_ics_events(text.splitlines())] == ["junk", "good"]
+    # a stray END and properties outside any VEVENT are ignored
+    stray = "SUMMARY:outside\r\nEND:VEVENT\r\n" + _feed(good)
+    assert [e["id"] for e in parse_ics_events(stray)] == ["good"]
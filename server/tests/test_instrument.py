@@ -0,0 +1,134 @@
+# server/tests/test_instrument.py
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.instrument import HTTP_SECONDS, MetricsMiddleware, Registry, SamplingProfiler
+
+
+def test_histogram_exposition():
+    reg = Registry()
+    h = reg.histogram("req_seconds", "Request time.", ("route",), buckets=(0.1, 1, 0.5))
+    for v in (0.05, 0.1, 0.3, 2.5):
+        h.observe(v, "/a")
+    h.observe(0.7, 'say "hi"\n')
+    assert h.count("/a") == 4 and h.count("/none") == 0
+    assert reg.render().splitlines() == [
+        "# HELP req_seconds Request time.",
+        "# TYPE req_seconds histogram",
+        'req_seconds_bucket{route="/a",le="0.1"} 2',   # cumulative; a bound is inclusive
+        'req_seconds_bucket{route="/a",le="0.5"} 3',
+        'req_seconds_bucket{route="/a",le="1"} 3',
+        'req_seconds_bucket{route="/a",le="+Inf"} 4',
+        'req_seconds_sum{route="/a"} 2.95',
+        'req_seconds_count{route="/a"} 4',
+        'req_seconds_bucket{route="say \\"hi\\"\\n",le="0.1"} 0',
+        'req_seconds_bucket{route="say \\"hi\\"\\n",le="0.5"} 0',
+        'req_seconds_bucket{route="say \\"hi\\"\\n",le="1"} 1',
+        'req_seconds_bucket{route="say \\"hi\\"\\n",le="+Inf"} 1',
+        'req_seconds_sum{route="say \\"hi\\"\\n"} 0.7',
+        'req_seconds_count{route="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_counter_and_gauge_exposition():
+    reg = Registry()
+    c = reg.counter("hits_total", "Hits.", ("cache", "result"))
+    c.inc("feeds", "hit")
+    c.inc("feeds", "hit", amount=2)
+    c.inc("feeds", "miss")
+    reg.gauge("queue_depth", "Depth.", lambda: 3)
+    reg.gauge("per_file", "Sizes.", lambda: [(("main",), 10), (("wal",), 2.5)], ("file",))
+    reg.gauge("broken", "Raises.", lambda: 1 / 0)
+    reg.gauge("absent", "None.", lambda: None)
+    assert reg.render().splitlines() == [
+        "# HELP hits_total Hits.", "# TYPE hits_total counter",
+        'hits_total{cache="feeds",result="hit"} 3', 'hits_total{cache="feeds",result="miss"} 1',
+        "# HELP queue_depth Depth.", "# TYPE queue_depth gauge", "queue_depth 3",
+        "# HELP per_file Sizes.", "# TYPE per_file gauge", 'per_file{file="main"} 10', 'per_file{file="wal"} 2.5',
+    ]
+    assert c.value("feeds", "hit") == 3
+
+
+def test_middleware_labels_by_route_template():
+    h = Registry().histogram("t_seconds", "t", ("method", "route", "status"))
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, histogram=h)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for i in range(5):
+        assert client.get(f"/items/{i}").status_code == 200
+    assert client.get("/nowhere/1").status_code == 404
+    assert client.get("/nowhere/2").status_code == 404
+    assert client.post("/items/1").status_code == 405   # path matched, method did not
+    assert sorted(h._series) == [("GET", "/items/{item_id}", "2xx"), ("GET", "unmatched", "4xx"),
+                                 ("POST", "/items/{item_id}", "4xx")]
+    assert h.count("GET", "/items/{item_id}", "2xx") == 5 and h.count("GET", "unmatched", "4xx") == 2
+
+
+def test_app_times_cors_preflights(client):
+    labels = ("OPTIONS", "unmatched", "2xx")
+    before = HTTP_SECONDS.count(*labels)
+    r = client.options("/tasks", headers={"Origin": "http://localhost:5173",
+                                          "Access-Control-Request-Method": "PATCH"})
+    assert r.status_code == 200 and r.headers["access-control-allow-origin"] == "http://localhost:5173"
+    assert HTTP_SECONDS.count(*labels) == before + 1
+    before = HTTP_SECONDS.count("GET", "/tasks/{task_id}", "4xx")
+    assert client.get("/tasks/instrument-missing").status_code == 404
+    assert HTTP_SECONDS.count("GET", "/tasks/{task_id}", "4xx") == before + 1
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_start_stop():
+    p = SamplingProfiler()
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,), name="busy")
+    worker.start()
+    try:
+        p.start(hz=200)
+        p.start(hz=5)                      # already running: ignored
+        assert p.running and p.hz == 200
+        deadline = time.monotonic() + 5
+        while p.samples < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        p.stop()
+    finally:
+        stop.set()
+        worker.join()
+    assert not p.running and p.samples >= 5
+    frozen = p.samples
+    time.sleep(0.05)
+    assert p.samples == frozen          # stopped means no more samples
+    lines = p.collapsed().splitlines()
+    assert any("test_instrument.py:_busy" in ln for ln in lines)
+    counts = [int(ln.rsplit(" ", 1)[1]) for ln in lines]
+    assert counts == sorted(counts, reverse=True)   # hottest first
+    assert len(p.collapsed(limit=1).splitlines()) == 1
+    p.reset()
+    assert p.samples == 0 and p.collapsed() == ""
+    p.start(hz=100)                        # can be started again after a stop
+    assert p.running
+    p.stop()
+
+
+def test_profiler_endpoints(client, app_module, monkeypatch):
+    assert client.post("/debug/profiler").status_code == 403
+    monkeypatch.setattr(app_module, "PROFILER_ENABLED", True)
+    monkeypatch.setattr(app_module, "PROFILER", SamplingProfiler())
+    body = client.post("/debug/profiler", params={"hz": 250}).json()
+    assert body["running"] is True and body["hz"] == 250
+    body = client.post("/debug/profiler", params={"on": False}).json()
+    assert body["running"] is False
+    r = client.get("/debug/profiler")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert client.post("/debug/profiler", params={"on": False, "reset": True}).json()["samples"] == 0
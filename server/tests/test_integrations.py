@@ -0,0 +1,129 @@
+# server/tests/test_integrations.py
+import asyncio
+import time
+
+import pytest
+
+import services.cache as cache_module
+import services.shared as shared_module
+from devtools.fake_ics import serve_in_thread
+from services.instrument import UPSTREAM_BYTES
+
+
+class Clock:
+    """time.time / time.monotonic, `offset` seconds ahead of the real ones."""
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self):
+        return time.time() + self.offset
+
+    def monotonic(self):
+        return time.monotonic() + self.offset
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(shared_module, "time", c)   # SharedCache (SQLite store)
+    monkeypatch.setattr(cache_module, "time", c)    # TTLCache (memory store)
+    return c
+
+
+@pytest.fixture
+def feeds():
+    servers = []
+
+    def start(body=None):
+        server, url = serve_in_thread(events=3)
+        if body is not None:
+            server.state.serve(body)
+        servers.append(server)
+        return server.state, url
+
+    yield start
+    for s in servers:
+        s.shutdown()
+
+
+def _status(client, email):
+    r = client.get("/integrations/status", params={"email": email})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_each_user_and_url_has_its_own_entry(client, app_module, feeds, monkeypatch):
+    good, good_url = feeds()
+    bad, bad_url = feeds(b"<html>not a calendar</html>")
+    monkeypatch.setattr(app_module, "GCAL_ICS_URL", "")
+
+    monkeypatch.setattr(app_module, "W2W_ICS_URL", good_url)
+    ann = _status(client, "ann@integrations.test")
+    monkeypatch.setattr(app_module, "W2W_ICS_URL", bad_url)
+    bob = _status(client, "bob@integrations.test")
+    assert (ann["hasW2W"], ann["w2wReason"]) == (True, None)
+    assert (bob["hasW2W"], bob["w2wReason"]) == (False, "ICS feed does not look valid.")
+    assert bob["hasGCal"] is False and bob["gcalReason"] == "ICS URL not configured."
+
+    # ann's cached answer was for the good feed; her bad one is probed on its own
+    ann_bad = _status(client, "ann@integrations.test")
+    assert ann_bad["hasW2W"] is False and (good.hits, bad.hits) == (1, 2)
+    monkeypatch.setattr(app_module, "W2W_ICS_URL", good_url)
+    assert _status(client, "ann@integrations.test")["hasW2W"] is True
+    assert _status(client, "bob@integrations.test")["hasW2W"] is True
+    assert (good.hits, bad.hits) == (2, 2)
+
+
+def test_email_case_variants_share_an_entry(client, app_module, feeds, monkeypatch):
+    state, url = feeds()
+    monkeypatch.setattr(app_module, "W2W_ICS_URL", url)
+    monkeypatch.setattr(app_module, "GCAL_ICS_URL", "")
+    for email in ("Cara@Integrations.Test", "cara@integrations.test", "CARA@INTEGRATIONS.TEST"):
+        body = _status(client, email)
+        assert body["email"] == email and body["hasW2W"] is True
+    assert state.hits == 1
+
+
+def test_failures_are_cached_only_for_the_negative_ttl(client, app_module, feeds, monkeypatch, clock):
+    good, good_url = feeds()
+    bad, bad_url = feeds(b"<html>not a calendar</html>")
+    monkeypatch.setattr(app_module, "W2W_ICS_URL", good_url)
+    monkeypatch.setattr(app_module, "GCAL_ICS_URL", bad_url)
+    cache = app_module._INTEGRATION_CACHE
+    # the longest a failure may live, and the shortest a success does
+    negative = cache.negative_ttl * (1 + cache.jitter)
+    positive = cache.ttl * (1 - cache.jitter)
+    assert negative < positive
+
+    email = "dee@integrations.test"
+    body = _status(client, email)
+    assert body["hasW2W"] is True and body["hasGCal"] is False
+    _status(client, email)
+    assert (good.hits, bad.hits) == (1, 1)
+
+    clock.offset = negative + 1
+    assert _status(client, email)["hasGCal"] is False
+    assert (good.hits, bad.hits) == (1, 2)   # only the failure was probed again
+
+    clock.offset = cache.ttl * (1 + cache.jitter) + 1   # past the success's TTL as well
+    _status(client, email)
+    assert (good.hits, bad.hits) == (2, 3)
+
+
+PREAMBLE = b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nBEGIN:VTIMEZONE\r\n" + b"X-PADDING:" + b"x" * 200 * 1024 + b"\r\n"
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_probe_reads_at_most_its_limit(app_module, feeds, ranges):
+    state, url = feeds(PREAMBLE + b"END:VTIMEZONE\r\nBEGIN:VEVENT\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n")
+    state.ranges = ranges      # False: the server sends the whole body with a 200
+    before = UPSTREAM_BYTES.value("probe")
+    ok, reason = asyncio.run(app_module._check_ics(url))
+    read = UPSTREAM_BYTES.value("probe") - before
+    # no VEVENT in the first PROBE_BYTES, but a cut-off calendar is judged valid
+    assert (ok, reason) == (True, None)
+    if ranges:
+        assert read == app_module.PROBE_BYTES
+    else:
+        assert app_module.PROBE_BYTES <= read < app_module.PROBE_BYTES + 64 * 1024 < len(state.body)
@@ -0,0 +1,128 @@
+# server/tests/test_llm.py
+import asyncio
+
+import pytest
+
+from services.cache import TTLCache
+from services.llm import FakeLLM, LLMClient, LLMError, LLMGateway, build_context, prompt_key
+from services.shared import SharedCache, SharedDB
+
+PROMPT = "Plan my day.\n- [todo/high] Write report\n- [todo/low] Water plants"
+
+
+async def _collect(chunks):
+    return "".join([c async for c in chunks])
+
+
+class Broken(LLMClient):
+    """Streams one chunk, then fails."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def stream(self, prompt, system=None):
+        self.calls += 1
+        yield "partial"
+        await asyncio.sleep(0.01)
+        raise LLMError("quota exceeded")
+
+
+def test_fake_llm_is_deterministic():
+    llm = FakeLLM()
+    text = asyncio.run(_collect(llm.stream(PROMPT)))
+    assert text == llm.reply(PROMPT) == asyncio.run(_collect(FakeLLM().stream(PROMPT)))
+    assert text.startswith("Looking at 2 tasks.")
+    assert llm.calls == 1
+
+
+def test_build_context_keeps_most_relevant_within_budget():
+    tasks = [{"id": str(i), "title": f"task {i}", "status": "todo", "priority": "low"} for i in range(50)]
+    tasks.append({"id": "u", "title": "fire", "status": "todo", "priority": "urgent"})
+    tasks.append({"id": "d", "title": "shipped", "status": "done", "priority": "urgent"})
+    text, kept, omitted = build_context(tasks, budget=40)
+    lines = text.splitlines()
+    assert lines[0] == "- [todo/urgent] fire"
+    assert kept + omitted == len(tasks) and omitted > 0
+    assert lines[-1] == f"(+{omitted} lower-priority tasks not shown)"
+    assert "shipped" not in text
+    assert build_context(tasks[:3], budget=1000) == (
+        "\n".join(f"- [todo/low] task {i}" for i in range(3)), 3, 0)
+
+
+def test_gateway_caches_the_answer():
+    llm = FakeLLM()
+    gw = LLMGateway(llm, TTLCache())
+    key = prompt_key("chat", PROMPT)
+
+    async def check():
+        assert await gw.cached(key) is None
+        text = await _collect(gw.stream(key, PROMPT))
+        assert await gw.cached(key) == text == llm.reply(PROMPT)
+
+    asyncio.run(check())
+    assert llm.calls == 1
+
+
+def test_gateway_coalesces_identical_requests():
+    llm = FakeLLM(delay=0.005)
+    gw = LLMGateway(llm, TTLCache())
+    key = prompt_key("chat", PROMPT)
+
+    async def check():
+        first = gw.stream(key, PROMPT)
+        head = await first.__anext__()       # generation under way
+        late = gw.stream(key, PROMPT)        # joins it, replayed from the first chunk
+        return head + await _collect(first), await _collect(late)
+
+    a, b = asyncio.run(check())
+    assert a == b == llm.reply(PROMPT)
+    assert llm.calls == 1
+
+
+def test_gateway_finishes_after_callers_leave():
+    llm = FakeLLM(delay=0.005)
+    gw = LLMGateway(llm, TTLCache())
+    key = prompt_key("chat", PROMPT)
+
+    async def check():
+        chunks = gw.stream(key, PROMPT)
+        await chunks.__anext__()
+        await chunks.aclose()                # client disconnected
+        while gw._inflight:
+            await asyncio.sleep(0.01)
+        return await gw.cached(key)
+
+    assert asyncio.run(check()) == llm.reply(PROMPT)
+
+
+def test_gateway_error_reaches_every_follower_and_is_not_cached():
+    llm = Broken()
+    gw = LLMGateway(llm, TTLCache())
+    key = prompt_key("chat", PROMPT)
+
+    async def check():
+        results = await asyncio.gather(*(_collect(gw.stream(key, PROMPT)) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, LLMError) and "quota" in str(r) for r in results)
+        assert await gw.cached(key) is None
+        assert not gw._inflight
+        with pytest.raises(LLMError):        # the next request tries again
+            await _collect(gw.stream(key, PROMPT))
+
+    asyncio.run(check())
+    assert llm.calls == 2
+
+
+def test_gateway_answer_shared_between_workers(tmp_path):
+    db = SharedDB(tmp_path / "shared.db")
+    llm_a, llm_b = FakeLLM(), FakeLLM()
+    a = LLMGateway(llm_a, SharedCache(db, "coach"))
+    b = LLMGateway(llm_b, SharedCache(db, "coach"))
+    key = prompt_key("retro", PROMPT)
+
+    async def check():
+        text = await _collect(a.stream(key, PROMPT))
+        assert await b.cached(key) == text
+
+    asyncio.run(check())
+    assert llm_a.calls == 1 and llm_b.calls == 0
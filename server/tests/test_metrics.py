@@ -0,0 +1,216 @@
+# server/tests/test_metrics.py
+import importlib.util
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from services.metrics import SNAPSHOT_WEEKS, WeeklyMetrics, done_record, write_snapshot
+from services.recurrence import Calendar
+
+
+class Task(BaseModel):
+    id: str
+    title: str = "t"
+    status: str = "done"
+    priority: str = "low"
+    dueDate: Optional[str] = None
+    createdAt: str = "2026-01-05T09:00:00"
+    updatedAt: str = "2026-01-05T10:00:00"
+    source: Optional[str] = None
+
+
+def _utc(iso):
+    dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _ms(iso):
+    return (_utc(iso) - datetime(1970, 1, 1, tzinfo=timezone.utc)) // timedelta(milliseconds=1)
+
+
+def recount(tasks, weeks, now):
+    """/metrics/weekly recomputed from scratch over `tasks`."""
+    today = now.astimezone(timezone.utc).date()
+    first = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    buckets = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for t in tasks:
+        if t.status != "done":
+            continue
+        day = _utc(t.updatedAt).date()
+        b = buckets[day - timedelta(days=day.weekday())]
+        b[0] += 1
+        if _ms(t.updatedAt) >= _ms(t.createdAt):
+            b[1] += _ms(t.updatedAt) - _ms(t.createdAt)   # both whole ms, as the buckets keep them
+            b[2] += 1
+        if t.dueDate:
+            b[3] += 1
+            b[4] += _ms(t.updatedAt) <= _ms(t.dueDate)
+    out = {"weeklyDone": [], "weeklyCycle": [], "weeklyOnTime": []}
+    for i in range(weeks):
+        wk = first + timedelta(weeks=i)
+        n, cyc_sum, cyc_n, with_due, ok = buckets.get(wk, (0, 0, 0, 0, 0))
+        out["weeklyDone"].append({"weekStart": wk.isoformat(), "count": n})
+        out["weeklyCycle"].append({"weekStart": wk.isoformat(), "avgCycleMs": int(cyc_sum / cyc_n) if cyc_n else 0})
+        out["weeklyOnTime"].append({"weekStart": wk.isoformat(),
+                                    "onTimePct": round(ok / with_due * 100) if with_due else 0})
+    return out
+
+
+NOW = datetime(2026, 1, 21, 12, tzinfo=timezone.utc)   # a Wednesday
+
+
+@pytest.mark.parametrize("updated, week", [
+    ("2026-01-11T23:59:59.999Z", "2026-01-05"),   # last instant of a Sunday
+    ("2026-01-12T00:00:00Z", "2026-01-12"),
+    ("2026-01-12T00:00:00", "2026-01-12"),        # naive counts as UTC
+    ("2026-01-12T01:00:00+02:00", "2026-01-05"),  # still Sunday in UTC
+    ("2026-01-11T23:30:00-01:00", "2026-01-12"),  # already Monday in UTC
+    ("2026-01-01T10:00:00Z", "2025-12-29"),       # the week a year starts in
+])
+def test_week_boundaries_are_utc_mondays(updated, week):
+    m = WeeklyMetrics()
+    m.add(done_record(Task(id="a", createdAt="2025-12-01T00:00:00Z", updatedAt=updated)))
+    series = m.series(5, now=NOW)
+    assert [w["weekStart"] for w in series["weeklyDone"] if w["count"]] == [week]
+    assert list(m.buckets(5, now=NOW)) == [date.fromisoformat(week)]
+
+
+def test_updates_retract_the_replaced_record():
+    m = WeeklyMetrics()
+    tasks = {t.id: t for t in [
+        Task(id="a", createdAt="2026-01-12T09:00:00Z", updatedAt="2026-01-13T09:00:00Z",
+             dueDate="2026-01-14T00:00:00Z"),
+        Task(id="b", createdAt="2026-01-12T09:00:00Z", updatedAt="2026-01-16T09:00:00Z",
+             dueDate="2026-01-14T00:00:00Z"),
+        Task(id="c", status="todo"),
+        Task(id="d", createdAt="2026-01-20T09:00:00Z", updatedAt="2026-01-19T09:00:00Z"),   # no cycle time
+    ]}
+    for t in tasks.values():
+        m.add(done_record(t))
+    assert m.series(3, now=NOW) == recount(tasks.values(), 3, NOW)
+    assert len(m) == 3
+
+    def edit(tid, **fields):
+        before = tasks[tid]
+        tasks[tid] = before.model_copy(update=fields)
+        m.update(done_record(before), done_record(tasks[tid]))
+        assert m.series(3, now=NOW) == recount(tasks.values(), 3, NOW)
+
+    edit("a", title="renamed")                                    # same record: nothing moves
+    edit("b", updatedAt="2026-01-20T09:00:00Z")                   # moved to another week
+    edit("a", dueDate=None)                                       # no longer counts for on-time
+    edit("c", status="done", updatedAt="2026-01-21T09:00:00Z")    # into done
+    edit("b", status="in-progress")                               # out of done
+    edit("d", status="todo")
+    edit("a", status="todo")
+    edit("c", status="todo")
+    assert len(m) == 0 and m.buckets(3, now=NOW) == {}
+    m.update(done_record(tasks["b"].model_copy(update={"status": "done"})), None)   # never counted: ignored
+    assert len(m) == 0
+
+
+# ───────────── /metrics/weekly ─────────────
+def _series(client, weeks):
+    r = client.get("/metrics/weekly", params={"weeks": weeks})
+    assert r.status_code == 200
+    return r.json()
+
+
+def _assert_matches_store(client, app_module):
+    tasks = app_module.STORE.list()
+    for weeks in (1, 4, 12):
+        assert _series(client, weeks) == recount(tasks, weeks, datetime.now(timezone.utc))
+
+
+def test_endpoint_matches_a_recount_through_edits(client, app_module):
+    now = datetime.now(timezone.utc)
+    earlier = (now - timedelta(days=9)).isoformat()
+    for i, due in enumerate([now + timedelta(days=1), now - timedelta(days=1), None]):
+        r = client.post("/tasks", json={"id": f"weekly-{i}", "title": f"weekly {i}", "priority": "low",
+                                        "status": "todo", "createdAt": earlier, "updatedAt": earlier,
+                                        "dueDate": due.isoformat() if due else None})
+        assert r.status_code == 200
+    _assert_matches_store(client, app_module)
+    before = _series(client, 1)["weeklyDone"][0]["count"]
+
+    for i in range(3):   # into done: stamped now, so this week
+        assert client.patch(f"/tasks/weekly-{i}", json={"status": "done"}).status_code == 200
+    assert _series(client, 1)["weeklyDone"][0]["count"] == before + 3
+    _assert_matches_store(client, app_module)
+
+    assert client.patch("/tasks/weekly-0", json={"status": "todo"}).status_code == 200   # out again
+    _assert_matches_store(client, app_module)
+    app_module._save([], ["weekly-1"])
+    assert _series(client, 1)["weeklyDone"][0]["count"] == before + 1
+    _assert_matches_store(client, app_module)
+
+
+def test_endpoint_counts_a_task_moved_by_sync(client, app_module):
+    now = time.time()
+
+    def feed(start):
+        ev = {"id": "move", "title": "moving shift",
+              "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+              "end": datetime.fromtimestamp(start + 3600, timezone.utc).isoformat()}
+        return Calendar([ev], now - 30 * 86400, now + 30 * 86400)
+
+    assert app_module._apply_sync(feed(now + 86400), "weeklysync", "Shift", False)["created"] == 1
+    assert client.patch("/tasks/weeklysync-move", json={"status": "done"}).status_code == 200
+    _assert_matches_store(client, app_module)
+
+    # the shift moves into the past: the done task is re-stamped and now late
+    assert app_module._apply_sync(feed(now - 3 * 86400), "weeklysync", "Shift", False)["updated"] == 1
+    moved = app_module.STORE.get("weeklysync-move")
+    assert moved.status == "done" and moved.dueDate < moved.updatedAt
+    _assert_matches_store(client, app_module)
+
+
+# ───────────── serverless handler (src/api/) ─────────────
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    path = Path(__file__).resolve().parents[2] / "src" / "api" / " weekly.py"
+    spec = importlib.util.spec_from_file_location("serverless_weekly", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "SNAPSHOT_PATH", str(tmp_path / "metrics_snapshot.json"))
+    return module
+
+
+def _call(handler, weeks):
+    r = handler.handler({"queryStringParameters": {"weeks": str(weeks)}})
+    return r["statusCode"], json.loads(r["body"])
+
+
+def test_snapshot_round_trip_through_the_handler(handler):
+    m = WeeklyMetrics()
+    now = datetime.now(timezone.utc)
+    for i in range(60):
+        done = now - timedelta(days=i * 3, hours=i)
+        m.add(done_record(Task(id=f"t{i}", createdAt=(done - timedelta(hours=5 + i)).isoformat(),
+                               updatedAt=done.isoformat(),
+                               dueDate=(done + timedelta(hours=(-1) ** i * 6)).isoformat() if i % 4 else None)))
+    write_snapshot(handler.SNAPSHOT_PATH, m.buckets(SNAPSHOT_WEEKS), version=42)
+    for weeks in (1, 4, 12, 104):
+        status, body = _call(handler, weeks)
+        assert status == 200
+        assert body.pop("generatedAt")
+        assert body == m.series(weeks)
+    assert _call(handler, "nope")[1]["weeklyDone"] == m.series(1)["weeklyDone"]
+
+
+def test_handler_without_a_usable_snapshot(handler):
+    status, body = _call(handler, 4)
+    assert status == 503 and handler.SNAPSHOT_PATH in body["detail"] and "METRICS_SNAPSHOT_PATH" in body["detail"]
+    for corrupt in ('{"weeks": {"2026-01-05": [1, 0', '{"version": 3}', '{"weeks": []}',
+                    '{"weeks": {"last week": [1, 0, 0, 0, 0]}}'):
+        Path(handler.SNAPSHOT_PATH).write_text(corrupt)
+        os.utime(handler.SNAPSHOT_PATH, ns=(time.time_ns(), time.time_ns()))   # a new mtime: re-read
+        status, body = _call(handler, 4)
+        assert status == 503 and "unreadable" in body["detail"], corrupt
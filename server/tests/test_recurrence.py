@@ -0,0 +1,116 @@
+# server/tests/test_recurrence.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from services import recurrence
+from services.recurrence import Calendar, Series
+
+DAY = 86400
+MASTER = {"id": "standup", "title": "Standup", "rrule": "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+          "tzid": "Europe/Berlin", "start": "2026-03-02T08:00:00+00:00",
+          "end": "2026-03-02T08:15:00+00:00"}
+
+
+def _ts(s):
+    return datetime.fromisoformat(s).timestamp()
+
+
+def test_weekly_series_keeps_local_time_across_dst():
+    series = Series(MASTER)
+    occ = series.expand(_ts("2026-03-23T00:00:00+00:00"), _ts("2026-04-04T00:00:00+00:00"))
+    starts = [ev["start"] for _, ev in occ]
+    assert len(starts) == 6
+    assert starts[:3] == ["2026-03-23T08:00:00+00:00", "2026-03-25T08:00:00+00:00",
+                          "2026-03-27T08:00:00+00:00"]
+    assert starts[3] == "2026-03-30T07:00:00+00:00"   # 09:00 Berlin after the switch to CEST
+
+
+def test_memo_is_safe_across_threads(monkeypatch):
+    monkeypatch.setattr(recurrence, "MEMO_SIZE", 4)   # evict constantly
+    cal = Calendar([MASTER], _ts("2026-03-01T00:00:00+00:00"), _ts("2027-03-01T00:00:00+00:00"))
+    lo = _ts("2026-03-02T00:00:00+00:00")
+    windows = [(lo + d * DAY, lo + (d + 7) * DAY) for d in range(0, 300, 3)]
+    expected = [len(cal.window(a, b)) for a, b in windows]
+
+    def run(_):
+        return [len(cal.window(a, b)) for a, b in windows]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(run, range(16)))
+    assert all(r == expected for r in results)
+    assert len(cal.series[0]._memo) <= 4
+
+
+DAILY = {"id": "daily", "title": "Daily", "rrule": "FREQ=DAILY", "tzid": None,
+         "start": "2026-03-02T08:00:00+00:00", "end": "2026-03-02T09:00:00+00:00"}
+
+
+def _override(rid, start=None, end=None, cancelled=False, **kw):
+    return {"id": "daily", "title": "Daily", "recurrenceId": rid, "start": start or rid,
+            "end": end or rid.replace("T08:", "T09:"), "cancelled": cancelled, **kw}
+
+
+@pytest.mark.parametrize("master, overrides, lo, hi, expected", [
+    pytest.param({**DAILY, "exdates": ["2026-03-03T08:00:00+00:00"]}, [],
+                 "2026-03-02", "2026-03-05", ["2026-03-02T08", "2026-03-04T08"], id="exdate"),
+    pytest.param({**DAILY, "rrule": "FREQ=WEEKLY;BYDAY=MO", "tzid": "Europe/Berlin",
+                  "exdates": ["2026-03-30T07:00:00+00:00"]}, [],   # 09:00 CEST
+                 "2026-03-23", "2026-04-14", ["2026-03-23T08", "2026-04-06T07", "2026-04-13T07"], id="exdate-local"),
+    pytest.param(DAILY, [_override("2026-03-03T08:00:00+00:00", "2026-03-03T15:00:00+00:00",
+                                   "2026-03-03T16:00:00+00:00")],
+                 "2026-03-02", "2026-03-05", ["2026-03-02T08", "2026-03-03T15", "2026-03-04T08"],
+                 id="moved-within-day"),
+    pytest.param(DAILY, [_override("2026-03-03T08:00:00+00:00", "2026-03-10T12:00:00+00:00",
+                                   "2026-03-10T13:00:00+00:00")],
+                 "2026-03-02", "2026-03-05", ["2026-03-02T08", "2026-03-04T08"], id="moved-out"),
+    pytest.param(DAILY, [_override("2026-03-03T08:00:00+00:00", "2026-03-10T12:00:00+00:00",
+                                   "2026-03-10T13:00:00+00:00")],
+                 "2026-03-10", "2026-03-11", ["2026-03-10T08", "2026-03-10T12"], id="moved-in"),
+    pytest.param(DAILY, [_override("2026-03-03T08:00:00+00:00", cancelled=True)],
+                 "2026-03-02", "2026-03-05", ["2026-03-02T08", "2026-03-04T08"], id="cancelled"),
+    pytest.param({**DAILY, "exdates": ["2026-03-03T08:00:00+00:00"]},
+                 [_override("2026-03-03T08:00:00+00:00", "2026-03-03T15:00:00+00:00",
+                            "2026-03-03T16:00:00+00:00")],
+                 "2026-03-02", "2026-03-05", ["2026-03-02T08", "2026-03-04T08"], id="override-of-exdate"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;COUNT=3"}, [],
+                 "2026-03-01", "2026-04-01", ["2026-03-02T08", "2026-03-03T08", "2026-03-04T08"], id="count"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;COUNT=3"}, [],
+                 "2026-03-03", "2026-03-10", ["2026-03-03T08", "2026-03-04T08"], id="count-mid-series"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;COUNT=3"}, [],
+                 "2026-03-05", "2026-03-10", [], id="count-spent"),
+    pytest.param({**DAILY, "rrule": "FREQ=WEEKLY;BYDAY=MO,FR;COUNT=3"}, [],
+                 "2026-03-01", "2026-04-01", ["2026-03-02T08", "2026-03-06T08", "2026-03-09T08"],
+                 id="count-byday"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;UNTIL=20260304T080000Z"}, [],   # UNTIL is inclusive
+                 "2026-03-01", "2026-04-01", ["2026-03-02T08", "2026-03-03T08", "2026-03-04T08"], id="until"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;UNTIL=20260303T235959Z"}, [],
+                 "2026-03-01", "2026-04-01", ["2026-03-02T08", "2026-03-03T08"], id="until-before-clock"),
+    pytest.param({**DAILY, "rrule": "FREQ=DAILY;INTERVAL=2;UNTIL=20260310T000000Z"}, [],
+                 "2026-03-05", "2026-04-01", ["2026-03-06T08", "2026-03-08T08"], id="until-mid-series"),
+])
+def test_exclusions_overrides_and_termination(master, overrides, lo, hi, expected):
+    cal = Calendar([master, *overrides], _ts("2026-01-01T00:00:00+00:00"), _ts("2027-01-01T00:00:00+00:00"))
+    got = cal.window(_ts(lo + "T00:00:00+00:00"), _ts(hi + "T00:00:00+00:00"))
+    assert [ev["start"] for ev in got] == [s + ":00:00+00:00" for s in expected]
+    assert all(ev["seriesId"] == "daily" for ev in got)
+
+
+def test_override_keeps_the_occurrence_id():
+    moved = _override("2026-03-03T08:00:00+00:00", "2026-03-03T15:00:00+00:00", "2026-03-03T16:00:00+00:00",
+                      title="Daily (moved)")
+    series = Series(DAILY, [moved])
+    occ = series.expand(_ts("2026-03-03T00:00:00+00:00"), _ts("2026-03-04T00:00:00+00:00"))
+    ((_, ev),) = occ
+    assert ev["id"] == "daily-20260303T080000Z" and ev["title"] == "Daily (moved)"
+    assert "recurrenceId" not in ev and "cancelled" not in ev
+    regular = series.expand(_ts("2026-03-04T00:00:00+00:00"), _ts("2026-03-05T00:00:00+00:00"))
+    assert [ev["id"] for _, ev in regular] == ["daily-20260304T080000Z"]
+
+
+def test_overrides_without_a_master_are_plain_events():
+    cal = Calendar([_override("2026-03-03T08:00:00+00:00", title="Orphan"),
+                    {**_override("2026-03-04T08:00:00+00:00", cancelled=True), "id": "gone"}],
+                   _ts("2026-01-01T00:00:00+00:00"), _ts("2027-01-01T00:00:00+00:00"))
+    assert [(ev["title"], ev["start"]) for ev in cal] == [("Orphan", "2026-03-03T08:00:00+00:00")]
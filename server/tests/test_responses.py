@@ -0,0 +1,109 @@
+# server/tests/test_responses.py
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import services.responses as responses
+from services.responses import CompressionMiddleware, compress, json_bytes, pick_encoding
+
+BIG = b'{"items":[' + b",".join(b'{"id":%d,"title":"task"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.mark.parametrize("header, with_br, without_br", [
+    ("gzip", "gzip", "gzip"),
+    ("br", "br", None),                        # no brotli module: nothing we can produce
+    ("gzip, br", "br", "gzip"),
+    ("br;q=0.5, gzip", "gzip", "gzip"),
+    ("br;q=1.0, gzip;q=0.8", "br", "gzip"),
+    ("gzip;q=0, br;q=0", None, None),
+    ("gzip;q=nope", None, None),
+    ("GZIP ; q=0.3", "gzip", "gzip"),
+    ("*", "br", "gzip"),
+    ("*;q=0.5, gzip;q=0.9", "gzip", "gzip"),
+    ("gzip;q=0, *", "br", None),
+    ("identity", None, None),
+    ("identity;q=0, gzip", "gzip", "gzip"),
+    ("identity;q=0", None, None),              # nothing else offered: sent as is
+    ("", None, None),
+])
+def test_pick_encoding(monkeypatch, header, with_br, without_br):
+    monkeypatch.setattr(responses, "BROTLI_READY", True)
+    assert pick_encoding(header) == with_br
+    monkeypatch.setattr(responses, "BROTLI_READY", False)
+    assert pick_encoding(header) == without_br
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(responses, "BROTLI_READY", False)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/big")
+    def big():
+        return json_bytes(BIG)
+
+    @app.get("/small")
+    def small():
+        return json_bytes(b'{"ok":true}')
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(BIG), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/binary")
+    def binary():
+        return Response(bytes(4096), media_type="image/png")
+
+    @app.get("/ndjson")
+    def ndjson():
+        return StreamingResponse((BIG + b"\n" for _ in range(3)), media_type="application/x-ndjson")
+
+    @app.get("/sse")
+    def sse():
+        return StreamingResponse(iter([b"data: " + BIG + b"\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def _raw(client, path, accept):
+    """Status, headers and the body as sent (not decoded by the client)."""
+    with client.stream("GET", path, headers={"Accept-Encoding": accept}) as r:
+        return r.status_code, r.headers, b"".join(r.iter_raw())
+
+
+def test_large_json_is_gzipped(client):
+    status, headers, body = _raw(client, "/big", "gzip, br")
+    assert status == 200 and headers["content-encoding"] == "gzip"
+    assert int(headers["content-length"]) == len(body) < len(BIG)
+    assert "Accept-Encoding" in headers["vary"]
+    assert gzip.decompress(body) == BIG
+
+
+def test_not_compressed(client):
+    for path, accept in [("/big", "identity"), ("/big", "gzip;q=0"), ("/big", "br"), ("/small", "gzip"),
+                         ("/binary", "gzip")]:
+        status, headers, body = _raw(client, path, accept)
+        assert status == 200 and "content-encoding" not in headers, (path, accept)
+        assert int(headers["content-length"]) == len(body)
+
+
+def test_already_encoded_body_is_left_alone(client):
+    status, headers, body = _raw(client, "/encoded", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == BIG   # compressed once, not twice
+
+
+def test_streaming_bodies_pass_through(client):
+    for path, expect in [("/ndjson", (BIG + b"\n") * 3), ("/sse", b"data: " + BIG + b"\n\n")]:
+        status, headers, body = _raw(client, path, "gzip")
+        assert status == 200 and "content-encoding" not in headers, path
+        assert body == expect
+
+
+def test_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    assert brotli.decompress(compress(BIG, "br")) == BIG
@@ -0,0 +1,139 @@
+# server/tests/test_schedule.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.schedule import busy, free_windows, overlaps, plan, union, working_hours
+
+BASE = datetime(2026, 1, 5, tzinfo=timezone.utc)   # a Monday, 00:00 UTC
+
+
+def h(hours):
+    return (BASE + timedelta(hours=hours)).timestamp()
+
+
+def iso(hours):
+    return (BASE + timedelta(hours=hours)).isoformat()
+
+
+def ev(eid, start, end):
+    return {"id": eid, "title": eid, "start": iso(start), "end": iso(end)}
+
+
+def task(tid, minutes, due=None, **kw):
+    return {"id": tid, "title": tid, "status": "todo", "priority": "low", "estimateMinutes": minutes,
+            "dueDate": iso(due) if due is not None else None, **kw}
+
+
+def spans(windows):
+    return [((s - h(0)) / 3600, (e - h(0)) / 3600) for s, e in windows]
+
+
+def test_union_merges_overlapping_and_adjacent_intervals():
+    items = busy({"w2w": [ev("a", 10, 12), ev("c", 13, 14)], "gcal": [ev("b", 11, 13), ev("d", 15, 16)]},
+                 h(0), h(24))
+    assert [b[3]["id"] for b in items] == ["a", "b", "c", "d"]
+    assert spans(union(items)) == [(10, 14), (15, 16)]
+
+
+def test_busy_clips_to_the_window_and_skips_all_day_entries():
+    events = [ev("early", 6, 10), ev("late", 20, 26), ev("outside", 30, 31), ev("allday", 0, 24),
+              {"id": "broken", "start": "soon", "end": iso(9)}]
+    items = busy({"gcal": events}, h(8), h(22))
+    assert [(b[3]["id"], *spans([b[:2]])[0]) for b in items] == [("early", 8, 10), ("late", 20, 22)]
+    assert [b[3]["id"] for b in busy({"gcal": events}, h(8), h(22), all_day=True)] == ["early", "allday", "late"]
+
+
+def test_free_windows_subtract_busy_time_and_drop_short_gaps():
+    hours = [(h(9), h(17)), (h(33), h(41))]
+    taken = [(h(7), h(10)), (h(12), h(12.1)), (h(12.2), h(16)), (h(30), h(50))]
+    assert spans(free_windows(hours, taken)) == [(10, 12), (12.1, 12.2), (16, 17)]
+    assert spans(free_windows(hours, taken, min_len=15 * 60)) == [(10, 12), (16, 17)]
+    assert spans(free_windows(hours, [])) == [(9, 17), (33, 41)]
+
+
+def test_working_hours_clip_each_local_day():
+    assert spans(working_hours(h(10), h(60), timezone.utc, 9, 17)) == [(10, 17), (33, 41), (57, 60)]
+    plus2 = timezone(timedelta(hours=2))   # 09:00-17:00 local is 07:00-15:00 UTC
+    assert spans(working_hours(h(0), h(48), plus2, 9, 17)) == [(7, 15), (31, 39)]
+    assert spans(working_hours(h(5), h(50), plus2, 0, 24)) == [(5, 50)]
+
+
+def test_overlaps_pair_only_events_still_running():
+    items = busy({"w2w": [ev("a", 9, 17)], "gcal": [ev("b", 10, 11), ev("c", 11, 12), ev("d", 17, 18)]},
+                 h(0), h(24))
+    found, total = overlaps(items)
+    assert total == 2   # b-c and a-d only touch
+    assert [[i["id"] for i in o["items"]] for o in found] == [["a", "b"], ["a", "c"]]
+    assert found[0]["minutes"] == 60 and found[0]["items"][0]["source"] == "w2w"
+    assert overlaps(items, limit=1)[0] == found[:1]
+
+
+def test_plan_places_tasks_earliest_due_first():
+    sources = {"w2w": [ev("shift", 10, 12), ev("day2", 33, 40)],
+               "gcal": [ev("meeting", 11, 13), ev("call", 13, 14), ev("holiday", 24, 48)]}
+    tasks = [
+        task("a", 90, due=11),                     # only 09-10 free before it
+        task("b", 120, due=36),
+        task("c", 120),
+        task("d", 30, due=-5),                     # already overdue
+        task("e", 60),                             # nothing left for it
+        task("done", 60, due=12, status="done"),
+        task("synced", 60, due=12, source="w2w"),
+        task("spent", 30, due=12, timeSpentMs=30 * 60_000),
+    ]
+    r = plan(sources, tasks, h(9), h(57), day_start=9, day_end=17, min_minutes=15)
+    # free: 09-10, 14-17, then 40-41 on day two (the all-day holiday is not busy time)
+    assert [(f["start"], f["end"]) for f in r["free"]] == [(iso(9), iso(10)), (iso(14), iso(17)), (iso(40), iso(41))]
+    assert [(b["taskId"], b["start"], b["minutes"]) for b in r["blocks"]] == [
+        ("a", iso(9), 60), ("b", iso(14), 120), ("c", iso(16), 60), ("c", iso(40), 60)]
+    assert r["unfit"] == [
+        {"taskId": "d", "title": "d", "priority": "low", "dueDate": iso(-5), "reason": "overdue",
+         "needMinutes": 30, "freeMinutesBeforeDue": 0, "shortMinutes": 30},
+        {"taskId": "a", "title": "a", "priority": "low", "dueDate": iso(11), "reason": "no_room",
+         "needMinutes": 90, "freeMinutesBeforeDue": 60, "shortMinutes": 30},
+    ]
+    assert r["unplaced"] == 1 and r["tasksConsidered"] == 5
+    assert r["freeAfterTasks"] == []
+    assert r["overlapCount"] == 1 and r["overlaps"][0]["minutes"] == 60
+    assert r["busyItems"] == 4
+
+    with_all_day = plan(sources, tasks, h(9), h(57), day_start=9, day_end=17, all_day=True)
+    assert [f["start"] for f in with_all_day["free"]] == [iso(9), iso(14)]
+
+
+# ───────────── /schedule/* ─────────────
+@pytest.fixture
+def second_feed(app_module, monkeypatch):
+    """GCal on a copy of the W2W feed: every shift is double-booked."""
+    from devtools.fake_ics import serve_in_thread
+    server, url = serve_in_thread(events=90)
+    monkeypatch.setattr(app_module, "GCAL_ICS_URL", url)
+    yield
+    server.shutdown()
+
+
+def test_conflicts_endpoint(client, second_feed):
+    day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    due = (day + timedelta(days=1, hours=12)).isoformat()
+    r = client.post("/tasks", json={"id": "schedule-unfit", "title": "report", "priority": "high",
+                                    "status": "todo", "estimateMinutes": 120, "dueDate": due,
+                                    "createdAt": day.isoformat(), "updatedAt": day.isoformat()})
+    assert r.status_code == 200
+    params = {"from": day.isoformat(), "to": (day + timedelta(days=3)).isoformat(),
+              "dayStart": 9, "dayEnd": 17}
+    r = client.get("/schedule/conflicts", params=params)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["busyItems"] == 6 and body["overlapCount"] == 3
+    assert {tuple(sorted(i["source"] for i in o["items"])) for o in body["overlaps"]} == {("gcal", "w2w")}
+    assert all(o["minutes"] == 480 for o in body["overlaps"])
+    # working hours are exactly the shifts: no room before the due date
+    (unfit,) = [u for u in body["unfit"] if u["taskId"] == "schedule-unfit"]
+    assert (unfit["reason"], unfit["freeMinutesBeforeDue"], unfit["shortMinutes"]) == ("no_room", 0, 120)
+    assert set(body["sources"]) == {"w2w", "gcal"}
+
+    free = client.get("/schedule/free-slots", params=params).json()
+    assert free["free"] == [] and "overlaps" not in free
+    assert client.get("/schedule/conflicts", params={**params, "dayStart": 17, "dayEnd": 9}).status_code == 400
+    assert client.get("/schedule/conflicts", params={**params, "tz": "Nowhere/Zone"}).status_code == 400
@@ -0,0 +1,200 @@
+# server/tests/test_scheduler.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+import services.scheduler as scheduler_module
+from services.cache import MISSING
+from services.scheduler import Job, Scheduler, Snapshots
+
+
+async def _until(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+def test_delays_jitter_and_back_off_within_bounds():
+    job = Job("j", lambda: None, interval=10, jitter=0.2, retry_base=1, backoff_max=6)
+    delays = [job.next_delay() for _ in range(500)]
+    assert all(8 <= d <= 12 for d in delays) and max(delays) - min(delays) > 2
+    for failures, cap in [(1, 1), (2, 2), (3, 4), (4, 6), (20, 6)]:   # doubling, capped at backoff_max
+        job.consecutive_failures = failures
+        delays = [job.next_delay() for _ in range(200)]
+        assert all(cap / 2 <= d <= cap for d in delays), failures
+    assert Job("k", lambda: None, interval=10, jitter=0).next_delay() == 10
+
+
+def test_failing_job_backs_off_then_recovers():
+    calls = []
+
+    async def flaky():
+        calls.append(time.monotonic())
+        if len(calls) <= 3:
+            raise RuntimeError(f"boom {len(calls)}")
+        return {"n": len(calls)}
+
+    async def check():
+        s = Scheduler()
+        job = s.add("flaky", flaky, interval=60, retry_base=0.04, backoff_max=1)
+        await s.start()
+        try:
+            await _until(lambda: job.consecutive_failures == 3)
+            h = s.health()["jobs"]["flaky"]
+            assert not h["ok"] and h["lastError"] == "RuntimeError: boom 3" and h["failures"] == 3
+            await _until(lambda: job.last_success is not None)
+        finally:
+            await s.stop()
+        return job
+
+    job = asyncio.run(check())
+    assert job.runs == 4 and job.failures == 3 and job.consecutive_failures == 0
+    assert job.last_error is None and job.last_result == {"n": 4}
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    # retries wait base * 2**(n-1) with full jitter, i.e. at least half of that
+    assert gaps[0] >= 0.02 and gaps[1] >= 0.04 and gaps[2] >= 0.08
+
+
+def test_timeout_bounds_a_run():
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def check():
+        s = Scheduler()
+        s.add("slow", slow, interval=60, timeout=0.05)
+        t0 = time.monotonic()
+        job = await s.run_now("slow")
+        return job, time.monotonic() - t0
+
+    job, took = asyncio.run(check())
+    assert took < 1 and job.failures == 1 and job.last_error.startswith("TimeoutError")
+    assert not job.running and job.last_duration < 1
+
+
+def test_initial_delay_and_interval():
+    runs = []
+
+    async def tick():
+        runs.append(time.monotonic())
+
+    async def check():
+        s = Scheduler()
+        s.add("tick", tick, interval=0.05, jitter=0, initial_delay=0.2)
+        t0 = time.monotonic()
+        await s.start()
+        try:
+            await _until(lambda: len(runs) >= 3)
+        finally:
+            await s.stop()
+        return t0
+
+    t0 = asyncio.run(check())
+    assert runs[0] - t0 >= 0.1                 # initial_delay, scaled by 0.5-1.0
+    assert all(b - a >= 0.045 for a, b in zip(runs, runs[1:]))
+
+
+def test_stop_wakes_sleepers_and_cancels_overrunning_jobs():
+    state = {"cancelled": False}
+
+    async def stuck():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def idle():
+        return "ok"
+
+    async def check():
+        s = Scheduler()
+        s.add("stuck", stuck, interval=60)                       # runs at once, never finishes
+        s.add("idle", idle, interval=3600, initial_delay=3600)   # asleep for an hour
+        await s.start()
+        assert s.started
+        await _until(lambda: s.jobs["stuck"].running)
+        assert s.jobs["idle"].next_run > time.time() + 1000
+        t0 = time.monotonic()
+        await s.stop(grace=0.1)
+        took = time.monotonic() - t0
+        tasks = [t for t in asyncio.all_tasks() if t.get_name().startswith("job:")]
+        return s, took, tasks
+
+    s, took, leftover = asyncio.run(check())
+    assert took < 2 and state["cancelled"] and leftover == []
+    assert not s.started and s.health()["running"] is False
+    assert all(j._task is None and j.next_run is None for j in s.jobs.values())
+    assert s.jobs["idle"].runs == 0
+    asyncio.run(Scheduler().stop())   # never started: nothing to do
+
+
+def test_health_payload():
+    async def ok():
+        return {"events": 3}
+
+    async def bad():
+        raise ValueError("nope")
+
+    async def check():
+        s = Scheduler()
+        s.add("ok", ok, interval=30)
+        s.add("bad", bad, interval=30)
+        assert s.health() == {"running": False, "ok": False, "jobs": {
+            name: {"ok": False, "running": False, "interval": 30, "runs": 0, "failures": 0,
+                   "consecutiveFailures": 0, "lastStarted": None, "lastSuccess": None, "lastDurationMs": None,
+                   "lastError": None, "lastResult": None, "nextRun": None} for name in ("ok", "bad")}}
+        await s.run_now("ok")
+        await s.run_now("bad")
+        return s.health()
+
+    before = time.time()
+    h = asyncio.run(check())
+    good, bad = h["jobs"]["ok"], h["jobs"]["bad"]
+    assert h["ok"] is False and h["running"] is False
+    assert good["ok"] and good["runs"] == 1 and good["lastResult"] == {"events": 3}
+    assert before <= good["lastStarted"] <= good["lastSuccess"] and good["lastDurationMs"] >= 0
+    assert not bad["ok"] and (bad["failures"], bad["consecutiveFailures"]) == (1, 1)
+    assert bad["lastError"] == "ValueError: nope" and bad["lastSuccess"] is None
+
+
+def test_snapshots_serve_only_current_and_young_values(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scheduler_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    snaps = Snapshots(max_age=60)
+    snaps.put(("weekly", 4), 7, {"weeklyDone": []})
+    assert snaps.get(("weekly", 4), 7) == {"weeklyDone": []}
+    assert snaps.get(("weekly", 4), 8) is MISSING    # computed before the latest change
+    assert snaps.get(("weekly", 1), 7) is MISSING
+    now[0] += 60
+    assert snaps.get(("weekly", 4), 7) == {"weeklyDone": []}
+    now[0] += 0.5
+    assert snaps.get(("weekly", 4), 7) is MISSING    # older than max_age
+    snaps.put(("weekly", 4), 8, {"weeklyDone": [1]})
+    assert snaps.get(("weekly", 4), 8) == {"weeklyDone": [1]} and len(snaps) == 1
+
+
+def test_weekly_endpoint_ignores_a_stale_snapshot(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "SNAPSHOTS", Snapshots(max_age=60))
+    planted = {"weeklyDone": "from the snapshot"}
+    app_module.SNAPSHOTS.put(("weekly", 3), app_module.CHANGES.version, planted)
+    assert client.get("/metrics/weekly", params={"weeks": 3}).json() == planted
+    r = client.post("/tasks", json={"id": "scheduler-bump", "title": "bump", "priority": "low", "status": "todo",
+                                    "createdAt": "2026-01-05T09:00:00", "updatedAt": "2026-01-05T09:00:00"})
+    assert r.status_code == 200
+    body = client.get("/metrics/weekly", params={"weeks": 3}).json()
+    assert body != planted and len(body["weeklyDone"]) == 3
+
+
+def test_metrics_job_tags_snapshots_with_the_version(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "SNAPSHOTS", Snapshots(max_age=60))
+    result = asyncio.run(app_module._metrics_job())
+    assert result["version"] == app_module.CHANGES.version
+    for weeks in app_module.WEEKLY_SNAPSHOT_WEEKS:
+        assert app_module.SNAPSHOTS.get(("weekly", weeks), result["version"]) == app_module._weekly_series(weeks)
+
+
+def test_jobs_health_endpoint(client, app_module):
+    body = client.get("/health/jobs").json()
+    assert body["running"] is False   # SCHEDULER_ENABLED=0 in tests
+    assert "metrics:snapshots" in body["jobs"] and set(body["jobs"]) == set(app_module.SCHEDULER.jobs)
@@ -0,0 +1,165 @@
+# server/tests/test_session.py
+import asyncio
+import json
+
+import pytest
+
+from services.http import HttpClient
+from services.session import AuthError, CertCache, GoogleVerifier, SessionSigner, _b64d, _b64e
+
+SECRET = b"0123456789abcdef-test"
+
+
+# ───────────── SessionSigner ─────────────
+def test_session_round_trip():
+    signer = SessionSigner(SECRET, ttl=60)
+    token, exp = signer.issue({"email": "me@example.com"})
+    claims = signer.verify(token)
+    assert claims["email"] == "me@example.com"
+    assert claims["exp"] == exp
+    assert exp - claims["iat"] == 60
+
+
+def test_session_expired():
+    token, _ = SessionSigner(SECRET, ttl=-1).issue({"email": "me@example.com"})
+    with pytest.raises(AuthError, match="expired"):
+        SessionSigner(SECRET).verify(token)
+
+
+def test_session_tampered():
+    signer = SessionSigner(SECRET)
+    token, _ = signer.issue({"email": "me@example.com"})
+    payload, sig = token.split(".")
+    forged = _b64e(json.dumps({**json.loads(_b64d(payload)), "email": "admin@example.com"}).encode())
+    flipped = sig[:-1] + ("B" if sig.endswith("A") else "A")
+    for bad in (f"{forged}.{sig}", f"{payload}.{flipped}", payload, ""):
+        with pytest.raises(AuthError, match="signature"):
+            signer.verify(bad)
+    with pytest.raises(AuthError, match="signature"):
+        SessionSigner(b"another-secret-of-16+").verify(token)
+
+
+def test_session_secret_too_short():
+    with pytest.raises(ValueError):
+        SessionSigner(b"short")
+
+
+# ───────────── GoogleVerifier / CertCache ─────────────
+AUD = "client-1.apps.googleusercontent.com"
+
+
+@pytest.fixture
+def google():
+    pytest.importorskip("cryptography")
+    jwt = pytest.importorskip("google.auth.jwt")
+    from devtools.fake_google import serve_in_thread
+    servers = []
+
+    def start(max_age=300, refresh_floor=60):
+        server, url = serve_in_thread(max_age=max_age)
+        servers.append(server)
+        certs = CertCache(url, http=HttpClient(retries=0), refresh_floor=refresh_floor)
+        return server.state, GoogleVerifier(certs, jwt.decode, audience=AUD)
+
+    yield start
+    for s in servers:
+        s.shutdown()
+
+
+def test_google_valid_token(google):
+    state, verifier = google()
+    token = state.mint({"aud": AUD, "email": "me@example.com"})
+    claims = asyncio.run(verifier.verify(token))
+    assert claims["email"] == "me@example.com"
+    assert claims["iss"] == "https://accounts.google.com"
+
+
+def test_google_invalid_tokens(google):
+    state, verifier = google()
+
+    async def check():
+        for token, why in (
+            (state.mint({"aud": "someone-else", "email": "me@example.com"}), "audience"),
+            (state.mint({"aud": AUD, "iss": "https://evil.example"}), "issuer"),
+            (state.mint({"aud": AUD}, ttl=-600), "expired"),
+        ):
+            with pytest.raises(AuthError, match=f"(?i){why}"):
+                await verifier.verify(token)
+        header, payload, sig = state.mint({"aud": AUD}).split(".")
+        with pytest.raises(AuthError):
+            await verifier.verify(f"{header}.{payload}.{sig[::-1]}")
+        with pytest.raises(AuthError):
+            await verifier.verify("not-a-token")
+
+    asyncio.run(check())
+
+
+def test_google_verified_token_is_remembered(google):
+    state, verifier = google()
+    token = state.mint({"aud": AUD, "email": "me@example.com"})
+    calls = []
+    decode = verifier.decode
+    verifier.decode = lambda *a, **kw: calls.append(1) or decode(*a, **kw)
+
+    async def twice():
+        return await verifier.verify(token), await verifier.verify(token)
+
+    first, second = asyncio.run(twice())
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_google_certs_cached_for_max_age(google):
+    state, verifier = google(max_age=300)
+
+    async def login(n):
+        for i in range(n):
+            await verifier.verify(state.mint({"aud": AUD, "email": f"u{i}@example.com"}))
+
+    asyncio.run(login(3))
+    assert verifier.certs.fetches == 1
+    assert state.hits == 1
+
+
+def test_google_certs_refetched_when_expired(google):
+    state, verifier = google(max_age=0)
+
+    async def login(n):
+        for i in range(n):
+            await verifier.verify(state.mint({"aud": AUD, "email": f"u{i}@example.com"}))
+
+    asyncio.run(login(2))
+    assert verifier.certs.fetches == 2
+
+
+def test_google_key_rotation_refetches_early(google):
+    state, verifier = google(max_age=300, refresh_floor=0)
+
+    async def check():
+        await verifier.verify(state.mint({"aud": AUD, "email": "a@example.com"}))
+        kid = state.rotate()
+        claims = await verifier.verify(state.mint({"aud": AUD, "email": "b@example.com"}, kid=kid))
+        assert claims["email"] == "b@example.com"
+
+    asyncio.run(check())
+    assert verifier.certs.fetches == 2
+    assert set(verifier.certs.certs) == {"fake-1", "fake-2"}
+
+
+def test_google_rotation_refetch_is_rate_limited(google):
+    state, verifier = google(max_age=300, refresh_floor=3600)
+
+    async def check():
+        await verifier.verify(state.mint({"aud": AUD, "email": "a@example.com"}))
+        kid = state.rotate()
+        with pytest.raises(AuthError):
+            await verifier.verify(state.mint({"aud": AUD}, kid=kid))
+
+    asyncio.run(check())
+    assert verifier.certs.fetches == 1
+
+
+def test_google_without_google_auth():
+    verifier = GoogleVerifier(CertCache("http://127.0.0.1:9/certs"), None, audience=AUD)
+    with pytest.raises(AuthError, match="not installed"):
+        asyncio.run(verifier.verify("x.y.z"))
@@ -0,0 +1,157 @@
+# server/tests/test_sketch.py
+import random
+from bisect import bisect_left
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from services.changes import ChangeLog
+from services.metrics import TaskDistributions, done_record
+from services.sketch import KLL, Distribution
+from services.store import MemoryTaskStore
+from services.views import REBUILD_REMOVED_SHARE, TaskViews
+
+QS = (0.0, 0.1, 0.5, 0.9, 0.99, 1.0)
+
+
+def _exact(values, q):
+    """What _quantiles answers on exact data: the smallest value with rank >= q * n."""
+    ordered = sorted(values)
+    return ordered[max(int(-(-q * len(ordered) // 1)), 1) - 1]
+
+
+def _rank_error(values, q, got):
+    """|rank of `got` - q * n| / n over the exact values."""
+    ordered = sorted(values)
+    return abs(bisect_left(ordered, got) - q * len(ordered)) / len(ordered)
+
+
+def test_small_sketch_is_exact():
+    rng = random.Random(1)
+    values = [rng.uniform(0, 1000) for _ in range(150)]   # below k: nothing is compacted
+    kll = KLL(k=200)
+    for v in values:
+        kll.update(v)
+    assert kll.quantiles(QS) == [_exact(values, q) for q in QS]
+    assert KLL().quantiles(QS) == [None] * len(QS)
+
+
+def test_removals_are_subtracted_exactly_while_uncompacted():
+    d = Distribution()
+    for v in range(1, 101):
+        d.add(v)
+    for v in range(1, 51):
+        d.remove(v)
+    left = list(range(51, 101))
+    assert d.count == 50
+    assert d.quantiles(QS) == [_exact(left, q) for q in QS]
+    for v in range(51, 101):
+        d.remove(v)
+    assert d.count == 0 and d.quantiles(QS) == [None] * len(QS)
+
+
+def test_compacted_quantiles_with_removals_stay_within_rank_error():
+    rng = random.Random(7)
+    added = [rng.lognormvariate(10, 1) for _ in range(20_000)]
+    removed = rng.sample(added, 2_000)
+    d = Distribution(k=200)
+    for v in added:
+        d.add(v)
+    for v in removed:
+        d.remove(v)
+    gone = set(removed)
+    left = [v for v in added if v not in gone]
+    assert d.count == len(left)
+    assert len(list(d.added.weighted())) < 1_000   # compacted, not holding every value
+    for q, got in zip(QS[1:-1], d.quantiles(QS[1:-1])):
+        assert _rank_error(left, q, got) < 0.03, q
+
+
+def test_merged_parts_match_one_sketch():
+    rng = random.Random(3)
+    values = [rng.random() for _ in range(5_000)]
+    parts = [Distribution() for _ in range(4)]
+    whole = Distribution()
+    for i, v in enumerate(values):
+        parts[i % 4].add(v)
+        whole.add(v)
+    for i, v in enumerate(values[:500]):
+        parts[i % 4].remove(v)
+        whole.remove(v)
+    merged = Distribution.merged(parts)
+    assert merged.count == whole.count == 4_500
+    left = values[500:]
+    for q, got in zip((0.1, 0.5, 0.9), merged.quantiles((0.1, 0.5, 0.9))):
+        assert _rank_error(left, q, got) < 0.03
+
+
+# ───────────── TaskDistributions and the views' rebuild ─────────────
+class Task(BaseModel):
+    id: str
+    title: str = "t"
+    priority: str = "low"
+    status: str = "done"
+    dueDate: Optional[str] = None
+    estimateMinutes: Optional[int] = None
+    timeSpentMs: Optional[int] = None
+    createdAt: str = "2026-01-05T09:00:00"
+    updatedAt: str = "2026-01-05T10:00:00"
+    source: Optional[str] = None
+    version: int = 0
+
+
+def test_distribution_edits_retract_the_old_sample():
+    dists = TaskDistributions()
+    for i in range(10):
+        dists.add(done_record(Task(id=f"t{i}", updatedAt=f"2026-01-05T{10 + i}:00:00")))
+    assert dists.removed_share() == 0
+    before = done_record(Task(id="t0", updatedAt="2026-01-05T10:00:00"))
+    dists.update(before, before)                        # unchanged: nothing retracted
+    assert dists.removed_share() == 0
+    after = done_record(Task(id="t0", updatedAt="2026-01-06T09:00:00"))
+    dists.update(before, after)
+    (item,) = dists.query()
+    hours = sorted([24] + list(range(2, 11)))
+    assert item["count"] == 10 and item["cycleMs"]["n"] == 10
+    assert item["cycleMs"]["p50"] == _exact(hours, 0.5) * 3_600_000
+    assert item["cycleMs"]["p99"] == 24 * 3_600_000
+    assert dists.removed_share() == pytest.approx(1 / 11)
+    dists.update(after, None)                           # left `done`
+    assert dists.query()[0]["count"] == 9
+    for i in range(1, 10):
+        dists.update(done_record(Task(id=f"t{i}", updatedAt=f"2026-01-05T{10 + i}:00:00")), None)
+    assert dists.query() == [] and dists.removed_share() == 0   # empty bucket dropped
+
+
+def test_views_rebuild_once_removals_pile_up():
+    store, changes = MemoryTaskStore(Task), ChangeLog()
+    tasks = [Task(id=f"t{i}", updatedAt=f"2026-01-05T{10 + i % 12}:00:00") for i in range(40)]
+    changes.record(store.apply(tasks, ()))
+    views = TaskViews(store, changes, columns=True)
+    with views.read() as v:
+        assert len(v.distributions) == 40
+    assert not views.maintain()
+
+    edited = 0
+    while True:
+        # move a task's completion by an hour: one value retracted, one added
+        t = store.get(f"t{edited % 40}")
+        hour = int(t.updatedAt[11:13]) % 23 + 1
+        changes.record(store.apply([t.model_copy(update={"updatedAt": f"2026-01-05T{hour:02d}:00:00"})], ()))
+        edited += 1
+        with views.read() as v:
+            share = v.distributions.removed_share()
+        if share > REBUILD_REMOVED_SHARE:
+            break
+        assert not views.maintain()
+    assert edited > 10
+
+    assert views.maintain()
+    with views.read() as v:
+        assert v.distributions.removed_share() == 0
+        (item,) = v.distributions.query()
+    cycles = sorted((int(t.updatedAt[11:13]) - 9) * 3_600_000 for t in store.list()
+                    if int(t.updatedAt[11:13]) >= 9)
+    assert item["count"] == 40 and item["cycleMs"]["n"] == len(cycles)
+    assert item["cycleMs"]["p50"] == _exact(cycles, 0.5)
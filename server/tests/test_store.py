@@ -0,0 +1,291 @@
+# server/tests/test_store.py
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from services.store import MemoryTaskStore, SqliteTaskStore, TaskQuery, VersionConflict, utc_text
+
+
+class Task(BaseModel):
+    """The fields of app.Task the stores read."""
+    id: str
+    title: str
+    priority: str = "low"
+    status: str = "todo"
+    dueDate: Optional[str] = None
+    estimateMinutes: Optional[int] = None
+    timeSpentMs: Optional[int] = None
+    createdAt: str = "2026-01-05T09:00:00"
+    updatedAt: str = "2026-01-05T09:00:00"
+    source: Optional[str] = None
+    version: int = 0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTaskStore(Task)
+    return SqliteTaskStore(Task, tmp_path / "tasks.db")
+
+
+def _t(tid, **kw):
+    return Task(**{"id": tid, "title": f"task {tid}", **kw})
+
+
+def test_versions_are_stamped_per_write(store):
+    a, b = store.apply([_t("a"), _t("b")], ())
+    assert (a.version, b.version) == (1, 1)
+    (a2,) = store.apply([a.model_copy(update={"title": "renamed"})], ())
+    assert a2.version == 2
+    assert store.get("a").version == 2 and store.get("a").title == "renamed"
+
+
+def test_versions_of_many(store):
+    store.apply([_t("a"), _t("b")], ())
+    store.apply([_t("a", title="renamed")], ())
+    assert store.versions(["a", "b", "missing"]) == {"a": 2, "b": 1}
+
+
+def test_expect_is_compare_and_set(store):
+    store.apply([_t("a")], ())
+    store.apply([_t("a", title="v2")], (), expect={"a": 1})
+    with pytest.raises(VersionConflict) as e:
+        store.apply([_t("a", title="stale"), _t("b")], (), expect={"a": 1})
+    assert (e.value.task_id, e.value.expected, e.value.current) == ("a", 1, 2)
+    assert store.get("a").title == "v2"     # the whole batch was rejected
+    assert store.get("b") is None
+
+
+def test_expect_zero_means_absent(store):
+    store.apply([_t("a")], (), expect={"a": 0})
+    with pytest.raises(VersionConflict) as e:
+        store.apply([_t("a", title="again")], (), expect={"a": 0})
+    assert e.value.current == 1
+    with pytest.raises(VersionConflict):
+        store.apply((), ["missing"], expect={"missing": 3})
+
+
+def test_delete_with_expect(store):
+    store.apply([_t("a")], ())
+    with pytest.raises(VersionConflict):
+        store.apply((), ["a"], expect={"a": 5})
+    store.apply((), ["a"], expect={"a": 1})
+    assert store.get("a") is None
+    assert store.apply([_t("a")], (), expect={"a": 0})[0].version == 1   # recreated from scratch
+
+
+def test_concurrent_read_modify_write_loses_nothing(store, tmp_path):
+    store.apply([_t("counter", timeSpentMs=0)], ())
+    # SQLite: a second store on the same file stands in for another worker process
+    stores = [store, SqliteTaskStore(Task, tmp_path / "tasks.db")] if store.shared else [store]
+    per_thread, threads = 25, 4
+
+    def bump(s):
+        for _ in range(per_thread):
+            while True:
+                t = s.get("counter")
+                try:
+                    s.apply([t.model_copy(update={"timeSpentMs": t.timeSpentMs + 1})], (),
+                            expect={"counter": t.version})
+                    break
+                except VersionConflict:
+                    continue
+
+    workers = [threading.Thread(target=bump, args=(stores[i % len(stores)],)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    t = store.get("counter")
+    assert t.timeSpentMs == per_thread * threads
+    assert t.version == per_thread * threads + 1
+
+
+def test_empty_batch_writes_nothing(store):
+    before = store.version
+    assert store.apply((), ()) == []
+    assert store.version == before
+
+
+def _script(store):
+    """The same sequence of writes and reads; returns everything observable."""
+    out = []
+    for step in (
+        lambda: store.apply([_t("a", status="done", source="w2w"), _t("b"), _t("c", dueDate="2026-02-01")], ()),
+        lambda: store.apply([_t("b", title="b2")], ["c"], expect={"b": 1, "c": 1}),
+        lambda: store.apply([_t("a", title="stale")], (), expect={"a": 2}),
+        lambda: store.apply([_t("d", source="w2w")], (), expect={"d": 0}),
+        lambda: store.apply((), ["a"], expect={"a": 1}),
+    ):
+        try:
+            out.append([t.model_dump() for t in step()])
+        except VersionConflict as e:
+            out.append(("conflict", e.task_id, e.expected, e.current))
+    out.append(sorted(t.model_dump_json() for t in store.list()))
+    out.append(store.query_json(TaskQuery(source="w2w")))
+    out.append(store.query_json(TaskQuery(after="a", limit=1)))
+    out.append(sorted(t.id for t in store.iter_by_status("todo")))
+    out.append(sorted((r.id, r.status, r.dueDate) for r in store.scan()))
+    out.append(store.count())
+    return out
+
+
+def test_memory_and_sqlite_agree(tmp_path):
+    assert _script(MemoryTaskStore(Task)) == _script(SqliteTaskStore(Task, tmp_path / "tasks.db"))
+
+
+
+
+def test_sqlite_survives_reopening(tmp_path):
+    first = SqliteTaskStore(Task, tmp_path / "tasks.db")
+    first.apply([_t("a", dueDate="2026-02-01"), _t("b", status="done")], ())
+    first.apply([_t("a", title="renamed", dueDate="2026-02-01")], ["b"])
+    again = SqliteTaskStore(Task, tmp_path / "tasks.db")
+    assert [t.model_dump() for t in again.list()] == [t.model_dump() for t in first.list()]
+    assert again.get("a").title == "renamed" and again.get("a").version == 2
+    assert again.get("b") is None
+    assert again.version == first.version
+
+
+def test_time_filters_normalize_stored_formats(store):
+    store.apply([_t("z", dueDate="2026-10-17T09:00:00Z"), _t("date", dueDate="2026-10-17"),
+                 _t("plus2", dueDate="2026-10-17T01:00:00+02:00", updatedAt="2026-10-17T01:00:00+02:00"),
+                 _t("none")], ())
+    due = utc_text("2026-10-17T00:00:00Z")
+
+    def ids(**kw):
+        return [json.loads(d)["id"] for d in store.query_json(TaskQuery(**kw))]
+    assert ids(due_from=due) == ["date", "z"]
+    assert ids(due_to=due) == ["plus2"]
+    assert ids(updated_since=utc_text("2026-10-16T22:00:00")) == ["plus2"]
+    assert store.get("date").dueDate == "2026-10-17"   # the task itself keeps its own spelling
+
+
+def test_utc_text():
+    assert utc_text("2026-10-17") == utc_text("2026-10-17T00:00:00") == utc_text("2026-10-17T02:00:00+02:00") \
+        == utc_text(datetime(2026, 10, 17, tzinfo=timezone.utc)) == "2026-10-17T00:00:00.000000Z"
+    assert utc_text("2026-10-17T00:00:00.5Z") > utc_text("2026-10-17T00:00:00Z")
+    assert utc_text("soon") is None and utc_text(None) is None
+
+
+def test_sqlite_reindexes_raw_time_columns(tmp_path):
+    path = tmp_path / "tasks.db"
+    SqliteTaskStore(Task, path).apply([_t("a", dueDate="2026-10-17T01:00:00+02:00")], ())
+    conn = sqlite3.connect(path)
+    with conn:   # a file from before the columns held utc_text
+        conn.execute("UPDATE tasks SET dueDate = '2026-10-17T01:00:00+02:00'")
+        conn.execute("DELETE FROM meta WHERE key = 'time_text'")
+    conn.close()
+    store = SqliteTaskStore(Task, path)
+    assert [json.loads(d)["id"] for d in store.query_json(TaskQuery(due_to=utc_text("2026-10-17")))] == ["a"]
+
+
+# ───────────── the API's conditional writes ─────────────
+def _create(client, tid, **kw):
+    body = {"id": tid, "title": tid, "priority": "low", "status": "todo",
+            "createdAt": "2026-01-05T09:00:00", "updatedAt": "2026-01-05T09:00:00", **kw}
+    r = client.post("/tasks", json=body)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_patch_if_match(client):
+    created = _create(client, "store-ifmatch")
+    etag = f'"{created["version"]}"'
+    r = client.patch("/tasks/store-ifmatch", json={"title": "first"}, headers={"If-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] == f'"{created["version"] + 1}"'
+    r = client.patch("/tasks/store-ifmatch", json={"title": "lost"}, headers={"If-Match": etag})
+    assert r.status_code == 409
+    assert r.json()["detail"]["current"]["title"] == "first"
+    r = client.patch("/tasks/store-ifmatch", json={"title": "weak"},
+                     headers={"If-Match": f'W/"{created["version"] + 1}", "99"'})
+    assert r.status_code == 200
+    assert client.patch("/tasks/nope-ifmatch", json={"title": "x"}).status_code == 404
+
+
+def test_bulk_patch_applies_like_single_patches(client):
+    for tid in ("store-bulk-a", "store-bulk-b"):
+        _create(client, tid)
+    r = client.patch("/tasks/bulk", json=[{"id": "store-bulk-a", "status": "done"},
+                                          {"id": "store-bulk-b", "timeSpentMs": 60000},
+                                          {"id": "store-bulk-a", "priority": "high"},
+                                          {"id": "store-bulk-nope", "title": "x"},
+                                          {"id": "store-bulk-b", "priority": "someday"}])
+    assert r.json()["applied"] == 2
+    assert [(e["index"], e["id"]) for e in r.json()["errors"]] == [(3, "store-bulk-nope"), (4, "store-bulk-b")]
+    a, b = (client.get(f"/tasks/{tid}").json() for tid in ("store-bulk-a", "store-bulk-b"))
+    assert (a["status"], a["priority"], a["version"]) == ("done", "high", 2)
+    assert (b["timeSpentMs"], b["priority"], b["version"]) == (60000, "low", 2)
+    assert a["updatedAt"] == b["updatedAt"] != "2026-01-05T09:00:00"   # one stamp per batch
+
+
+def test_repeated_ids_in_one_batch_are_rejected(client):
+    def item(tid, title):
+        return {"id": tid, "title": title, "priority": "low", "status": "todo",
+                "createdAt": "2026-01-05T09:00:00", "updatedAt": "2026-01-05T09:00:00"}
+
+    r = client.post("/tasks/bulk", json=[item("store-dup-a", "first"), item("store-dup-b", "b"),
+                                         item("store-dup-a", "second")]).json()
+    assert r["applied"] == 2
+    assert r["errors"] == [{"index": 2, "id": "store-dup-a", "error": "duplicate id in batch"}]
+    a = client.get("/tasks/store-dup-a").json()
+    assert (a["title"], a["version"]) == ("first", 1)
+
+    r = client.post("/tasks/bulk", params={"atomic": True},
+                    json=[item("store-dup-c", "one"), item("store-dup-c", "two")]).json()
+    assert r["applied"] == 0 and [e["index"] for e in r["errors"]] == [1]
+    assert client.get("/tasks/store-dup-c").status_code == 404
+
+    lines = [item("store-dup-d", "one"), item("store-dup-e", "e"), item("store-dup-d", "two")]
+    r = client.post("/tasks/import", content="\n".join(json.dumps(x) for x in lines)).json()
+    assert (r["applied"], r["failed"]) == (2, 1)
+    assert r["errors"] == [{"index": 3, "id": "store-dup-d", "error": "duplicate id in batch"}]
+    assert client.get("/tasks/store-dup-d").json()["title"] == "one"
+
+
+def test_concurrent_patches_to_different_fields_all_survive(client):
+    _create(client, "store-fields")
+    fields = [{"title": "t"}, {"priority": "high"}, {"status": "in-progress"},
+              {"estimateMinutes": 30}, {"timeSpentMs": 5000}, {"description": "d"}]
+    threads = [threading.Thread(target=client.patch, args=("/tasks/store-fields",), kwargs={"json": f})
+               for f in fields]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    t = client.get("/tasks/store-fields").json()
+    for f in fields:
+        assert all(t[k] == v for k, v in f.items())
+    assert t["version"] == 1 + len(fields)
+
+
+def test_sync_replans_when_a_task_changes_under_it(app_module, monkeypatch):
+    from services.recurrence import Calendar
+    app = app_module
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=2)
+    ev = {"id": "e1", "title": "Early", "start": start.isoformat(),
+          "end": (start + timedelta(hours=8)).isoformat()}
+    horizon = (start.timestamp() - 86400 * 10, start.timestamp() + 86400 * 10)
+    app._apply_sync(Calendar([ev], *horizon), "replan", "Shift", False)
+    plan = app.SYNC.plan
+    calls = []
+
+    def edit_after_planning(*args, **kwargs):
+        p = plan(*args, **kwargs)
+        if not calls:   # the user marks the task done between the plan and its write
+            t = app.STORE.get("replan-e1")
+            app._save([t.model_copy(update={"status": "done"})], expect={t.id: t.version})
+        calls.append(p)
+        return p
+
+    monkeypatch.setattr(app.SYNC, "plan", edit_after_planning)
+    moved = {**ev, "title": "Late"}
+    summary = app._apply_sync(Calendar([moved], *horizon), "replan", "Shift", False)
+    assert len(calls) == 2 and summary["updated"] == 1
+    t = app.STORE.get("replan-e1")
+    assert t.title == "Shift: Late" and t.status == "done"
@@ -0,0 +1,43 @@
+# server/tests/test_sync.py
+import time
+from datetime import datetime, timezone
+
+from services.recurrence import Calendar
+
+DAY = 86400
+
+
+def _task(app, tid, due, source="synctest", status="todo"):
+    iso = datetime.fromtimestamp(due, timezone.utc).isoformat()
+    return app.Task(id=tid, title=f"Shift: {tid}", priority="medium", status=status,
+                    createdAt=iso, updatedAt=iso, dueDate=iso, externalId=tid, source=source)
+
+
+def test_sync_removes_only_inside_the_current_horizon(app_module):
+    app, now = app_module, time.time()
+    app._save([_task(app, "synctest-old", now - 35 * DAY),       # past the lookback
+               _task(app, "synctest-soon", now + 2 * DAY),
+               _task(app, "synctest-done", now + 3 * DAY, status="done"),
+               _task(app, "synctest-far", now + 70 * DAY)])      # past the horizon
+    # parsed 40 days ago and not refreshed since: it still spans the old task
+    stale = Calendar([], now - 70 * DAY, now + 21 * DAY)
+    summary = app._apply_sync(stale, "synctest", "Shift", False)
+    assert summary["removed"] == 1
+    assert app.STORE.get("synctest-soon") is None
+    for tid in ("synctest-old", "synctest-done", "synctest-far"):
+        assert app.STORE.get(tid) is not None
+
+
+def test_sync_creates_only_events_inside_the_current_horizon(app_module):
+    app, now = app_module, time.time()
+
+    def ev(i, t):
+        start = datetime.fromtimestamp(t, timezone.utc)
+        end = datetime.fromtimestamp(t + 3600, timezone.utc)
+        return {"id": f"e{i}", "title": f"event {i}", "start": start.isoformat(), "end": end.isoformat()}
+
+    cal = Calendar([ev(0, now - 40 * DAY), ev(1, now + DAY), ev(2, now + 61 * DAY)],
+                   now - 45 * DAY, now + 62 * DAY)
+    summary = app._apply_sync(cal, "horizontest", "Shift", False)
+    assert summary["created"] == 1
+    assert [t.id for t in app.STORE.iter_by_source("horizontest")] == ["horizontest-e1"]
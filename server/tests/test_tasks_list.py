@@ -0,0 +1,103 @@
+# server/tests/test_tasks_list.py
+import pytest
+
+
+def _task(tid, source, **kw):
+    return {"id": tid, "title": f"title {tid}", "priority": "low", "status": "todo", "source": source,
+            "createdAt": "2026-01-05T09:00:00", "updatedAt": "2026-01-05T09:00:00", **kw}
+
+
+@pytest.fixture
+def seeded(client):
+    """Five tasks of their own source; returns (source, ids in order)."""
+    def seed(source, n=5, **kw):
+        ids = [f"{source}-{i}" for i in range(n)]
+        r = client.post("/tasks/bulk", json=[_task(tid, source, **kw) for tid in ids])
+        assert r.json()["applied"] == n
+        return source, ids
+    return seed
+
+
+def test_matching_etag_is_304(client, seeded):
+    source, _ = seeded("list304")
+    r = client.get("/tasks", params={"source": source}, headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200 and "Accept-Encoding" in r.headers["Vary"]
+    etag = r.headers["ETag"]
+    r = client.get("/tasks", params={"source": source}, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["ETag"] == etag and "Accept-Encoding" in r.headers["Vary"]
+
+
+def test_etag_changes_after_a_write(client, seeded):
+    source, ids = seeded("listwrite")
+    etag = client.get("/tasks", params={"source": source}).headers["ETag"]
+    client.patch(f"/tasks/{ids[0]}", json={"title": "edited"})
+    r = client.get("/tasks", params={"source": source}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    assert r.json()[0]["title"] == "edited"
+
+
+def test_cursor_pages(client, seeded):
+    source, ids = seeded("listpage")
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"source": source, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/tasks", params=params)
+        seen += [t["id"] for t in r.json()]
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ids and pages == 3
+    # a page exactly as long as what is left has no next cursor
+    r = client.get("/tasks", params={"source": source, "limit": 5})
+    assert len(r.json()) == 5 and "X-Next-Cursor" not in r.headers
+    assert client.get("/tasks", params={"source": source, "limit": 0}).status_code == 422
+    assert client.get("/tasks", params={"source": source, "cursor": "__8"}).status_code == 400
+
+
+def test_cached_bodies_do_not_leak_across_queries(client, seeded):
+    a, ids_a = seeded("listleak-a")
+    b, ids_b = seeded("listleak-b", status="done")
+    # same store version for every request below
+    assert [t["id"] for t in client.get("/tasks", params={"source": a}).json()] == ids_a
+    assert [t["id"] for t in client.get("/tasks", params={"source": b}).json()] == ids_b
+    assert [t["id"] for t in client.get("/tasks", params={"source": b, "status": "todo"}).json()] == []
+    slim = client.get("/tasks", params={"source": a, "fields": "title"}).json()
+    assert slim[0] == {"id": ids_a[0], "title": f"title {ids_a[0]}"}
+    assert len(client.get("/tasks", params={"source": a, "limit": 1}).json()) == 1
+    assert len(client.get("/tasks", params={"source": a}).json()) == 5
+    assert client.get("/tasks", params={"source": a, "fields": "nope"}).status_code == 400
+
+
+def test_compressed_and_plain_bodies_match(client, seeded):
+    source, _ = seeded("listgzip", n=30, description="x" * 40)
+    plain = client.get("/tasks", params={"source": source}, headers={"Accept-Encoding": "identity"})
+    gz = client.get("/tasks", params={"source": source}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert gz.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in plain.headers["Vary"] and "Accept-Encoding" in gz.headers["Vary"]
+    assert plain.headers["ETag"] == gz.headers["ETag"]
+    assert gz.json() == plain.json()
+
+
+def test_time_filters_compare_instants_across_formats(client):
+    source = "listtimes"
+    due = {"z": "2026-10-17T09:00:00Z", "naive": "2026-10-17T00:30:00", "offset": "2026-10-16T23:00:00+00:00",
+           "dateonly": "2026-10-17", "plus2": "2026-10-17T01:00:00+02:00"}
+    tasks = [_task(f"{source}-{k}", source, dueDate=v, updatedAt=v) for k, v in due.items()]
+    assert client.post("/tasks/bulk", json=tasks).json()["applied"] == len(tasks)
+
+    def ids(**params):
+        r = client.get("/tasks", params={"source": source, **params})
+        assert r.status_code == 200, r.text
+        return {t["id"].split("-", 1)[1] for t in r.json()}
+
+    # 2026-10-17 00:00 UTC; plus2 is 2026-10-16 23:00 UTC
+    assert ids(dueFrom="2026-10-17T00:00:00Z") == {"z", "naive", "dateonly"}
+    assert ids(dueFrom="2026-10-17T02:00:00+02:00") == {"z", "naive", "dateonly"}
+    assert ids(dueFrom="2026-10-17") == {"z", "naive", "dateonly"}
+    assert ids(dueTo="2026-10-17T00:00:00") == {"offset", "plus2"}
+    assert ids(dueFrom="2026-10-17T00:00:00Z", dueTo="2026-10-17T01:00:00Z") == {"naive", "dateonly"}
+    assert ids(updatedSince="2026-10-17T00:30:00Z") == {"z"}
+    assert client.get("/tasks", params={"dueFrom": "tomorrow"}).status_code == 422
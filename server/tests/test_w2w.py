@@ -0,0 +1,126 @@
+# server/tests/test_w2w.py
+import asyncio
+import datetime as dt
+
+import pytest
+
+import w2w
+from devtools.fake_w2w import serve_in_thread
+from services.http import HttpClient
+from w2w import NEAR_DAYS, NEAR_TTL, PAST_TTL, ShiftFetcher, chunk_ttl, chunks
+
+TODAY = dt.date(2026, 3, 11)   # a Wednesday
+D = dt.timedelta
+
+
+@pytest.fixture
+def api(monkeypatch):
+    server, base = serve_in_thread(per_day=3)
+    monkeypatch.setattr(w2w, "W2W_BASE", base)
+    monkeypatch.setattr(w2w, "W2W_API_KEY", "test-key")
+    monkeypatch.setattr(w2w, "W2W_ACCOUNT_ID", "demo")
+    monkeypatch.setattr(w2w, "HTTP", HttpClient(retries=0))
+    yield server.state
+    server.shutdown()
+
+
+def _days(c):
+    return (c[1] - c[0]).days
+
+
+def test_chunk_grid():
+    grid = chunks(TODAY - D(10), TODAY + D(30), TODAY)
+    assert grid[0][0] <= TODAY - D(10) and grid[-1][1] >= TODAY + D(30)
+    assert all(a[1] == b[0] for a, b in zip(grid, grid[1:]))   # contiguous, no overlap
+    near = [c for c in grid if TODAY <= c[0] < TODAY + D(NEAR_DAYS)]
+    assert len(near) == NEAR_DAYS and all(_days(c) == 1 for c in near)
+    for c in grid:
+        if c not in near:
+            assert _days(c) <= 7
+            assert c[0].weekday() == 0 or c[0] == TODAY + D(NEAR_DAYS)
+    # the same day always lands in the same chunk, whatever window asked for it
+    assert set(chunks(TODAY + D(20), TODAY + D(22), TODAY)) <= set(grid)
+
+
+def test_chunk_ttls():
+    assert chunk_ttl((TODAY - D(7), TODAY), TODAY) == PAST_TTL
+    assert chunk_ttl((TODAY, TODAY + D(1)), TODAY) == NEAR_TTL
+    far = chunk_ttl((TODAY + D(120), TODAY + D(127)), TODAY)
+    mid = chunk_ttl((TODAY + D(14), TODAY + D(21)), TODAY)
+    assert NEAR_TTL < mid < far
+
+
+def test_fetch_window(api):
+    fetcher = ShiftFetcher()
+    shifts, info = asyncio.run(fetcher.get(TODAY, TODAY + D(10), TODAY))
+    assert len(shifts) == 10 * 3
+    assert [s["start"] for s in shifts] == sorted(s["start"] for s in shifts)
+    assert all(TODAY.isoformat() <= s["start"][:10] < (TODAY + D(10)).isoformat() for s in shifts)
+    assert {"id", "role", "title", "location", "start", "end", "notes"} <= set(shifts[0])
+    assert info["fetched"] == info["chunks"] == len(api.ranges)
+
+
+def test_overlapping_window_fetches_only_missing_chunks(api):
+    fetcher = ShiftFetcher()
+
+    async def check():
+        await fetcher.get(TODAY, TODAY + D(14), TODAY)
+        asked = len(api.ranges)
+        shifts, info = await fetcher.get(TODAY + D(3), TODAY + D(28), TODAY)
+        assert info["fetched"] == len(api.ranges) - asked
+        assert 0 < info["fetched"] < info["chunks"]
+        return shifts
+
+    shifts = asyncio.run(check())
+    assert len(shifts) == 25 * 3
+    _, info = asyncio.run(fetcher.get(TODAY + D(3), TODAY + D(28), TODAY))
+    assert info["fetched"] == 0
+
+
+def test_pages_are_followed(api, monkeypatch):
+    monkeypatch.setattr(w2w, "PAGE_SIZE", 2)
+    shifts, info = asyncio.run(ShiftFetcher().get(TODAY + D(14), TODAY + D(21), TODAY))
+    assert len(shifts) == 7 * 3 and len({s["id"] for s in shifts}) == 21
+    assert api.hits > len(api.ranges)
+
+
+def test_concurrent_requests_share_chunk_fetches(api):
+    api.delay = 0.1
+    fetcher = ShiftFetcher()
+
+    async def check():
+        return await asyncio.gather(*(fetcher.get(TODAY, TODAY + D(5), TODAY) for _ in range(4)))
+
+    results = asyncio.run(check())
+    assert len(api.ranges) == results[0][1]["chunks"] == 5
+    assert all(r[0] == results[0][0] for r in results)
+
+
+def test_failed_chunk_is_not_cached(api, monkeypatch):
+    fetcher = ShiftFetcher()
+    monkeypatch.setattr(w2w, "W2W_BASE", "http://127.0.0.1:9")
+    with pytest.raises(Exception):
+        asyncio.run(fetcher.get(TODAY, TODAY + D(2), TODAY))
+    assert not fetcher._inflight and len(fetcher.cache) == 0
+
+
+def test_overlapping_ranges_request_each_chunk_once(api):
+    fetcher = ShiftFetcher()
+    windows = [(TODAY - D(9), TODAY + D(4)), (TODAY, TODAY + D(20)), (TODAY + D(2), TODAY + D(3)),
+               (TODAY - D(30), TODAY + D(60)), (TODAY + D(10), TODAY + D(45)), (TODAY - D(9), TODAY + D(4))]
+    for lo, hi in windows:
+        shifts, _ = asyncio.run(fetcher.get(lo, hi, TODAY))
+        assert len(shifts) == (hi - lo).days * 3
+    grid = {c for lo, hi in windows for c in chunks(lo, hi, TODAY)}
+    asked = [(c[0].isoformat(), (c[1] - D(1)).isoformat()) for c in sorted(grid)]
+    assert sorted(api.ranges) == asked and api.hits == len(asked)   # one request per chunk, ever
+
+
+def test_fetch_shifts_end_is_inclusive(api, monkeypatch):
+    monkeypatch.setattr(w2w, "FETCHER", ShiftFetcher())
+    day = dt.datetime.now(dt.timezone.utc).date()
+    lo, hi = day.isoformat(), (day + D(1)).isoformat()
+    shifts = asyncio.run(w2w.afetch_shifts(lo, hi))
+    assert {s["start"][:10] for s in shifts} == {lo, hi}
+    hits = api.hits
+    assert w2w.fetch_shifts(lo, hi) == shifts and api.hits == hits   # blocking form, same cache
@@ -1,35 +1,205 @@
 # server/w2w.py
-import os, datetime as dt
-import requests
-from typing import List, Dict, Any
+"""
+WhenToWork API client with a range-aware shift cache.
+
+    shifts = fetch_shifts("2025-06-01", "2025-06-30")           # inclusive dates
+    shifts = await afetch_shifts("2025-06-01", "2025-06-30")    # from async code
+
+A requested window is cut into chunks on a fixed grid: single days for the
+next NEAR_DAYS (where shifts get edited and a short TTL keeps them fresh),
+Monday-aligned weeks elsewhere. Each chunk is cached on its own with a TTL
+that grows with its distance from today, so overlapping windows reuse what
+earlier calls fetched and only the missing chunks go upstream: in parallel
+(at most `concurrency` at a time), following the API's pagination, with
+concurrent requests for the same chunk sharing one fetch. Retries and
+per-host limits come from services/http.py.
+"""
+import os, time, asyncio, datetime as dt
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.cache import TTLCache, MISSING
+from services.http import HTTP
+from services.instrument import CACHE_EVENTS, UPSTREAM_SECONDS
 
 W2W_BASE = os.getenv("W2W_BASE_URL", "https://api.when2work.example")  # <-- replace
 W2W_API_KEY = os.getenv("W2W_API_KEY", "")
 W2W_ACCOUNT_ID = os.getenv("W2W_ACCOUNT_ID", "")
 
+NEAR_DAYS = 7          # day-sized chunks from today up to this many days ahead
+PAGE_SIZE = 200
+# chunk TTLs (seconds) by how far from today the chunk starts
+PAST_TTL = 6 * 3600    # entirely in the past: rarely edited
+NEAR_TTL = 120         # within NEAR_DAYS
+TTLS = ((30, 900), (90, 3600))   # (starts fewer than N days ahead, ttl), first match wins
+FAR_TTL = 6 * 3600
+
+Chunk = Tuple[dt.date, dt.date]   # [start, end) in days
+
 def _hdrs():
     return {
         "Authorization": f"Bearer {W2W_API_KEY}",
         "Accept": "application/json",
     }
 
-def fetch_shifts(start: str, end: str) -> List[Dict[str, Any]]:
+def _normalize(s: Dict[str, Any]) -> Dict[str, Any]:
+    # normalize to your shape
+    role = s.get("positionName") or s.get("role", "Shift")
+    return {
+        "id": str(s["id"]),
+        "role": role,
+        "title": role,
+        "location": s.get("locationName") or s.get("location", ""),
+        "start": s["start"],  # ISO
+        "end": s["end"],      # ISO
+        "notes": s.get("notes", ""),
+    }
+
+async def _fetch_range(start: str, end: str) -> List[Dict[str, Any]]:
     """
-    start/end: ISO date (YYYY-MM-DD). Adjust to match W2W API spec.
+    One upstream range (start/end: inclusive ISO dates), every page of it.
+    Adjust to match W2W API spec: pages are followed through `next` (a URL)
+    or `nextCursor`.
     """
-    url = f"{W2W_BASE}/v1/accounts/{W2W_ACCOUNT_ID}/shifts?start={start}&end={end}"
-    r = requests.get(url, headers=_hdrs(), timeout=20)
-    r.raise_for_status()
-    data = r.json()
-    # normalize to your shape
+    base = f"{W2W_BASE}/v1/accounts/{W2W_ACCOUNT_ID}/shifts?start={start}&end={end}&limit={PAGE_SIZE}"
+    url: Optional[str] = base
     shifts = []
-    for s in data.get("shifts", []):
-        shifts.append({
-            "id": str(s["id"]),
-            "role": s.get("positionName") or s.get("role", "Shift"),
-            "location": s.get("locationName") or s.get("location", ""),
-            "start": s["start"],  # ISO
-            "end": s["end"],      # ISO
-            "notes": s.get("notes", ""),
-        })
-    return shifts
\ No newline at end of file
+    while url:
+        r = await HTTP.get(url, headers=_hdrs(), timeout=20)
+        r.raise_for_status()
+        data = r.json()
+        shifts += [_normalize(s) for s in data.get("shifts", [])]
+        if data.get("next"):
+            url = data["next"] if "://" in data["next"] else W2W_BASE + data["next"]
+        elif data.get("nextCursor"):
+            url = f"{base}&cursor={data['nextCursor']}"
+        else:
+            url = None
+    return shifts
+
+
+def chunk_ttl(chunk: Chunk, today: dt.date) -> float:
+    start, end = chunk
+    if end <= today:
+        return PAST_TTL
+    ahead = (start - today).days
+    if ahead < NEAR_DAYS:
+        return NEAR_TTL
+    for days, ttl in TTLS:
+        if ahead < days:
+            return ttl
+    return FAR_TTL
+
+def chunks(start: dt.date, end: dt.date, today: dt.date) -> List[Chunk]:
+    """Grid chunks covering [start, end): days in [today, today + NEAR_DAYS), weeks elsewhere."""
+    near_lo, near_hi = today, today + dt.timedelta(days=NEAR_DAYS)
+    out, d = [], start
+    while d < end:
+        if near_lo <= d < near_hi:
+            c = (d, d + dt.timedelta(days=1))
+        else:
+            lo = d - dt.timedelta(days=d.weekday())
+            hi = lo + dt.timedelta(days=7)
+            if d < near_lo:
+                hi = min(hi, near_lo)
+            else:
+                lo = max(lo, near_hi)
+            c = (lo, hi)
+        out.append(c)
+        d = c[1]
+    return out
+
+
+class ShiftFetcher:
+    """
+    Range cache in front of _fetch_range. `cache` has the TTLCache contract
+    (services/shared.SharedCache works too); values are
+    {"at": unix time fetched, "shifts": [...]} per chunk.
+    """
+
+    def __init__(self, cache=None, concurrency: int = 4):
+        self.cache = cache if cache is not None else TTLCache(maxsize=512)
+        self.concurrency = concurrency
+        self._inflight: Dict[Chunk, asyncio.Future] = {}
+
+    @staticmethod
+    def _key(c: Chunk) -> Tuple[str, str, str]:
+        return (W2W_ACCOUNT_ID, c[0].isoformat(), c[1].isoformat())
+
+    async def _fetch_chunk(self, c: Chunk, today: dt.date, sem: asyncio.Semaphore) -> Dict[str, Any]:
+        fut = self._inflight.get(c)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = self._inflight[c] = asyncio.get_running_loop().create_future()
+        try:
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    shifts = await _fetch_range(c[0].isoformat(), (c[1] - dt.timedelta(days=1)).isoformat())
+                except Exception:
+                    UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "w2w_api", "error")
+                    raise
+                UPSTREAM_SECONDS.observe(time.perf_counter() - t0, "w2w_api", "ok")
+            entry = {"at": time.time(), "shifts": shifts}
+            await self.cache.aset(self._key(c), entry, ttl=chunk_ttl(c, today))
+            fut.set_result(entry)
+            return entry
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()   # retrieved: waiters get it, nobody else needs to
+            raise
+        finally:
+            del self._inflight[c]
+
+    async def get(self, start: dt.date, end: dt.date, today: Optional[dt.date] = None
+                  ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Shifts starting in [start, end) (dates), deduplicated by id and
+        sorted by start, plus {"chunks", "fetched", "cachedAt"} where
+        cachedAt is the unix time of the oldest chunk served.
+        """
+        today = today or dt.datetime.now(dt.timezone.utc).date()
+        grid = chunks(start, end, today)
+        entries: Dict[Chunk, Dict[str, Any]] = {}
+        missing = []
+        hits = await asyncio.gather(*(self.cache.aget(self._key(c)) for c in grid))
+        for c, hit in zip(grid, hits):
+            CACHE_EVENTS.inc("w2w_chunks", "miss" if hit is MISSING else "hit")
+            if hit is MISSING:
+                missing.append(c)
+            else:
+                entries[c] = hit
+        if missing:
+            sem = asyncio.Semaphore(self.concurrency)
+            fetched = await asyncio.gather(*(self._fetch_chunk(c, today, sem) for c in missing))
+            entries.update(zip(missing, fetched))
+        lo, hi = start.isoformat(), end.isoformat()
+        seen: Dict[str, Dict[str, Any]] = {}
+        for c in grid:
+            for s in entries[c]["shifts"]:
+                if lo <= s["start"][:10] < hi:
+                    seen.setdefault(s["id"], s)
+        items = sorted(seen.values(), key=lambda s: s["start"])
+        oldest = min((e["at"] for e in entries.values()), default=time.time())
+        return items, {"chunks": len(grid), "fetched": len(missing), "cachedAt": oldest}
+
+    def invalidate(self) -> None:
+        self.cache.clear()
+
+
+FETCHER = ShiftFetcher()
+
+async def afetch_shifts(start: str, end: str) -> List[Dict[str, Any]]:
+    """
+    start/end: ISO date (YYYY-MM-DD), both inclusive. Served from FETCHER's
+    chunk cache; only chunks not cached yet are requested upstream.
+    """
+    items, _ = await FETCHER.get(dt.date.fromisoformat(start),
+                                 dt.date.fromisoformat(end) + dt.timedelta(days=1))
+    return items
+
+def fetch_shifts(start: str, end: str) -> List[Dict[str, Any]]:
+    """
+    Blocking afetch_shifts, for callers without an event loop (scripts,
+    threads); it raises RuntimeError if one is running in this thread.
+    """
+    return asyncio.run(afetch_shifts(start, end))
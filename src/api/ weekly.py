@@ -1,7 +1,64 @@
-from datetime import datetime
-def handler(request):
+"""
+Serverless weekly metrics: the /metrics/weekly series from the snapshot
+file the app's metrics job writes (METRICS_SNAPSHOT_PATH, by default
+server/metrics_snapshot.json), so a cold invocation imports only the
+standard-library metrics core and reads one small JSON file.
+
+Nothing here produces that file: only a running app (its
+"metrics:snapshots" job) writes it, and it is not in git. A deployment
+without the app next to it must set METRICS_SNAPSHOT_PATH to a copy it
+ships or mounts (e.g. one the app writes to shared storage); until that
+file exists every request gets a 503 naming the path it looked at.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+SERVER_DIR = Path(__file__).resolve().parents[2] / "server"
+sys.path.insert(0, str(SERVER_DIR))
+
+from services.metrics import read_snapshot, weekly_series  # noqa: E402
+
+SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "").strip() or str(SERVER_DIR / "metrics_snapshot.json")
+
+_cached = {"key": None, "snapshot": None}   # reused while the instance stays warm
+
+
+def _snapshot():
+    key = (SNAPSHOT_PATH, os.stat(SNAPSHOT_PATH).st_mtime_ns)
+    if _cached["key"] != key:
+        _cached["snapshot"], _cached["key"] = read_snapshot(SNAPSHOT_PATH), key
+    return _cached["snapshot"]
+
+
+def _weeks(request) -> int:
+    if isinstance(request, dict):
+        q = request.get("queryStringParameters") or {}
+    else:
+        q = {k: v[0] for k, v in parse_qs(urlparse(getattr(request, "url", "") or "").query).items()}
+    try:
+        return min(104, max(1, int(q.get("weeks", 1))))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _response(status, body):
     return {
-      "statusCode": 200,
-      "headers": {"Content-Type": "application/json"},
-      "body": '{"weeklyDone":[{"weekStart":"%s","count":4}]}' % datetime.utcnow().date().isoformat()
-    }
\ No newline at end of file
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json", "Cache-Control": "public, max-age=30"},
+        "body": json.dumps(body, separators=(",", ":")),
+    }
+
+
+def handler(request):
+    try:
+        buckets, meta = _snapshot()
+    except FileNotFoundError:
+        return _response(503, {"detail": f"no metrics snapshot at {SNAPSHOT_PATH}: it is written by the app's "
+                                         "metrics job; set METRICS_SNAPSHOT_PATH to a copy this deployment can read"})
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        return _response(503, {"detail": f"metrics snapshot at {SNAPSHOT_PATH} is unreadable "
+                                         f"({type(e).__name__}); it is rewritten by the app's metrics job"})
+    return _response(200, {**weekly_series(buckets, _weeks(request)), "generatedAt": meta["generatedAt"]})
@@ -15,6 +15,21 @@ export async function createTask(task: any) {
   return res.json();
 }
 
+export type BulkError = { index: number; id: string | null; error: unknown };
+export type BulkResult = { applied: number; errors: BulkError[] };
+
+// Items are written or rejected one by one: check `errors` (by index) for the ones that failed.
+export async function createTasksBulk(tasks: any[]): Promise<BulkResult> {
+  const res = await fetch(`${API}/tasks/bulk`, {
+    method: "POST",
+    headers: {"Content-Type":"application/json"},
+    body: JSON.stringify(tasks),
+  });
+  if (!res.ok) throw new Error(`Bulk create failed: HTTP ${res.status}`);
+  const data = await res.json();
+  return { applied: data.applied ?? 0, errors: data.errors ?? [] };
+}
+
 export async function patchTask(id: string, patch: any) {
   const res = await fetch(`${API}/tasks/${id}`, {
     method: "PATCH",
@@ -8,6 +8,7 @@ import type { Task } from "@/types/task";
 import { topSuggestions } from "@/utils/priority";
 import { TipsDialog } from "@/components";
 import ShiftStrip from "@/components/ShiftStrip";
+import { createTasksBulk } from "@/api/client";
 
 
 
@@ -139,7 +140,7 @@ async function importShiftsAsTasks() {
     const existing = useTasks.getState().tasks;
     const hasId = new Set(existing.map(t => t.id));
 
-    let created = 0;
+    const batch: Task[] = [];
     for (const s of items) {
       const tid = `w2w-${s.id}`;       // deterministic -> prevents duplicates
       if (hasId.has(tid)) continue;
@@ -148,7 +149,7 @@ async function importShiftsAsTasks() {
       const loc = s.location?.trim() || "—";
       const title = `Shift: ${s.title || "Shift"} @ ${loc}`;
 
-      useTasks.getState().addTask({
+      batch.push({
         id: tid,
         title,
         description: `From W2W: ${new Date(s.start).toLocaleString()} → ${new Date(s.end).toLocaleString()}`,
@@ -157,12 +158,21 @@ async function importShiftsAsTasks() {
         createdAt: s.start ?? nowISO,
         updatedAt: s.start ?? nowISO,
         dueDate: s.end ?? undefined,
-      });
-
-      created++;
+      } as Task);
     }
 
-    alert(`✅ Imported ${created} shift${created === 1 ? "" : "s"} as tasks`);
+    // one round trip for the whole import instead of one per shift
+    const { errors } = batch.length ? await createTasksBulk(batch) : { errors: [] };
+    const failed = new Set(errors.map((e) => e.index));
+    const saved = batch.filter((_, i) => !failed.has(i));
+    saved.forEach((t) => useTasks.getState().addTask(t));
+    const created = saved.length;
+
+    if (failed.size) console.warn("Shift import errors", errors);
+    alert(
+      `✅ Imported ${created} shift${created === 1 ? "" : "s"} as tasks` +
+        (failed.size ? `\n⚠️ ${failed.size} could not be saved` : "")
+    );
   } catch (e) {
     console.error(e);
     alert("⚠️ Couldn’t import shifts. Check the server and try again.");